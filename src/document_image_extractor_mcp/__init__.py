@@ -1,9 +1,10 @@
-from . import server
-import asyncio
+import sys
+
+from . import cli, server
 
 def main():
     """Main entry point for the package."""
-    asyncio.run(server.main())
+    sys.exit(cli.main())
 
 # Optionally expose other important items at package level
-__all__ = ['main', 'server']
\ No newline at end of file
+__all__ = ['main', 'server', 'cli']
\ No newline at end of file
@@ -1,8 +1,8 @@
 """
 Main entry point for the document_image_extractor_mcp package.
 """
-import asyncio
-from .server import main
+import sys
+from .cli import main
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(main())
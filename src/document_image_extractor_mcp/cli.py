@@ -0,0 +1,203 @@
+"""
+Command-line interface for the document image extractor.
+
+Without a subcommand the MCP server is started: over HTTP, or with
+`--transport stdio` over stdin/stdout for a local client. The `extract`,
+`info` and `batch` subcommands work offline: they call DocumentExtractor
+directly and write one JSON object per document to stdout, so local files can
+be processed without a server or any protocol overhead.
+
+Exit codes: 0 when every document succeeded, 1 when at least one failed,
+2 for usage errors and 130 when interrupted.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional
+
+from . import server
+from .server import BlankImageFilter, DocumentExtractor, FileUtils, PDFImageExtractor, _extract_document_worker
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+
+def read_document_paths(paths: Iterable[str]) -> Iterator[str]:
+    """Expand the path arguments; "-" reads further paths from stdin, one per line."""
+    for path in paths:
+        if path == "-":
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        else:
+            yield path
+
+
+def write_result(result: dict) -> None:
+    """Write one JSON-lines result to stdout."""
+    sys.stdout.write(json.dumps(result, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def failed(document_path: str, error: Exception) -> dict:
+    return {"document": document_path, "status": "failed", "error": str(error)}
+
+
+def run_extract(args: argparse.Namespace) -> int:
+    """Extract the images of one document in this process."""
+    try:
+        blank_filter = BlankImageFilter() if args.skip_blank_images else None
+        doc_extractor = DocumentExtractor(
+            min_image_size=args.min_image_size, create_zip=not args.no_zip,
+            blank_filter=blank_filter, scan=args.scan, referenced_only=args.referenced_only
+        )
+        extracted_images, output_dir, zip_path = doc_extractor.extract_images(
+            args.document,
+            args.output_dir,
+            pages=args.pages,
+            max_images=args.max_images,
+            image_ids=args.image_ids,
+            incremental=args.incremental,
+            force=args.force
+        )
+        result = {
+            "document": args.document,
+            "status": "extracted",
+            "extracted_images": len(extracted_images),
+            "image_files": [os.path.basename(image) for image in extracted_images],
+            "output_directory": output_dir,
+            "zip_file": zip_path
+        }
+        if blank_filter is not None:
+            result["skipped_blank_images"] = blank_filter.rejected
+        if doc_extractor.image_occurrences:
+            result["image_occurrences"] = doc_extractor.image_occurrences
+        if doc_extractor.archive_documents is not None:
+            result["documents"] = doc_extractor.archive_documents
+    except Exception as e:
+        result = failed(args.document, e)
+
+    write_result(result)
+    return EXIT_FAILED if result["status"] == "failed" else EXIT_OK
+
+
+def run_info(args: argparse.Namespace) -> int:
+    """Print the document information of each document."""
+    doc_extractor = DocumentExtractor()
+    exit_code = EXIT_OK
+    for document_path in read_document_paths(args.documents):
+        try:
+            info = doc_extractor.get_document_info(document_path)
+            result = {
+                "document": document_path,
+                "status": "ok",
+                "file_type": FileUtils.get_file_extension(document_path),
+                **info
+            }
+        except Exception as e:
+            result = failed(document_path, e)
+            exit_code = EXIT_FAILED
+        write_result(result)
+    return exit_code
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Extract many documents on a process pool, printing results as they finish.
+
+    Each document is extracted incrementally next to itself, as with
+    extract_directory_images, so re-running a batch skips unchanged documents.
+    """
+    documents = list(dict.fromkeys(read_document_paths(args.documents)))
+    exit_code = EXIT_OK
+    if not documents:
+        return exit_code
+
+    mp_context = multiprocessing.get_context("spawn")
+    workers = min(args.workers or os.cpu_count() or 1, len(documents))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        futures = {
+            pool.submit(
+                _extract_document_worker, document_path, args.min_image_size, not args.no_zip, args.force,
+                args.scan, args.referenced_only
+            ): document_path
+            for document_path in documents
+        }
+        for future in as_completed(futures):
+            try:
+                result = {"document": futures[future], **future.result()}
+            except Exception as e:
+                result = failed(futures[future], e)
+            if result["status"] == "failed":
+                exit_code = EXIT_FAILED
+            write_result(result)
+    return exit_code
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="document-image-extractor-mcp",
+        description="Extract images from PDF and Office documents. Starts the MCP server when no command is given."
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    parser.add_argument(
+        "--transport", choices=server.TRANSPORTS, default=os.environ.get("DOC_EXTRACTOR_TRANSPORT", "http"),
+        help="serve MCP over HTTP on port 8000 (with the REST API), or over stdio for a local client (default: http)"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    def add_extraction_options(command: argparse.ArgumentParser) -> None:
+        command.add_argument("--min-image-size", type=int, default=10, help="minimum image dimension for PDFs (default: 10)")
+        command.add_argument("--scan", choices=PDFImageExtractor.SCAN_MODES, default="pages",
+                             help="find PDF images by walking pages or from the xref table (default: pages)")
+        command.add_argument("--referenced-only", action="store_true",
+                             help="extract only the images a Word document references, in reading order")
+        command.add_argument("--no-zip", action="store_true", help="don't create a ZIP archive")
+        command.add_argument("--force", action="store_true", help="rewrite outputs even if the document is unchanged")
+
+    extract = commands.add_parser("extract", help="extract the images of one document or ZIP archive of documents")
+    extract.add_argument("document", help="document or .zip archive to extract from")
+    extract.add_argument("-o", "--output-dir", help="output directory (default: <name>_<type>_images next to the document)")
+    extract.add_argument("--pages", help="PDF pages, 1-based ranges such as 1-3,7,10-")
+    extract.add_argument("--max-images", type=int, help="stop after this many images")
+    extract.add_argument("--image-ids", type=lambda value: value.split(","),
+                         help="comma-separated PDF xrefs or Office media names")
+    extract.add_argument("--skip-blank-images", action="store_true", help="drop blank and solid-colour images")
+    extract.add_argument("--incremental", action="store_true", help="keep a manifest and skip unchanged documents")
+    add_extraction_options(extract)
+    extract.set_defaults(handler=run_extract)
+
+    info = commands.add_parser("info", help="print page counts, metadata and image ids")
+    info.add_argument("documents", nargs="+", help="documents, or - to read paths from stdin")
+    info.set_defaults(handler=run_info)
+
+    batch = commands.add_parser("batch", help="extract many documents in parallel")
+    batch.add_argument("documents", nargs="+", help="documents, or - to read paths from stdin")
+    batch.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    add_extraction_options(batch)
+    batch.set_defaults(handler=run_batch)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line; returns the process exit code."""
+    args = build_parser().parse_args(argv)
+
+    if args.command is None:
+        asyncio.run(server.main(args.transport))
+        return EXIT_OK
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
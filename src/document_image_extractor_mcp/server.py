@@ -1,16 +1,40 @@
 """
 Document Image Extractor MCP Server
-Provides tools for extracting images from PDF and Word documents via Model Context Protocol.
+Provides tools for extracting images from PDF and Office (Word, PowerPoint, Excel) documents via Model Context Protocol.
 """
 
 import asyncio
+import io
 import os
 import json
 import logging
 import base64
 import tempfile
 import shutil
-from typing import List, Dict, Optional, Tuple, Union
+import hashlib
+import time
+import threading
+import contextlib
+import fnmatch
+import multiprocessing
+import cProfile
+import tracemalloc
+import hmac
+import secrets
+import codecs
+import binascii
+import heapq
+import itertools
+import uuid
+import urllib.parse
+import re
+import mmap
+import posixpath
+import xml.etree.ElementTree as ET
+from importlib import metadata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple, Union, Callable, Awaitable, AsyncIterator, BinaryIO, Iterable, Iterator
 from pathlib import Path
 
 from mcp.server.models import InitializationOptions
@@ -18,28 +42,50 @@ import mcp.types as types
 from mcp.server import NotificationOptions, Server
 from pydantic import AnyUrl
 from mcp.server.sse import SseServerTransport
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 from starlette.applications import Starlette
 from starlette.routing import Route
-from starlette.responses import Response, JSONResponse
+from starlette.responses import Response, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+import anyio
+import httpx
 
 # Document processing imports
 import fitz  # PyMuPDF
 from PIL import Image
 import zipfile
 
+# Optional: only needed for near-duplicate and blank image filtering
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("document-extractor-server")
 
+# Version of the installed distribution, read once; a plain source checkout
+# that was never installed has no metadata to read
+try:
+    SERVER_VERSION = metadata.version("document-image-extractor-mcp")
+except metadata.PackageNotFoundError:
+    SERVER_VERSION = "0+unknown"
+
 # Create server instance
-server = Server("document-image-extractor-mcp")
+server = Server("document-image-extractor-mcp", version=SERVER_VERSION)
 
 
 # Utility Classes (simplified versions of our original utils)
 class FileUtils:
     """Utility functions for file operations."""
     
+    SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.pptx', '.xlsx']
+    # Containers of supported documents, accepted by the extraction tools
+    ARCHIVE_EXTENSIONS = ['.zip']
+    
     @staticmethod
     def validate_file_exists(file_path: str) -> bool:
         """Check if a file exists."""
@@ -54,12 +100,26 @@ class FileUtils:
     def is_supported_document(file_path: str) -> bool:
         """Check if file is a supported document type."""
         ext = FileUtils.get_file_extension(file_path)
-        return ext in ['.pdf', '.docx']
+        return ext in FileUtils.SUPPORTED_EXTENSIONS
+    
+    @staticmethod
+    def is_archive(file_path: str) -> bool:
+        """Check if file is an archive of documents (see ArchiveExtractor)."""
+        return FileUtils.get_file_extension(file_path) in FileUtils.ARCHIVE_EXTENSIONS
     
     @staticmethod
     def create_output_directory(output_dir: str) -> None:
         """Create output directory if it doesn't exist."""
         os.makedirs(output_dir, exist_ok=True)
+    
+    @staticmethod
+    def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Compute the SHA-256 hex digest of a file without loading it into memory."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
 
 
 class Base64Utils:
@@ -76,11 +136,36 @@ class Base64Utils:
         with open(output_path, 'wb') as f:
             f.write(decoded_data)
     
+    @staticmethod
+    def estimate_decoded_size(base64_data: Optional[str]) -> int:
+        """Estimate the decoded size in bytes of a base64 string."""
+        if not base64_data:
+            return 0
+        return len(base64_data) * 3 // 4
+    
+    @staticmethod
+    @contextlib.contextmanager
+    def map_file(file_path: str) -> Iterator[memoryview]:
+        """
+        Map a file read-only and yield a view of its bytes.
+        
+        Encoding from the mapping reads the page cache directly instead of
+        first copying the file into a bytes object. The mapping is closed when
+        the block exits, so views must not outlive it.
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b'')
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    yield view
+    
     @staticmethod
     def encode_file_to_base64(file_path: str) -> str:
         """Encode file to base64 string."""
-        with open(file_path, 'rb') as f:
-            return base64.b64encode(f.read()).decode('utf-8')
+        with Base64Utils.map_file(file_path) as data:
+            return base64.b64encode(data).decode('utf-8')
     
     @staticmethod
     def get_mime_type(file_path: str) -> str:
@@ -89,270 +174,4260 @@ class Base64Utils:
         mime_types = {
             '.pdf': 'application/pdf',
             '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             '.png': 'image/png',
             '.jpg': 'image/jpeg',
             '.jpeg': 'image/jpeg',
             '.gif': 'image/gif',
+            '.bmp': 'image/bmp',
+            '.tif': 'image/tiff',
+            '.tiff': 'image/tiff',
+            '.emf': 'image/emf',
+            '.wmf': 'image/wmf',
+            '.svg': 'image/svg+xml',
             '.zip': 'application/zip'
         }
         return mime_types.get(ext, 'application/octet-stream')
 
 
-class PDFImageExtractor:
-    """Extract images from PDF documents."""
+class Base64StreamDecoder:
+    """
+    Decode base64 text fed in arbitrary pieces, writing the bytes to a file.
     
-    def __init__(self, min_image_size: int = 10):
-        self.min_image_size = min_image_size
+    Only a few characters are held back between pieces (to keep decoding on
+    4-character boundaries), so memory stays constant regardless of the size
+    of the encoded data. A leading data URL prefix is stripped, as in
+    Base64Utils.decode_base64_to_file.
+    """
     
-    def extract_images(self, pdf_path: str, output_dir: str) -> List[str]:
-        """Extract all images from a PDF file."""
-        FileUtils.create_output_directory(output_dir)
-        extracted_files = []
+    DATA_URL_PREFIX = 'data:'
+    
+    def __init__(self, sink: BinaryIO):
+        self.sink = sink
+        self.bytes_written = 0
+        self.digest = hashlib.sha256()
+        self._pending = ""
+        self._prefix_checked = False
+    
+    def feed(self, text: str) -> None:
+        """Decode and write as much of the accumulated base64 text as possible."""
+        data = self._pending + "".join(text.split())
         
-        try:
-            doc = fitz.open(pdf_path)
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                image_list = page.get_images()
-                
-                for img_index, img in enumerate(image_list):
-                    xref = img[0]
-                    pix = fitz.Pixmap(doc, xref)
-                    
-                    # Filter small images
-                    if pix.width >= self.min_image_size and pix.height >= self.min_image_size:
-                        if pix.n - pix.alpha < 4:  # GRAY or RGB
-                            output_file = os.path.join(output_dir, f"page_{page_num + 1}_image_{img_index + 1}.png")
-                            pix.save(output_file)
-                            extracted_files.append(output_file)
-                        else:  # CMYK: convert to RGB
-                            pix1 = fitz.Pixmap(fitz.csRGB, pix)
-                            output_file = os.path.join(output_dir, f"page_{page_num + 1}_image_{img_index + 1}.png")
-                            pix1.save(output_file)
-                            extracted_files.append(output_file)
-                            pix1 = None
-                    
-                    pix = None
-            
-            doc.close()
-            
-        except Exception as e:
-            logger.error(f"Error extracting images from PDF: {str(e)}")
-            raise
+        if not self._prefix_checked:
+            if data.startswith(self.DATA_URL_PREFIX):
+                if ',' not in data:
+                    self._pending = data
+                    return
+                data = data.split(',', 1)[1]
+            elif self.DATA_URL_PREFIX.startswith(data):
+                # Too short to tell whether a data URL prefix follows
+                self._pending = data
+                return
+            self._prefix_checked = True
         
-        return extracted_files
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._write(data[:usable])
+        self._pending = data[usable:]
     
-    def get_pdf_info(self, pdf_path: str) -> dict:
-        """Get information about a PDF document."""
+    def close(self) -> None:
+        """Decode any remaining text; raises ValueError if it is incomplete."""
+        if self._pending:
+            if not self._prefix_checked and self._pending.startswith(self.DATA_URL_PREFIX):
+                raise ValueError("Invalid base64 data: incomplete data URL")
+            self._write(self._pending)
+            self._pending = ""
+    
+    def _write(self, chunk: str) -> None:
         try:
-            doc = fitz.open(pdf_path)
-            info = {
-                'page_count': len(doc),
-                'metadata': doc.metadata,
-                'file_size': os.path.getsize(pdf_path),
-                'image_count_by_page': {}
-            }
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                image_list = page.get_images()
-                info['image_count_by_page'][page_num + 1] = len(image_list)
-            
-            doc.close()
-            return info
-            
-        except Exception as e:
-            logger.error(f"Error getting PDF info: {str(e)}")
-            raise
+            decoded = base64.b64decode(chunk, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 data: {str(e)}")
+        self.sink.write(decoded)
+        self.digest.update(decoded)
+        self.bytes_written += len(decoded)
 
 
-class WordImageExtractor:
-    """Extract images from Word documents."""
+class StreamingJSONBodyParser:
+    """
+    Incrementally parse a JSON object, streaming one string field elsewhere.
     
-    def extract_images(self, docx_path: str, output_dir: str) -> List[str]:
-        """Extract all images from a Word document."""
-        FileUtils.create_output_directory(output_dir)
-        extracted_files = []
-        
+    Keys and ordinary values are collected into `fields`. The value of
+    `stream_field` (normally the document's base64 data) is never held as a
+    whole: it is decoded piece by piece into `sink` as the body arrives, and
+    `streamed` is set once it has been seen (with `document_hash` holding the
+    sha256 of the decoded bytes). Malformed bodies raise ValueError.
+    """
+    
+    WHITESPACE = ' \t\r\n'
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    STRING_SPECIAL = re.compile(r'["\\]')
+    
+    def __init__(self, stream_field: str, sink: BinaryIO):
+        self.stream_field = stream_field
+        self.sink = sink
+        self.fields: Dict[str, object] = {}
+        self.streamed = False
+        self.document_hash: Optional[str] = None
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._base64_decoder: Optional[Base64StreamDecoder] = None
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._value_start = 0
+        self._scan = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    async def parse(self, chunks: AsyncIterator[bytes]) -> Dict[str, object]:
+        """Consume an async iterator of body chunks and return the parsed fields."""
+        async for chunk in chunks:
+            self.feed(chunk)
+        return self.finish()
+    
+    def feed(self, chunk: bytes) -> None:
+        """Parse as much of the body as the data received so far allows."""
         try:
-            with zipfile.ZipFile(docx_path, 'r') as docx_zip:
-                # Look for images in the media folder
-                for file_info in docx_zip.infolist():
-                    if file_info.filename.startswith('word/media/'):
-                        # Extract image file
-                        image_data = docx_zip.read(file_info.filename)
-                        image_name = os.path.basename(file_info.filename)
-                        output_file = os.path.join(output_dir, image_name)
-                        
-                        with open(output_file, 'wb') as f:
-                            f.write(image_data)
-                        
-                        extracted_files.append(output_file)
-            
-        except Exception as e:
-            logger.error(f"Error extracting images from Word document: {str(e)}")
-            raise
+            text = self._text_decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Request body is not valid UTF-8: {str(e)}")
+        self._buf += text
         
-        return extracted_files
+        while self._step():
+            pass
+        
+        # Drop consumed text; a partially scanned ordinary value is kept whole
+        cut = self._value_start if self._state == "value_raw" else self._pos
+        if cut:
+            self._buf = self._buf[cut:]
+            self._pos -= cut
+            self._scan -= cut
+            self._value_start -= cut
     
-    def get_docx_info(self, docx_path: str) -> dict:
-        """Get information about a Word document."""
-        try:
-            image_count = 0
-            image_files = []
-            
-            with zipfile.ZipFile(docx_path, 'r') as docx_zip:
-                for file_info in docx_zip.infolist():
-                    if file_info.filename.startswith('word/media/'):
-                        image_count += 1
-                        image_files.append(file_info.filename)
-            
-            return {
-                'file_size': os.path.getsize(docx_path),
-                'image_count': image_count,
-                'image_files': image_files
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting Word document info: {str(e)}")
-            raise
-
-
-class DocumentExtractor:
-    """Unified document image extractor for PDF and Word documents."""
+    def finish(self) -> Dict[str, object]:
+        """Validate that the body was complete and return the parsed fields."""
+        self._buf += self._text_decoder.decode(b'', final=True)
+        while self._step():
+            pass
+        if self._state != "done":
+            raise ValueError("Request body ended before the JSON object was complete")
+        return self.fields
     
-    def __init__(self, min_image_size: int = 10, create_zip: bool = True):
-        self.min_image_size = min_image_size
-        self.create_zip = create_zip
-        self.pdf_extractor = PDFImageExtractor(min_image_size=min_image_size)
-        self.word_extractor = WordImageExtractor()
+    def _skip_whitespace(self) -> bool:
+        """Advance past whitespace; returns False if the buffer is exhausted."""
+        while self._pos < len(self._buf) and self._buf[self._pos] in self.WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buf)
     
-    def extract_images(self, document_path: str, output_dir: Optional[str] = None) -> Tuple[List[str], str, Optional[str]]:
-        """Extract all images from a document and optionally create a ZIP file."""
-        if not FileUtils.validate_file_exists(document_path):
-            raise FileNotFoundError(f"Document not found: {document_path}")
+    def _expect(self, allowed: str) -> str:
+        char = self._buf[self._pos]
+        if char not in allowed:
+            raise ValueError(f"Invalid JSON body: unexpected {char!r} at offset {self._pos}")
+        self._pos += 1
+        return char
+    
+    def _step(self) -> bool:
+        """Run one parser transition; returns False when more data is needed."""
+        state = self._state
         
-        if not FileUtils.is_supported_document(document_path):
-            ext = FileUtils.get_file_extension(document_path)
-            raise ValueError(f"Unsupported file type: {ext}. Supported types: .pdf, .docx")
+        if state in ("start", "key_or_end", "key", "colon", "after_value", "done"):
+            if not self._skip_whitespace():
+                return False
+            if state == "start":
+                self._expect('{')
+                self._state = "key_or_end"
+            elif state == "done":
+                raise ValueError("Invalid JSON body: unexpected data after the object")
+            elif state == "colon":
+                self._expect(':')
+                self._state = "value"
+            elif state == "after_value":
+                self._state = "key" if self._expect(',}') == ',' else "done"
+            elif state == "key_or_end" and self._buf[self._pos] == '}':
+                self._pos += 1
+                self._state = "done"
+            else:
+                return self._read_key()
+            return True
         
-        file_ext = FileUtils.get_file_extension(document_path)
+        if state == "value":
+            if not self._skip_whitespace():
+                return False
+            if self._key == self.stream_field and self._buf[self._pos] == '"':
+                if self.streamed:
+                    raise ValueError(f"Invalid JSON body: duplicate {self.stream_field}")
+                self._pos += 1
+                self._base64_decoder = Base64StreamDecoder(self.sink)
+                self._state = "value_stream"
+            else:
+                self._value_start = self._scan = self._pos
+                self._depth = 0
+                self._in_string = self._escaped = False
+                self._state = "value_raw"
+            return True
         
-        if output_dir is None:
-            doc_name = os.path.splitext(os.path.basename(document_path))[0]
-            if file_ext == '.pdf':
-                output_dir = os.path.join(os.path.dirname(document_path), f"{doc_name}_pdf_images")
+        if state == "value_stream":
+            return self._read_streamed_string()
+        
+        return self._read_raw_value()
+    
+    def _read_key(self) -> bool:
+        if self._buf[self._pos] != '"':
+            raise ValueError(f"Invalid JSON body: expected a key at offset {self._pos}")
+        end = self._find_string_end(self._pos + 1)
+        if end is None:
+            return False
+        self._key = json.loads(self._buf[self._pos:end + 1])
+        self._pos = end + 1
+        self._state = "colon"
+        return True
+    
+    def _find_string_end(self, index: int) -> Optional[int]:
+        """Index of the closing quote of a string starting before `index`."""
+        while index < len(self._buf):
+            char = self._buf[index]
+            if char == '\\':
+                index += 2
+                continue
+            if char == '"':
+                return index
+            index += 1
+        return None
+    
+    def _read_streamed_string(self) -> bool:
+        """
+        Decode the streamed string up to its closing quote or the end of the buffer.
+        
+        The buffer is scanned once, from one quote or backslash to the next, and
+        the unescaped text is handed to the base64 decoder in a single piece.
+        """
+        buf = self._buf
+        pos = self._pos
+        pieces = []
+        while True:
+            match = self.STRING_SPECIAL.search(buf, pos)
+            special = match.start() if match else len(buf)
+            pieces.append(buf[pos:special])
+            pos = special
+            if match is None or buf[special] == '"' or special + 1 >= len(buf):
+                break
+            escape = buf[special + 1]
+            if escape == 'u':
+                if special + 6 > len(buf):
+                    break
+                pieces.append(chr(int(buf[special + 2:special + 6], 16)))
+                pos = special + 6
+            elif escape in self.ESCAPES:
+                pieces.append(self.ESCAPES[escape])
+                pos = special + 2
             else:
-                output_dir = os.path.join(os.path.dirname(document_path), f"{doc_name}_word_images")
+                raise ValueError(f"Invalid JSON body: bad escape at offset {special}")
         
-        if file_ext == '.pdf':
-            extracted_images = self.pdf_extractor.extract_images(document_path, output_dir)
-        else:  # .docx
-            extracted_images = self.word_extractor.extract_images(document_path, output_dir)
+        self._base64_decoder.feed(''.join(pieces))
+        self._pos = pos
+        if pos == len(buf) or buf[pos] != '"':
+            return False
         
-        # Create ZIP file by default if images were extracted
-        zip_path = None
-        if self.create_zip and extracted_images:
-            zip_path = self._create_zip_archive(document_path, extracted_images, output_dir)
+        self._base64_decoder.close()
+        self._pos = pos + 1
+        self.streamed = True
+        self.document_hash = self._base64_decoder.digest.hexdigest()
+        self.fields[self._key] = None
+        self._state = "after_value"
+        return True
+    
+    def _read_raw_value(self) -> bool:
+        buf = self._buf
+        index = self._scan
+        while index < len(buf):
+            char = buf[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '[{':
+                self._depth += 1
+            elif char in ']}' and self._depth > 0:
+                self._depth -= 1
+            elif char in ',}' and self._depth == 0:
+                try:
+                    self.fields[self._key] = json.loads(buf[self._value_start:index])
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON body: {str(e)}")
+                self._pos = index
+                self._state = "after_value"
+                return True
+            index += 1
+        self._scan = index
+        return False
+
+
+class SelectionUtils:
+    """Utility functions for page and image selection."""
+    
+    @staticmethod
+    def parse_page_ranges(pages: Union[str, int, List, None], page_count: int) -> List[int]:
+        """
+        Parse a 1-based page selection into sorted, zero-based page numbers.
         
-        return extracted_images, output_dir, zip_path
+        Accepts a range string such as "1-3,7,10-" (an open end runs to the last
+        page), a single page number, or a list of page numbers/range strings.
+        None selects every page.
+        """
+        if pages is None or pages == "" or pages == []:
+            return list(range(page_count))
+        
+        if isinstance(pages, (list, tuple)):
+            parts = [str(part) for part in pages]
+        else:
+            parts = str(pages).split(',')
+        
+        selected = set()
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                if '-' in part:
+                    start_text, end_text = part.split('-', 1)
+                    start = int(start_text) if start_text.strip() else 1
+                    end = int(end_text) if end_text.strip() else page_count
+                else:
+                    start = end = int(part)
+            except ValueError:
+                raise ValueError(f"Invalid page range: {part!r}")
+            
+            if start < 1 or end < start:
+                raise ValueError(f"Invalid page range: {part!r}")
+            # Ranges running past the end of the document are clipped
+            selected.update(range(start - 1, min(end, page_count)))
+        
+        return sorted(selected)
     
-    def _create_zip_archive(self, document_path: str, extracted_images: List[str], output_dir: str) -> str:
-        """Create a ZIP archive containing the original document and extracted images."""
-        doc_name = os.path.splitext(os.path.basename(document_path))[0]
-        zip_name = f"{doc_name}_Document_and_Images.zip"
-        zip_path = os.path.join(os.path.dirname(document_path), zip_name)
+    @staticmethod
+    def normalize_image_ids(image_ids: Optional[List[Union[str, int]]]) -> Optional[set]:
+        """Normalize image ids (PDF xrefs or Office media names) to a set of strings."""
+        if image_ids is None:
+            return None
+        if isinstance(image_ids, (str, int)):
+            image_ids = [image_ids]
+        return {str(image_id).strip() for image_id in image_ids}
+    
+    @staticmethod
+    def validate_max_images(max_images: Optional[int]) -> Optional[int]:
+        """Validate the max_images limit."""
+        if max_images is None:
+            return None
+        max_images = int(max_images)
+        if max_images < 0:
+            raise ValueError("max_images must be a non-negative integer")
+        return max_images
+
+
+class NearDuplicateFilter:
+    """
+    Find visually near-identical images (e.g. a stamp re-scanned at slightly
+    different quality) with perceptual hashes.
+    
+    Each image is reduced to a small grayscale thumbnail from its pixmap
+    samples. "dhash" compares neighbouring pixels of a 9x8 thumbnail; "phash"
+    thresholds the lowest frequencies of a 32x32 DCT. Hashes are computed
+    with NumPy for all images at once and packed into 64-bit integers;
+    Hamming distances are popcounts of their XOR, taken `BLOCK_ROWS` rows at
+    a time so memory grows linearly with the number of images. Images
+    within `threshold` bits of an earlier image join its group. With
+    action "drop" only the first image of each group is kept; with "group"
+    all images are kept and the groups are reported. Requires NumPy.
+    """
+    
+    ACTIONS = ("drop", "group")
+    METHODS = ("dhash", "phash")
+    DEFAULT_THRESHOLD = 6
+    BLOCK_ROWS = 256
+    
+    def __init__(self, action: str = "drop", threshold: int = DEFAULT_THRESHOLD, method: str = "dhash"):
+        if np is None:
+            raise RuntimeError(
+                "Near-duplicate filtering requires NumPy; install document-image-extractor-mcp[filters]"
+            )
+        if action not in self.ACTIONS:
+            raise ValueError(f"similar_images must be one of: keep, {', '.join(self.ACTIONS)}")
+        if method not in self.METHODS:
+            raise ValueError(f"similarity_hash must be one of: {', '.join(self.METHODS)}")
+        if not isinstance(threshold, int) or isinstance(threshold, bool) or not 0 <= threshold <= 64:
+            raise ValueError("similarity_threshold must be an integer between 0 and 64")
+        self.action = action
+        self.threshold = threshold
+        self.method = method
+    
+    @classmethod
+    def from_options(
+        cls,
+        similar_images: Optional[str] = None,
+        threshold: Optional[int] = None,
+        method: Optional[str] = None
+    ) -> Optional["NearDuplicateFilter"]:
+        """Build a filter from request options; None when similar images are kept."""
+        if similar_images in (None, "keep"):
+            return None
+        return cls(
+            similar_images,
+            cls.DEFAULT_THRESHOLD if threshold is None else threshold,
+            method or "dhash"
+        )
+    
+    def options(self) -> dict:
+        """The filter's settings, for manifests, cursors and cache keys."""
+        return {"action": self.action, "threshold": self.threshold, "method": self.method}
+    
+    def apply(self, image_paths: List[str]) -> Tuple[List[str], List[List[str]]]:
+        """
+        Filter a document's or batch's images.
+        
+        Returns the images to keep and the groups of near-duplicates (first
+        image first; only groups with more than one image). With action "drop",
+        the other images of each group are deleted.
+        """
+        groups = self.find_groups(image_paths)
+        if self.action != "drop":
+            return image_paths, groups
+        
+        dropped = {path for group in groups for path in group[1:]}
+        for path in dropped:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove near-duplicate image {path}: {str(e)}")
+        return [path for path in image_paths if path not in dropped], groups
+    
+    def find_groups(self, image_paths: List[str]) -> List[List[str]]:
+        """Group images whose hashes are within the threshold, in extraction order."""
+        indices, bits = self.compute_hashes(image_paths)
+        if len(indices) < 2:
+            return []
         
+        hashes = np.packbits(bits, axis=1).view(np.uint64).ravel()
+        groups = []
+        assigned = np.zeros(len(indices), dtype=bool)
+        for start in range(0, len(indices), self.BLOCK_ROWS):
+            if assigned[start:start + self.BLOCK_ROWS].all():
+                continue
+            block = self._hamming_distances(hashes[start:start + self.BLOCK_ROWS], hashes)
+            for offset, distances in enumerate(block):
+                if assigned[start + offset]:
+                    continue
+                members = np.flatnonzero((distances <= self.threshold) & ~assigned)
+                assigned[members] = True
+                if len(members) > 1:
+                    groups.append([image_paths[indices[member]] for member in members])
+        return groups
+    
+    @staticmethod
+    def _hamming_distances(rows: "np.ndarray", hashes: "np.ndarray") -> "np.ndarray":
+        """Bits differing between each of `rows` and each of `hashes` (64-bit hashes)."""
+        differing = rows[:, None] ^ hashes[None, :]
+        if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+            return np.bitwise_count(differing)
+        byte_counts = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.uint8)
+        return byte_counts[differing.view(np.uint8)].reshape(*differing.shape, 8).sum(axis=2, dtype=np.uint8)
+    
+    def compute_hashes(self, image_paths: List[str]) -> Tuple[List[int], "np.ndarray"]:
+        """
+        Compute 64-bit perceptual hashes as an (n, 64) boolean array.
+        
+        Returns the indices of the images that could be decoded (vector
+        formats such as EMF or SVG are skipped) and their hash bits.
+        """
+        size = (8, 9) if self.method == "dhash" else (32, 32)
+        indices, thumbnails = [], []
+        for index, path in enumerate(image_paths):
+            thumbnail = self._thumbnail(path, size)
+            if thumbnail is not None:
+                indices.append(index)
+                thumbnails.append(thumbnail)
+        if not thumbnails:
+            return [], np.zeros((0, 64), dtype=bool)
+        
+        stack = np.stack(thumbnails)
+        if self.method == "dhash":
+            bits = stack[:, :, 1:] > stack[:, :, :-1]
+        else:
+            dct = self._dct_matrix(32)
+            coefficients = np.einsum('kn,bnm,lm->bkl', dct, stack, dct)[:, :8, :8].reshape(len(stack), 64)
+            medians = np.median(coefficients[:, 1:], axis=1)
+            bits = coefficients > medians[:, None]
+        return indices, bits.reshape(len(stack), 64)
+    
+    @staticmethod
+    def _thumbnail(path: str, size: Tuple[int, int]) -> Optional["np.ndarray"]:
+        """Downsample an image file to a float32 grayscale array of `size` (rows, columns)."""
         try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Add the original document
-                zipf.write(document_path, f"original_document/{os.path.basename(document_path)}")
-                
-                # Add all extracted images
-                for image_path in extracted_images:
-                    image_name = os.path.basename(image_path)
-                    zipf.write(image_path, f"extracted_images/{image_name}")
+            pix = fitz.Pixmap(path)
+            if pix.alpha:
+                pix = fitz.Pixmap(pix, 0)
+            if pix.n != 1:
+                pix = fitz.Pixmap(fitz.csGRAY, pix)
             
-            logger.info(f"Created ZIP archive: {zip_path}")
-            return zip_path
+            # Halve cheaply inside MuPDF while the image is well above the target size
+            rows, columns = size
+            factor = min(pix.width // (columns * 2), pix.height // (rows * 2))
+            if factor >= 2:
+                pix.shrink(int(np.log2(factor)))
             
+            samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+            pixels = samples.reshape(pix.height, pix.stride)[:, :pix.width].astype(np.float32)
         except Exception as e:
-            logger.error(f"Error creating ZIP archive: {e}")
+            logger.debug(f"Cannot compute perceptual hash for {path}: {str(e)}")
             return None
+        
+        return NearDuplicateFilter._resample(NearDuplicateFilter._resample(pixels, rows, 0), columns, 1)
     
-    def get_document_info(self, document_path: str) -> dict:
-        """Get information about a document."""
-        if not FileUtils.validate_file_exists(document_path):
-            raise FileNotFoundError(f"Document not found: {document_path}")
+    @staticmethod
+    def _resample(pixels: "np.ndarray", target: int, axis: int) -> "np.ndarray":
+        """Area-average (or, when enlarging, repeat) pixels along one axis."""
+        length = pixels.shape[axis]
+        if length < target:
+            return np.take(pixels, np.arange(target) * length // target, axis=axis)
+        edges = np.arange(target + 1) * length // target
+        sums = np.add.reduceat(pixels, edges[:-1], axis=axis)
+        counts = np.diff(edges).astype(np.float32)
+        return sums / (counts[:, None] if axis == 0 else counts[None, :])
+    
+    @staticmethod
+    def _dct_matrix(size: int) -> "np.ndarray":
+        """Orthonormal DCT-II basis."""
+        k = np.arange(size)[:, None]
+        n = np.arange(size)[None, :]
+        matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+        matrix[0] /= np.sqrt(2)
+        return matrix.astype(np.float32)
+
+
+class BlankImageFilter:
+    """
+    Reject near-empty images such as full-page white backgrounds, separator
+    bars and solid fills before they are encoded and shipped.
+    
+    Statistics are computed with NumPy on the pixmap's sample buffer
+    (`Pixmap.samples_mv`, read without copying), reduced to the minimum and
+    maximum of each block of pixels, about `sample_size` blocks per side.
+    Keeping each block's extremes, rather than its mean or every n-th pixel,
+    keeps a thin stroke visible however large the page is. An image is blank
+    if it has a single (quantized) colour, the luminance variance of the
+    block extremes is at most `max_variance`, or at least `near_white_ratio`
+    of its blocks are near white throughout. Counts rejections in
+    `rejected`. Requires NumPy.
+    """
+    
+    def __init__(
+        self,
+        max_variance: float = 2.0,
+        near_white_ratio: float = 0.998,
+        near_white_level: int = 245,
+        sample_size: int = 64
+    ):
+        if np is None:
+            raise RuntimeError(
+                "Blank image filtering requires NumPy; install document-image-extractor-mcp[filters]"
+            )
+        self.max_variance = max_variance
+        self.near_white_ratio = near_white_ratio
+        self.near_white_level = near_white_level
+        self.sample_size = sample_size
+        self.rejected = 0
+    
+    def options(self) -> dict:
+        """The filter's settings, for manifests, cursors and cache keys."""
+        return {
+            "max_variance": self.max_variance,
+            "near_white_ratio": self.near_white_ratio,
+            "near_white_level": self.near_white_level
+        }
+    
+    def reject(self, pix: fitz.Pixmap) -> bool:
+        """Return True (and count it) if the pixmap is blank."""
+        if self.is_blank(pix):
+            self.rejected += 1
+            return True
+        return False
+    
+    def reject_file(self, image_path: str) -> bool:
+        """Like `reject` for an image file; files that cannot be decoded are kept."""
+        try:
+            pix = fitz.Pixmap(image_path)
+        except Exception:
+            return False
+        return self.reject(pix)
+    
+    def is_blank(self, pix: fitz.Pixmap) -> bool:
+        """Check a pixmap (GRAY, RGB or CMYK, with or without alpha) for blankness."""
+        colors = pix.n - pix.alpha
+        if colors not in (1, 3, 4) or pix.width == 0 or pix.height == 0:
+            return False
         
-        file_ext = FileUtils.get_file_extension(document_path)
+        samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+        view = samples.reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+        view = view.reshape(pix.height, pix.width, pix.n)
         
-        if file_ext == '.pdf':
-            return self.pdf_extractor.get_pdf_info(document_path)
-        elif file_ext == '.docx':
-            return self.word_extractor.get_docx_info(document_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
+        if pix.alpha and not view[:, :, colors].any():
+            return True  # fully transparent
+        
+        darkest, lightest = self._block_extremes(
+            view[:, :, :colors], max(1, max(pix.width, pix.height) // self.sample_size)
+        )
+        if colors == 4:  # CMYK: approximate RGB; high ink values are the dark end
+            darkest, lightest = (
+                (255 - channels[:, :, :3]) * (255 - channels[:, :, 3:]) / 255
+                for channels in (lightest, darkest)
+            )
+        extremes = np.stack([darkest, lightest])
+        
+        if extremes.mean(axis=3).var() <= self.max_variance:
+            return True
+        
+        quantized = extremes.astype(np.uint8) >> 4
+        if not (quantized != quantized[0, 0, 0]).any():
+            return True
+        
+        near_white = (darkest >= self.near_white_level).all(axis=2)
+        return near_white.mean() >= self.near_white_ratio
+    
+    @staticmethod
+    def _block_extremes(view: "np.ndarray", step: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Per-channel minimum and maximum of each step x step block of a (height, width, channels) array."""
+        rows = np.arange(0, view.shape[0], step)
+        cols = np.arange(0, view.shape[1], step)
+        lowest = np.minimum.reduceat(np.minimum.reduceat(view, rows, axis=0), cols, axis=1)
+        highest = np.maximum.reduceat(np.maximum.reduceat(view, rows, axis=0), cols, axis=1)
+        return lowest.astype(np.float32), highest.astype(np.float32)
 
 
-# Global extractor instance
-extractor = DocumentExtractor()
+class RequestStats:
+    """
+    Timing breakdown and byte/image counters for a single request.
+    
+    Stage durations are returned in the response's "stats" object and, for the
+    REST API, in a Server-Timing header, so clients can see where the time for
+    their document went. Durations are exclusive: time spent in a stage nested
+    inside another (e.g. "open" within "extract") counts only toward the inner
+    stage. Only the `SLOWEST_PAGES` slowest page timings are kept. Stages
+    entered with `profile=True` also run under the request's profiler (see
+    RequestProfiler).
+    """
+    
+    SLOWEST_PAGES = 20
+    
+    def __init__(self, profiler: Optional["RequestProfiler"] = None):
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.durations: Dict[str, float] = {}
+        self.page_durations: Dict[int, float] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.image_count = 0
+        self.image_bytes = 0
+        # Per thread: milliseconds spent in nested stages, one entry per open stage
+        self._nested = threading.local()
+    
+    def _open_stages(self) -> List[float]:
+        if not hasattr(self._nested, "stack"):
+            self._nested.stack = []
+        return self._nested.stack
+    
+    @contextlib.contextmanager
+    def stage(self, name: str, profile: bool = False):
+        """Time the enclosed block as stage `name` (accumulating repeated stages)."""
+        open_stages = self._open_stages()
+        open_stages.append(0.0)
+        start = time.perf_counter()
+        try:
+            if profile:
+                with self.profiler.stage(name):
+                    yield
+            else:
+                yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            nested = open_stages.pop()
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+            if open_stages:
+                open_stages[-1] += elapsed
+    
+    def add_duration(self, name: str, seconds: float) -> None:
+        """Record time spent outside a `stage` block (e.g. waiting on another request)."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds * 1000
+        open_stages = self._open_stages()
+        if open_stages:
+            open_stages[-1] += seconds * 1000
+    
+    def record_page(self, page_number: int, seconds: float) -> None:
+        """Record the time spent extracting from one (1-based) page."""
+        self.page_durations[page_number] = self.page_durations.get(page_number, 0.0) + seconds * 1000
+        if len(self.page_durations) > 2 * self.SLOWEST_PAGES:
+            self.page_durations = dict(
+                heapq.nlargest(self.SLOWEST_PAGES, self.page_durations.items(), key=lambda item: item[1])
+            )
+    
+    def record_images(self, image_paths: List[str]) -> None:
+        """Record the number and total size of extracted images."""
+        self.image_count = len(image_paths)
+        self.image_bytes = sum(os.path.getsize(path) for path in image_paths if os.path.exists(path))
+    
+    def as_dict(self) -> dict:
+        """Stats block included in responses."""
+        return {
+            "durations_ms": {name: round(ms, 3) for name, ms in self.durations.items()},
+            "page_durations_ms": {
+                str(page): round(ms, 3) for page, ms in sorted(
+                    heapq.nlargest(self.SLOWEST_PAGES, self.page_durations.items(), key=lambda item: item[1])
+                )
+            },
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "images": self.image_count,
+            "image_bytes": self.image_bytes
+        }
+    
+    def server_timing_header(self) -> str:
+        """Stage durations formatted as a Server-Timing header value."""
+        return ", ".join(f"{name};dur={ms:.3f}" for name, ms in self.durations.items())
+    
+    def serialize_with_stats(self, result: dict, indent: int = 2) -> str:
+        """
+        Serialize a response with this stats block appended as its last key.
+        
+        The result is serialized once (timed as the "serialize" stage) and the
+        stats, which include that duration and the response size, are spliced
+        in afterwards. The output matches json.dumps(..., indent=indent).
+        """
+        with self.stage("serialize"):
+            body = json.dumps(result, indent=indent)
+        self.bytes_out = len(body.encode('utf-8'))
+        stats_text = json.dumps(self.as_dict(), indent=indent).replace("\n", "\n" + " " * indent)
+        return body[:-2] + f',\n{" " * indent}"stats": {stats_text}\n}}'
 
 
-@server.list_tools()
-async def handle_list_tools() -> list[types.Tool]:
-    """List available document extraction tools."""
-    return [
-        types.Tool(
-            name="extract_document_images",
-            description="Extract all images from a PDF or Word document, save them as separate files, and create a ZIP archive containing both the original document and extracted images",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "document_path": {
-                        "type": "string", 
-                        "description": "Path to the document file (.pdf or .docx)"
-                    },
-                    "output_dir": {
-                        "type": "string", 
-                        "description": "Directory to save extracted images (optional, defaults to document directory)"
-                    },
-                    "min_image_size": {
-                        "type": "integer",
-                        "description": "Minimum image dimension for PDF extraction (filters decorative images)",
-                        "default": 10
-                    }
-                },
-                "required": ["document_path"],
-            },
-        ),
-        types.Tool(
-            name="extract_document_images_base64",
-            description="Extract images from a base64-encoded PDF or Word document. Accepts the document as base64 string and returns extracted images as base64-encoded data. Perfect for HTTP/remote scenarios where file system access is not shared.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "document_base64": {
-                        "type": "string",
-                        "description": "Base64-encoded document data (PDF or DOCX)"
-                    },
-                    "document_name": {
-                        "type": "string",
-                        "description": "Original filename with extension (e.g., 'document.pdf' or 'report.docx')"
+class ExtractionCancelled(RuntimeError):
+    """Raised inside an extraction whose CancellationToken was cancelled or ran out of time."""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation of an extraction running on a worker thread.
+    
+    Worker threads cannot be interrupted, so extractors call `check()` between
+    pages and images and stop by raising ExtractionCancelled. The token is
+    cancelled when its request is abandoned (an MCP cancellation notification
+    or a REST client disconnecting, see ExtractionScheduler.run) or once its
+    deadline, `timeout` seconds after it was created, has passed.
+    """
+    
+    def __init__(self, timeout: Optional[float] = None):
+        if timeout is not None:
+            timeout = float(timeout)
+            if timeout <= 0:
+                raise ValueError("timeout_seconds must be a positive number")
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+    
+    @classmethod
+    def for_request(cls, timeout_seconds: Optional[float] = None) -> "CancellationToken":
+        """Token for a request's `timeout_seconds` option, defaulting to the server's request timeout."""
+        if timeout_seconds is None and REQUEST_TIMEOUT:
+            timeout_seconds = REQUEST_TIMEOUT
+        return cls(timeout_seconds)
+    
+    def cancel(self, reason: str = "request cancelled") -> None:
+        """Ask the extraction to stop at its next check."""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancelled.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(f"deadline of {self.timeout:g}s exceeded")
+        return self._cancelled.is_set()
+    
+    def check(self) -> None:
+        """Raise ExtractionCancelled if the extraction should stop."""
+        if self.cancelled:
+            raise ExtractionCancelled(f"Extraction cancelled: {self.reason}")
+
+
+class _CachedDocument:
+    """An open document in a DocumentHandleCache and the lock serialising its use."""
+    
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self.lock = threading.Lock()
+        self.evicted = False
+
+
+class DocumentHandleCache:
+    """
+    LRU cache of open PyMuPDF documents for path-based tools.
+    
+    Opening a PDF parses its xref table, which is expensive for large files, and
+    clients commonly validate, inspect and then extract the same document. Handles
+    are keyed by real path, mtime and size, so an edited file is re-opened. A
+    handle is used by one thread at a time; a thread that finds it busy opens a
+    private handle instead of waiting. Evicted handles are closed once no longer
+    in use. Handles never cross process boundaries: a forked child starts empty.
+    """
+    
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int, int], _CachedDocument]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+    
+    @contextlib.contextmanager
+    def open(self, path: str) -> Iterator[fitz.Document]:
+        """Yield an open document for `path`, reusing a cached handle when the file is unchanged."""
+        if self.max_entries <= 0:
+            with fitz.open(path) as doc:
+                yield doc
+            return
+        
+        stat = os.stat(path)
+        real_path = os.path.realpath(path)
+        key = (real_path, stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            if self._pid != os.getpid():
+                # Handles inherited from the parent process are not ours to use
+                self._entries = OrderedDict()
+                self._pid = os.getpid()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                acquired = entry.lock.acquire(blocking=False)
+                if acquired:
+                    self.hits += 1
+            else:
+                self.misses += 1
+        
+        if entry is None:
+            doc = fitz.open(path)
+            entry = _CachedDocument(doc)
+            entry.lock.acquire()
+            with self._lock:
+                # Drop handles for older versions of this file
+                for stale_key in [k for k in self._entries if k[0] == real_path]:
+                    self._discard(stale_key)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._discard(next(iter(self._entries)))
+        elif not acquired:
+            # Another thread is using the cached handle; don't wait for it
+            with fitz.open(path) as doc:
+                yield doc
+            return
+        
+        try:
+            yield entry.doc
+        finally:
+            with self._lock:
+                entry.lock.release()
+                if entry.evicted:
+                    entry.doc.close()
+    
+    def _discard(self, key: Tuple[str, int, int]) -> None:
+        """Remove an entry, closing its handle now or when its user releases it."""
+        entry = self._entries.pop(key)
+        entry.evicted = True
+        if entry.lock.acquire(blocking=False):
+            entry.doc.close()
+            entry.lock.release()
+    
+    def clear(self) -> None:
+        """Close and forget every cached handle."""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def summary(self) -> dict:
+        """Cache size and hit counts, for health checks."""
+        with self._lock:
+            return {
+                "open_documents": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class PDFImageExtractor:
+    """
+    Extract images from PDF documents.
+    
+    With scan "pages" (the default) the page tree is walked and images are named
+    after the page showing them. Scan "xref" reads image XObjects straight from
+    the xref table instead, extracting every unique image once without loading
+    any page; files are named after the image's xref, which get_pdf_info maps
+    back to pages.
+    """
+    
+    SCAN_MODES = ("pages", "xref")
+    
+    def __init__(
+        self,
+        min_image_size: int = 10,
+        stats: Optional[RequestStats] = None,
+        blank_filter: Optional[BlankImageFilter] = None,
+        document_cache: Optional[DocumentHandleCache] = None,
+        scan: str = "pages",
+        cancellation: Optional[CancellationToken] = None
+    ):
+        if scan not in self.SCAN_MODES:
+            raise ValueError(f"scan must be one of: {', '.join(self.SCAN_MODES)}")
+        self.scan = scan
+        self.min_image_size = min_image_size
+        self.stats = stats if stats is not None else RequestStats()
+        self.blank_filter = blank_filter
+        self.cancellation = cancellation if cancellation is not None else CancellationToken()
+        # Shared handles for documents on disk; each call opens its own without one
+        self.document_cache = document_cache
+    
+    def _open(self, pdf_path: Union[str, bytes]):
+        """Context manager yielding an open document, from the cache when there is one."""
+        if isinstance(pdf_path, bytes):
+            # Held in memory, e.g. a member of an archive; never cached
+            return fitz.open(stream=pdf_path, filetype="pdf")
+        if self.document_cache is not None:
+            return self.document_cache.open(pdf_path)
+        return fitz.open(pdf_path)
+    
+    def extract_images(
+        self,
+        pdf_path: Union[str, bytes],
+        output_dir: str,
+        pages: Union[str, List, None] = None,
+        max_images: Optional[int] = None,
+        image_ids: Optional[List[Union[str, int]]] = None
+    ) -> List[str]:
+        """
+        Extract images from a PDF file, given by path or as its bytes.
+        
+        Only the pages in `pages` are loaded, and only images whose xref is in
+        `image_ids` (when given) are decoded. Extraction stops once `max_images`
+        images have been saved.
+        """
+        extracted_files, _ = self.extract_batch(
+            pdf_path, output_dir, pages=pages, image_ids=image_ids, limit=max_images
+        )
+        return extracted_files
+    
+    def extract_batch(
+        self,
+        pdf_path: Union[str, bytes],
+        output_dir: str,
+        pages: Union[str, List, None] = None,
+        image_ids: Optional[List[Union[str, int]]] = None,
+        start: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        Extract up to `limit` images, resuming at position `start`.
+        
+        Positions are (zero-based page number, image index on that page). Returns
+        the extracted files and the position to resume from, or None once the
+        selected pages are exhausted. Pages before `start` are never loaded.
+        """
+        FileUtils.create_output_directory(output_dir)
+        extracted_files = []
+        next_position = None
+        wanted_xrefs = SelectionUtils.normalize_image_ids(image_ids)
+        limit = SelectionUtils.validate_max_images(limit)
+        start_page, start_index = start or (0, 0)
+        
+        if self.scan == "xref":
+            if pages:
+                raise ValueError("pages cannot be combined with scan 'xref', which does not read the page tree")
+            return self._extract_xref_batch(pdf_path, output_dir, wanted_xrefs, start_index, limit)
+        
+        try:
+            with contextlib.ExitStack() as stack:
+                with self.stats.stage("open"):
+                    doc = stack.enter_context(self._open(pdf_path))
+                
+                for page_num in SelectionUtils.parse_page_ranges(pages, len(doc)):
+                    if page_num < start_page:
+                        continue
+                    self.cancellation.check()
+                    
+                    page_start = time.perf_counter()
+                    try:
+                        page = doc.load_page(page_num)
+                        image_list = page.get_images()
+                        first_index = start_index if page_num == start_page else 0
+                        
+                        for img_index in range(first_index, len(image_list)):
+                            img = image_list[img_index]
+                            xref = img[0]
+                            if wanted_xrefs is not None and str(xref) not in wanted_xrefs:
+                                continue
+                            
+                            # Skip small images using the image dictionary before decoding
+                            if img[2] < self.min_image_size or img[3] < self.min_image_size:
+                                continue
+                            
+                            # Stop only once another image is known to remain, so the last batch has no cursor
+                            if limit is not None and len(extracted_files) >= limit:
+                                next_position = (page_num, img_index)
+                                break
+                            
+                            self.cancellation.check()
+                            output_file = os.path.join(output_dir, f"page_{page_num + 1}_image_{img_index + 1}.png")
+                            if self._save_image(doc, xref, output_file):
+                                extracted_files.append(output_file)
+                    finally:
+                        self.stats.record_page(page_num + 1, time.perf_counter() - page_start)
+                    
+                    if next_position is not None:
+                        break
+            
+        except Exception as e:
+            logger.error(f"Error extracting images from PDF: {str(e)}")
+            raise
+        
+        return extracted_files, next_position
+    
+    def _extract_xref_batch(
+        self,
+        pdf_path: Union[str, bytes],
+        output_dir: str,
+        wanted_xrefs: Optional[set],
+        start_index: int,
+        limit: Optional[int]
+    ) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        Extract up to `limit` images found by scanning the xref table.
+        
+        Positions are (0, index into the document's image xrefs), mirroring
+        the page walk's (page, index). Images that no page shows are included.
+        """
+        extracted_files = []
+        next_position = None
+        
+        try:
+            with contextlib.ExitStack() as stack:
+                with self.stats.stage("open"):
+                    doc = stack.enter_context(self._open(pdf_path))
+                with self.stats.stage("scan"):
+                    image_xrefs = self.image_xrefs(doc)
+                
+                for index in range(start_index, len(image_xrefs)):
+                    self.cancellation.check()
+                    
+                    xref, width, height = image_xrefs[index]
+                    if wanted_xrefs is not None and str(xref) not in wanted_xrefs:
+                        continue
+                    
+                    # Skip small images using the image dictionary before decoding
+                    if width is not None and height is not None and \
+                            (width < self.min_image_size or height < self.min_image_size):
+                        continue
+                    
+                    if limit is not None and len(extracted_files) >= limit:
+                        next_position = (0, index)
+                        break
+                    
+                    output_file = os.path.join(output_dir, f"image_xref_{xref}.png")
+                    if self._save_image(doc, xref, output_file):
+                        extracted_files.append(output_file)
+            
+        except Exception as e:
+            logger.error(f"Error extracting images from PDF: {str(e)}")
+            raise
+        
+        return extracted_files, next_position
+    
+    @staticmethod
+    def image_xrefs(doc: fitz.Document) -> List[Tuple[int, Optional[int], Optional[int]]]:
+        """
+        (xref, width, height) of every image XObject in the xref table, in xref order.
+        
+        Soft masks and explicit masks are left out: they are decoded as part of
+        the image that uses them. Width and height are None when the image
+        dictionary does not give them directly.
+        """
+        images = []
+        masks = set()
+        for xref in range(1, doc.xref_length()):
+            if doc.xref_get_key(xref, "Subtype") != ("name", "/Image"):
+                continue
+            for mask_key in ("SMask", "Mask"):
+                kind, value = doc.xref_get_key(xref, mask_key)
+                if kind == "xref":
+                    masks.add(int(value.split()[0]))
+            
+            size = []
+            for size_key in ("Width", "Height"):
+                kind, value = doc.xref_get_key(xref, size_key)
+                size.append(int(value) if kind == "int" else None)
+            images.append((xref, size[0], size[1]))
+        
+        return [image for image in images if image[0] not in masks]
+    
+    def _save_image(self, doc: fitz.Document, xref: int, output_file: str) -> bool:
+        """Decode the image at `xref` and save it as PNG. Returns False if it is filtered out."""
+        pix = fitz.Pixmap(doc, xref)
+        
+        # Filter small images
+        if pix.width < self.min_image_size or pix.height < self.min_image_size:
+            return False
+        
+        # Filter blank and solid-colour images before encoding
+        if self.blank_filter is not None and self.blank_filter.reject(pix):
+            return False
+        
+        if pix.n - pix.alpha < 4:  # GRAY or RGB
+            pix.save(output_file)
+        else:  # CMYK: convert to RGB
+            pix1 = fitz.Pixmap(fitz.csRGB, pix)
+            pix1.save(output_file)
+            pix1 = None
+        
+        pix = None
+        return True
+    
+    def get_pdf_info(self, pdf_path: str) -> dict:
+        """Get information about a PDF document."""
+        try:
+            with self._open(pdf_path) as doc:
+                info = {
+                    'page_count': len(doc),
+                    'metadata': doc.metadata,
+                    'file_size': os.path.getsize(pdf_path),
+                    'image_count_by_page': {},
+                    'image_xrefs_by_page': {}
+                }
+                
+                for page_num in range(len(doc)):
+                    page = doc.load_page(page_num)
+                    image_list = page.get_images()
+                    info['image_count_by_page'][page_num + 1] = len(image_list)
+                    info['image_xrefs_by_page'][page_num + 1] = [img[0] for img in image_list]
+                
+                return info
+            
+        except Exception as e:
+            logger.error(f"Error getting PDF info: {str(e)}")
+            raise
+
+
+class OOXMLMediaExtractor:
+    """
+    Extract embedded media from Office Open XML packages (.docx, .pptx, .xlsx).
+    
+    Office documents are zip packages that keep their images under a
+    format-specific media folder. The package's central directory is read once
+    when the archive is opened, and selected entries are streamed straight to
+    disk rather than read into memory whole.
+    """
+    
+    # Media folder inside the package, e.g. 'word/media/'
+    media_prefix = ''
+    # Document type used in log and error messages
+    document_type = 'Office document'
+    
+    # Bytes copied per read when streaming an entry to disk
+    STREAM_CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(
+        self,
+        stats: Optional[RequestStats] = None,
+        blank_filter: Optional[BlankImageFilter] = None,
+        cancellation: Optional[CancellationToken] = None
+    ):
+        self.stats = stats if stats is not None else RequestStats()
+        self.blank_filter = blank_filter
+        self.cancellation = cancellation if cancellation is not None else CancellationToken()
+    
+    def extract_images(
+        self,
+        document_path: Union[str, bytes],
+        output_dir: str,
+        max_images: Optional[int] = None,
+        image_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Extract images from the document's media folder.
+        
+        The document is given by path or as its bytes.
+        `image_ids` selects media entries by full name (e.g. word/media/image1.png)
+        or base name (image1.png); `max_images` caps the number extracted.
+        """
+        extracted_files, _ = self.extract_batch(
+            document_path, output_dir, image_ids=image_ids, limit=max_images
+        )
+        return extracted_files
+    
+    def extract_batch(
+        self,
+        document_path: Union[str, bytes],
+        output_dir: str,
+        image_ids: Optional[List[str]] = None,
+        start: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        Extract up to `limit` media entries, resuming at position `start`.
+        
+        Positions are (0, index into the document's media entries), mirroring
+        the (page, image) positions used for PDFs. Returns the extracted files and
+        the position to resume from, or None once all media has been read.
+        """
+        FileUtils.create_output_directory(output_dir)
+        extracted_files = []
+        next_position = None
+        wanted_names = SelectionUtils.normalize_image_ids(image_ids)
+        limit = SelectionUtils.validate_max_images(limit)
+        _, start_index = start or (0, 0)
+        
+        try:
+            with self.stats.stage("open"):
+                package = zipfile.ZipFile(
+                    io.BytesIO(document_path) if isinstance(document_path, bytes) else document_path, 'r'
+                )
+            
+            with package:
+                media_entries = self._media_entries(package)
+                
+                for media_index in range(start_index, len(media_entries)):
+                    self.cancellation.check()
+                    
+                    file_info = media_entries[media_index]
+                    if wanted_names is not None and \
+                            file_info.filename not in wanted_names and \
+                            os.path.basename(file_info.filename) not in wanted_names:
+                        continue
+                    
+                    if limit is not None and len(extracted_files) >= limit:
+                        next_position = (0, media_index)
+                        break
+                    
+                    output_file = os.path.join(output_dir, os.path.basename(file_info.filename))
+                    with package.open(file_info) as source, open(output_file, 'wb') as target:
+                        shutil.copyfileobj(source, target, self.STREAM_CHUNK_SIZE)
+                    
+                    if self.blank_filter is not None and self.blank_filter.reject_file(output_file):
+                        os.remove(output_file)
+                        continue
+                    
+                    extracted_files.append(output_file)
+            
+        except Exception as e:
+            logger.error(f"Error extracting images from {self.document_type}: {str(e)}")
+            raise
+        
+        return extracted_files, next_position
+    
+    def get_info(self, document_path: str) -> dict:
+        """Get information about the document's media."""
+        try:
+            with zipfile.ZipFile(document_path, 'r') as package:
+                image_files = [file_info.filename for file_info in self._media_entries(package)]
+            
+            return {
+                'file_size': os.path.getsize(document_path),
+                'image_count': len(image_files),
+                'image_files': image_files
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting {self.document_type} info: {str(e)}")
+            raise
+    
+    def _media_entries(self, package: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+        """Media entries of the package, in archive order."""
+        return [
+            file_info for file_info in package.infolist()
+            if file_info.filename.startswith(self.media_prefix) and not file_info.is_dir()
+        ]
+
+
+class WordImageExtractor(OOXMLMediaExtractor):
+    """
+    Extract images from Word documents.
+    
+    By default every file under word/media/ is extracted in archive order,
+    including media no longer used by the document. With `referenced_only`,
+    the main document part and its headers, footers, footnotes and endnotes
+    are stream-parsed for image relationships instead: only referenced images
+    are extracted, in reading order, and `occurrences` records how many times
+    each extracted image is used.
+    """
+    
+    media_prefix = 'word/media/'
+    document_type = 'Word document'
+    
+    MAIN_PART = 'word/document.xml'
+    # Relationship types of the parts searched for image references after the main part
+    REFERENCING_PART_TYPES = ('header', 'footer', 'footnotes', 'endnotes')
+    RELATIONSHIPS_NAMESPACE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+    # Namespace of r:embed, r:id and r:link attributes in document parts
+    REFERENCE_NAMESPACE = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    
+    def __init__(
+        self,
+        stats: Optional[RequestStats] = None,
+        blank_filter: Optional[BlankImageFilter] = None,
+        cancellation: Optional[CancellationToken] = None,
+        referenced_only: bool = False
+    ):
+        super().__init__(stats=stats, blank_filter=blank_filter, cancellation=cancellation)
+        self.referenced_only = referenced_only
+        # Uses of each image (by file name) extracted by the last batch; empty without `referenced_only`
+        self.occurrences: Dict[str, int] = {}
+        self._reference_counts: Dict[str, int] = {}
+    
+    def extract_batch(
+        self,
+        document_path: Union[str, bytes],
+        output_dir: str,
+        image_ids: Optional[List[str]] = None,
+        start: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        Extract up to `limit` images, resuming at position `start`.
+        
+        With `referenced_only`, positions index the referenced images in
+        reading order rather than the media folder.
+        """
+        self.occurrences = {}
+        extracted_files, next_position = super().extract_batch(
+            document_path, output_dir, image_ids=image_ids, start=start, limit=limit
+        )
+        if self.referenced_only:
+            self.occurrences = {
+                os.path.basename(path): self._reference_counts[os.path.basename(path)]
+                for path in extracted_files
+            }
+        return extracted_files, next_position
+    
+    def _media_entries(self, package: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+        """Media entries of the package: in archive order, or referenced images in reading order."""
+        if not self.referenced_only:
+            return super()._media_entries(package)
+        
+        with self.stats.stage("scan"):
+            counts: Dict[str, int] = {}
+            relationships = self._relationships(package, self.MAIN_PART)
+            self._count_image_references(package, self.MAIN_PART, relationships, counts)
+            for rel_type, part_name in relationships.values():
+                if rel_type in self.REFERENCING_PART_TYPES and part_name in package.NameToInfo:
+                    self._count_image_references(
+                        package, part_name, self._relationships(package, part_name), counts
+                    )
+        
+        entries = []
+        self._reference_counts = {}
+        for part_name, count in counts.items():
+            file_info = package.NameToInfo.get(part_name)
+            if file_info is None:
+                # Relationship to a part missing from the package
+                continue
+            entries.append(file_info)
+            self._reference_counts[os.path.basename(part_name)] = count
+        return entries
+    
+    def _relationships(self, package: zipfile.ZipFile, part_name: str) -> Dict[str, Tuple[str, str]]:
+        """Internal relationships of a part: id -> (short type such as 'image', target part name)."""
+        folder, name = posixpath.split(part_name)
+        rels_name = posixpath.join(folder, '_rels', name + '.rels')
+        if rels_name not in package.NameToInfo:
+            return {}
+        
+        relationships = {}
+        with package.open(rels_name) as stream:
+            for _, element in ET.iterparse(stream):
+                if element.tag == self.RELATIONSHIPS_NAMESPACE + 'Relationship' and \
+                        element.get('TargetMode') != 'External':
+                    # Targets are relative to the part's folder, or absolute from the package root
+                    target = posixpath.normpath(posixpath.join('/' + folder, element.get('Target', '')))
+                    relationships[element.get('Id')] = (element.get('Type', '').rsplit('/', 1)[-1], target[1:])
+                element.clear()
+        return relationships
+    
+    def _count_image_references(
+        self,
+        package: zipfile.ZipFile,
+        part_name: str,
+        relationships: Dict[str, Tuple[str, str]],
+        counts: Dict[str, int]
+    ) -> None:
+        """
+        Count the image references of a part into `counts`, in document order.
+        
+        The part is parsed incrementally and each element is dropped from the
+        tree once it ends, so memory stays bounded by the nesting depth
+        rather than the size of the document.
+        """
+        open_elements = []
+        with package.open(part_name) as stream:
+            for event, element in ET.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    for attribute, value in element.attrib.items():
+                        if attribute.startswith(self.REFERENCE_NAMESPACE):
+                            relationship = relationships.get(value)
+                            if relationship is not None and relationship[0] == 'image':
+                                counts[relationship[1]] = counts.get(relationship[1], 0) + 1
+                    open_elements.append(element)
+                else:
+                    open_elements.pop()
+                    element.clear()
+                    if open_elements:
+                        open_elements[-1].remove(element)
+                    if len(open_elements) <= 2:
+                        # Between the paragraphs and tables of the part
+                        self.cancellation.check()
+    
+    def get_docx_info(self, docx_path: str) -> dict:
+        """Get information about a Word document."""
+        return self.get_info(docx_path)
+
+
+class PowerPointImageExtractor(OOXMLMediaExtractor):
+    """Extract images from PowerPoint presentations."""
+    
+    media_prefix = 'ppt/media/'
+    document_type = 'PowerPoint presentation'
+
+
+class ExcelImageExtractor(OOXMLMediaExtractor):
+    """Extract images from Excel workbooks."""
+    
+    media_prefix = 'xl/media/'
+    document_type = 'Excel workbook'
+
+
+class ArchiveExtractor:
+    """
+    Extract images from every supported document inside a ZIP archive.
+    
+    Clients can bundle many documents into one request and pay the
+    per-request overhead once. Each member is read from the archive into
+    memory and handed to the PDF or Office extractor, so the archive is never
+    unpacked to disk; nested archives are not opened. Members are extracted
+    one at a time, so at most one member (up to `max_member_bytes`) is held
+    in memory, and an archive costs the scheduler no more than one document
+    of that size. Concurrency comes from running requests side by side. Images
+    are written flat into one output directory, prefixed with their member's
+    path (e.g. reports_q1.pdf_page_1_image_1.png). A member that cannot be
+    extracted is reported as failed in `documents` without failing the rest.
+    """
+    
+    def __init__(
+        self,
+        min_image_size: int = 10,
+        stats: Optional[RequestStats] = None,
+        blank_filter: Optional[BlankImageFilter] = None,
+        scan: str = "pages",
+        referenced_only: bool = False,
+        cancellation: Optional[CancellationToken] = None,
+        max_member_bytes: Optional[int] = None
+    ):
+        if scan not in PDFImageExtractor.SCAN_MODES:
+            raise ValueError(f"scan must be one of: {', '.join(PDFImageExtractor.SCAN_MODES)}")
+        self.min_image_size = min_image_size
+        self.stats = stats if stats is not None else RequestStats()
+        self.blank_filter = blank_filter
+        self.scan = scan
+        self.referenced_only = referenced_only
+        self.cancellation = cancellation if cancellation is not None else CancellationToken()
+        self.max_member_bytes = max_member_bytes if max_member_bytes is not None else ARCHIVE_MEMBER_MAX_BYTES
+        # Result of each member of the last extraction, in archive order
+        self.documents: List[dict] = []
+        # Uses of each extracted Word image (by output file name), with `referenced_only`
+        self.occurrences: Dict[str, int] = {}
+    
+    @staticmethod
+    def find_documents(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+        """Supported documents in the archive, in archive order (macOS metadata is skipped)."""
+        return [
+            file_info for file_info in archive.infolist()
+            if not file_info.is_dir() and not file_info.filename.startswith('__MACOSX/')
+            and FileUtils.is_supported_document(file_info.filename)
+        ]
+    
+    @staticmethod
+    def output_prefixes(members: List[zipfile.ZipInfo]) -> List[str]:
+        """A distinct output file name prefix for each member, derived from its path."""
+        prefixes = []
+        for file_info in members:
+            prefix = re.sub(r'[^\w.-]+', '_', file_info.filename).strip('_') or 'document'
+            candidate, suffix = prefix, 1
+            while candidate in prefixes:
+                suffix += 1
+                candidate = f"{prefix}_{suffix}"
+            prefixes.append(candidate)
+        return prefixes
+    
+    def extract_images(
+        self,
+        archive_path: str,
+        output_dir: str,
+        pages: Union[str, List, None] = None,
+        max_images: Optional[int] = None,
+        image_ids: Optional[List[Union[str, int]]] = None
+    ) -> List[str]:
+        """
+        Extract the images of every member; returns the image paths in archive order.
+        
+        `pages` applies to each PDF member and `max_images` caps the total.
+        """
+        if image_ids:
+            raise ValueError("image_ids cannot be used with ZIP archives, whose documents share image ids")
+        max_images = SelectionUtils.validate_max_images(max_images)
+        FileUtils.create_output_directory(output_dir)
+        self.documents, self.occurrences = [], {}
+        
+        try:
+            with self.stats.stage("open"):
+                archive = zipfile.ZipFile(archive_path, 'r')
+            
+            with archive:
+                members = self.find_documents(archive)
+                prefixes = self.output_prefixes(members)
+                images = []
+                for member, prefix in zip(members, prefixes):
+                    # Each member gets what is left of the budget; once it is spent,
+                    # the remaining members are listed but not opened
+                    remaining = max_images - len(images) if max_images is not None else None
+                    if remaining == 0:
+                        self.documents.append({"document": member.filename, "status": "skipped"})
+                        continue
+                    result, outputs, occurrences = self._extract_member(
+                        archive, member, prefix, output_dir, pages, remaining
+                    )
+                    images.extend(outputs)
+                    for path in outputs:
+                        if os.path.basename(path) in occurrences:
+                            self.occurrences[os.path.basename(path)] = occurrences[os.path.basename(path)]
+                    self.documents.append(result)
+        except Exception as e:
+            logger.error(f"Error extracting images from ZIP archive: {str(e)}")
+            raise
+        
+        return images
+    
+    def _extract_member(
+        self,
+        archive: zipfile.ZipFile,
+        file_info: zipfile.ZipInfo,
+        prefix: str,
+        output_dir: str,
+        pages: Union[str, List, None],
+        max_images: Optional[int]
+    ) -> Tuple[dict, List[str], Dict[str, int]]:
+        """Extract one member; returns its result, output paths and occurrence counts."""
+        self.cancellation.check()
+        member_stats = RequestStats()
+        blank_filter = BlankImageFilter(**self.blank_filter.options()) if self.blank_filter is not None else None
+        file_ext = FileUtils.get_file_extension(file_info.filename)
+        if file_ext == '.pdf':
+            extractor = PDFImageExtractor(
+                min_image_size=self.min_image_size, stats=member_stats, blank_filter=blank_filter,
+                scan=self.scan, cancellation=self.cancellation
+            )
+        elif file_ext == '.docx':
+            extractor = WordImageExtractor(
+                stats=member_stats, blank_filter=blank_filter, cancellation=self.cancellation,
+                referenced_only=self.referenced_only
+            )
+        else:
+            extractor = {'.pptx': PowerPointImageExtractor, '.xlsx': ExcelImageExtractor}[file_ext](
+                stats=member_stats, blank_filter=blank_filter, cancellation=self.cancellation
+            )
+        
+        # Each member is extracted into its own directory, then renamed into place
+        member_dir = tempfile.mkdtemp(prefix=".member_", dir=output_dir)
+        outputs = []
+        occurrences = {}
+        try:
+            if self.max_member_bytes and file_info.file_size > self.max_member_bytes:
+                raise ValueError(
+                    f"Document is {file_info.file_size} bytes, over the {self.max_member_bytes}-byte limit for archive members"
+                )
+            with member_stats.stage("read"), archive.open(file_info) as member:
+                document = member.read()
+            
+            if file_ext == '.pdf':
+                images = extractor.extract_images(document, member_dir, pages=pages, max_images=max_images)
+            else:
+                images = extractor.extract_images(document, member_dir, max_images=max_images)
+            
+            for image in images:
+                output_file = os.path.join(output_dir, f"{prefix}_{os.path.basename(image)}")
+                os.replace(image, output_file)
+                outputs.append(output_file)
+            if isinstance(extractor, WordImageExtractor):
+                occurrences = {f"{prefix}_{name}": count for name, count in extractor.occurrences.items()}
+            result = {
+                "document": file_info.filename,
+                "status": "extracted",
+                "extracted_images": len(outputs),
+                "image_files": [os.path.basename(path) for path in outputs]
+            }
+        except ExtractionCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Skipping archive member {file_info.filename}: {str(e)}")
+            result = {"document": file_info.filename, "status": "failed", "error": str(e)}
+        finally:
+            shutil.rmtree(member_dir, ignore_errors=True)
+            # Member stages nest in the caller's open stage, as they would inline
+            for name, duration in member_stats.durations.items():
+                self.stats.add_duration(name, duration / 1000)
+            if self.blank_filter is not None and blank_filter is not None:
+                self.blank_filter.rejected += blank_filter.rejected
+        
+        return result, outputs, occurrences
+    
+    def get_info(self, archive_path: str) -> dict:
+        """Get information about the documents in an archive."""
+        try:
+            with zipfile.ZipFile(archive_path, 'r') as archive:
+                documents = [file_info.filename for file_info in self.find_documents(archive)]
+            
+            return {
+                'file_size': os.path.getsize(archive_path),
+                'document_count': len(documents),
+                'documents': documents
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting ZIP archive info: {str(e)}")
+            raise
+
+
+class OutputSinkError(RuntimeError):
+    """Raised when extraction outputs cannot be stored in the output sink."""
+
+
+class OutputSink:
+    """
+    Destination for extraction outputs that are returned by reference.
+    
+    Instead of base64-encoding the extracted files into the response, they are
+    stored in the sink and the response lists their keys and URLs, keeping
+    large payloads off the API process. Files are uploaded concurrently by up
+    to `max_concurrency` threads. Subclasses implement `put_file`.
+    """
+    
+    kind = "sink"
+    
+    def __init__(self, prefix: str = "", max_concurrency: int = 8):
+        prefix = prefix.strip("/")
+        self.prefix = f"{prefix}/" if prefix else ""
+        self.max_concurrency = max(1, max_concurrency)
+    
+    def put_file(self, key: str, file_path: str, mime_type: str) -> str:
+        """Store a file under `key` and return a URL for it."""
+        raise NotImplementedError
+    
+    def publish(self, file_paths: List[str], namespace: Optional[str] = None) -> List[dict]:
+        """
+        Store files under `<prefix><namespace>/<filename>`, uploading concurrently.
+        
+        `namespace` defaults to a random identifier, so that concurrent
+        extractions never overwrite each other's objects. Returns a
+        `{"filename", "mime_type", "size", "key", "url"}` entry per file, in the
+        order of `file_paths`.
+        """
+        namespace = namespace or uuid.uuid4().hex
+        
+        def upload(file_path: str) -> dict:
+            filename = os.path.basename(file_path)
+            mime_type = Base64Utils.get_mime_type(file_path)
+            key = f"{self.prefix}{namespace}/{filename}"
+            return {
+                "filename": filename,
+                "mime_type": mime_type,
+                "size": os.path.getsize(file_path),
+                "key": key,
+                "url": self.put_file(key, file_path, mime_type)
+            }
+        
+        if len(file_paths) < 2 or self.max_concurrency == 1:
+            return [upload(file_path) for file_path in file_paths]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(file_paths))) as pool:
+            return list(pool.map(upload, file_paths))
+    
+    @staticmethod
+    def from_environment() -> Optional["OutputSink"]:
+        """Build the sink selected by DOC_EXTRACTOR_OUTPUT_SINK (none when unset)."""
+        kind = os.environ.get("DOC_EXTRACTOR_OUTPUT_SINK", "").strip().lower()
+        if not kind:
+            return None
+        
+        common = {
+            "prefix": os.environ.get("DOC_EXTRACTOR_SINK_PREFIX", ""),
+            "max_concurrency": int(os.environ.get("DOC_EXTRACTOR_SINK_CONCURRENCY", "8"))
+        }
+        if kind == "local":
+            directory = os.environ.get("DOC_EXTRACTOR_SINK_DIR")
+            if not directory:
+                raise ValueError("DOC_EXTRACTOR_SINK_DIR is required for the local output sink")
+            return LocalDirectorySink(
+                directory, base_url=os.environ.get("DOC_EXTRACTOR_SINK_BASE_URL") or None, **common
+            )
+        if kind == "s3":
+            endpoint_url = os.environ.get("DOC_EXTRACTOR_S3_ENDPOINT")
+            bucket = os.environ.get("DOC_EXTRACTOR_S3_BUCKET")
+            if not endpoint_url or not bucket:
+                raise ValueError("DOC_EXTRACTOR_S3_ENDPOINT and DOC_EXTRACTOR_S3_BUCKET are required for the s3 output sink")
+            return S3Sink(
+                endpoint_url,
+                bucket,
+                access_key=os.environ.get("DOC_EXTRACTOR_S3_ACCESS_KEY") or os.environ.get("AWS_ACCESS_KEY_ID", ""),
+                secret_key=os.environ.get("DOC_EXTRACTOR_S3_SECRET_KEY") or os.environ.get("AWS_SECRET_ACCESS_KEY", ""),
+                region=os.environ.get("DOC_EXTRACTOR_S3_REGION", "us-east-1"),
+                url_expiry=int(os.environ.get("DOC_EXTRACTOR_S3_URL_EXPIRY", "3600")),
+                **common
+            )
+        raise ValueError(f"Unknown output sink: {kind}. Supported sinks: local, s3")
+
+
+class LocalDirectorySink(OutputSink):
+    """
+    Store outputs in a local directory, e.g. a shared volume or one served by a
+    web server. URLs are built from `base_url` if given, else they are file:// URLs.
+    """
+    
+    kind = "local"
+    
+    def __init__(self, directory: str, base_url: Optional[str] = None, prefix: str = "", max_concurrency: int = 8):
+        super().__init__(prefix, max_concurrency)
+        self.directory = os.path.abspath(directory)
+        self.base_url = base_url.rstrip("/") if base_url else None
+    
+    def put_file(self, key: str, file_path: str, mime_type: str) -> str:
+        target = os.path.join(self.directory, *key.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Copy next to the target first so readers never see a partial file
+        staging_path = f"{target}.part"
+        shutil.copyfile(file_path, staging_path)
+        os.replace(staging_path, target)
+        if self.base_url:
+            return f"{self.base_url}/{urllib.parse.quote(key)}"
+        return Path(target).as_uri()
+
+
+class MemorySink(OutputSink):
+    """
+    Keep outputs in memory, for tests and embedding; URLs use the memory:// scheme.
+    
+    Not selectable through DOC_EXTRACTOR_OUTPUT_SINK: the outputs would grow
+    without bound in a long-running server. Assign an instance to
+    ``server.output_sink`` instead.
+    """
+    
+    kind = "memory"
+    
+    def __init__(self, prefix: str = "", max_concurrency: int = 8):
+        super().__init__(prefix, max_concurrency)
+        self.objects: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+    
+    def put_file(self, key: str, file_path: str, mime_type: str) -> str:
+        data = Path(file_path).read_bytes()
+        with self._lock:
+            self.objects[key] = data
+        return f"memory://{key}"
+    
+    def get(self, key: str) -> bytes:
+        """Return the stored object; raises KeyError if there is none."""
+        with self._lock:
+            return self.objects[key]
+
+
+class S3Sink(OutputSink):
+    """
+    Store outputs in an S3-compatible object store (AWS S3, MinIO, Ceph, ...).
+    
+    Objects are written with path-style PUT requests signed with AWS Signature
+    Version 4, so no SDK is needed, and the returned URLs are presigned GET
+    URLs valid for `url_expiry` seconds. `client` may be an httpx.Client to
+    send the requests with, e.g. one with a mock transport in tests.
+    """
+    
+    kind = "s3"
+    
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        url_expiry: int = 3600,
+        prefix: str = "",
+        max_concurrency: int = 8,
+        client: Optional[httpx.Client] = None
+    ):
+        super().__init__(prefix, max_concurrency)
+        endpoint = urllib.parse.urlsplit(endpoint_url)
+        self.origin = f"{endpoint.scheme}://{endpoint.netloc}"
+        self.base_path = endpoint.path.rstrip("/")
+        self.host = endpoint.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.url_expiry = url_expiry
+        self.client = client if client is not None else httpx.Client(timeout=60.0)
+    
+    def object_path(self, key: str) -> str:
+        """URI-encoded path of an object (path-style addressing)."""
+        return urllib.parse.quote(f"{self.base_path}/{self.bucket}/{key}", safe="/-_.~")
+    
+    def put_file(self, key: str, file_path: str, mime_type: str) -> str:
+        path = self.object_path(key)
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        headers = {
+            "host": self.host,
+            "content-type": mime_type,
+            "x-amz-content-sha256": FileUtils.compute_file_hash(file_path),
+            "x-amz-date": amz_date
+        }
+        scope, signed_headers, signature = self.sign(
+            "PUT", path, {}, headers, headers["x-amz-content-sha256"], amz_date
+        )
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        
+        try:
+            with open(file_path, 'rb') as f:
+                response = self.client.put(self.origin + path, content=f, headers=headers)
+        except httpx.HTTPError as e:
+            raise OutputSinkError(f"Upload of {key} failed: {str(e)}") from e
+        if response.status_code >= 300:
+            raise OutputSinkError(f"Upload of {key} failed: HTTP {response.status_code} {response.text[:200]}")
+        return self.presigned_url(key)
+    
+    def presigned_url(self, key: str, amz_date: Optional[str] = None) -> str:
+        """Presigned GET URL for an object, valid for `url_expiry` seconds from `amz_date` (now)."""
+        path = self.object_path(key)
+        amz_date = amz_date or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{self.credential_scope(amz_date)}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(self.url_expiry),
+            "X-Amz-SignedHeaders": "host"
+        }
+        _, _, signature = self.sign("GET", path, query, {"host": self.host}, "UNSIGNED-PAYLOAD", amz_date)
+        query["X-Amz-Signature"] = signature
+        return f"{self.origin}{path}?{self._canonical_query(query)}"
+    
+    def credential_scope(self, amz_date: str) -> str:
+        return f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+    
+    def sign(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, str],
+        headers: Dict[str, str],
+        payload_hash: str,
+        amz_date: str
+    ) -> Tuple[str, str, str]:
+        """Return the credential scope, signed header list and AWS SigV4 signature of a request."""
+        canonical_headers = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+        signed_headers = ";".join(sorted(canonical_headers))
+        canonical_request = "\n".join([
+            method,
+            path,
+            self._canonical_query(query),
+            "".join(f"{name}:{canonical_headers[name]}\n" for name in sorted(canonical_headers)),
+            signed_headers,
+            payload_hash
+        ])
+        scope = self.credential_scope(amz_date)
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+        
+        signing_key = f"AWS4{self.secret_key}".encode('utf-8')
+        for part in (amz_date[:8], self.region, "s3", "aws4_request"):
+            signing_key = hmac.new(signing_key, part.encode('utf-8'), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+        return scope, signed_headers, signature
+    
+    @staticmethod
+    def _canonical_query(query: Dict[str, str]) -> str:
+        return "&".join(
+            f"{urllib.parse.quote(name, safe='-_.~')}={urllib.parse.quote(value, safe='-_.~')}"
+            for name, value in sorted(query.items())
+        )
+
+
+class DocumentExtractor:
+    """Unified document image extractor for PDF and Office documents."""
+    
+    # Suffix of the default output directory per document type
+    OUTPUT_DIR_SUFFIXES = {
+        '.pdf': 'pdf_images',
+        '.docx': 'word_images',
+        '.pptx': 'powerpoint_images',
+        '.xlsx': 'excel_images',
+        '.zip': 'archive_images'
+    }
+    
+    def __init__(
+        self,
+        min_image_size: int = 10,
+        create_zip: bool = True,
+        stats: Optional[RequestStats] = None,
+        duplicate_filter: Optional[NearDuplicateFilter] = None,
+        blank_filter: Optional[BlankImageFilter] = None,
+        output_sink: Optional[OutputSink] = None,
+        document_cache: Optional[DocumentHandleCache] = None,
+        scan: str = "pages",
+        cancellation: Optional[CancellationToken] = None,
+        referenced_only: bool = False
+    ):
+        self.min_image_size = min_image_size
+        self.create_zip = create_zip
+        self.stats = stats if stats is not None else RequestStats()
+        self.cancellation = cancellation if cancellation is not None else CancellationToken()
+        self.duplicate_filter = duplicate_filter
+        self.blank_filter = blank_filter
+        self.output_sink = output_sink
+        # Near-duplicate groups (file names) found by the last extraction
+        self.similar_image_groups: List[List[str]] = []
+        # Uses of each image in a Word document extracted with `referenced_only`
+        self.image_occurrences: Dict[str, int] = {}
+        # Result of each document of an extracted ZIP archive (None for other documents)
+        self.archive_documents: Optional[List[dict]] = None
+        # Objects stored in the output sink by the last extraction (None without a sink)
+        self.published_images: Optional[List[dict]] = None
+        self.published_zip: Optional[dict] = None
+        self.pdf_extractor = PDFImageExtractor(
+            min_image_size=min_image_size, stats=self.stats, blank_filter=blank_filter,
+            document_cache=document_cache, scan=scan, cancellation=self.cancellation
+        )
+        self.word_extractor = WordImageExtractor(
+            stats=self.stats, blank_filter=blank_filter, cancellation=self.cancellation,
+            referenced_only=referenced_only
+        )
+        self.ooxml_extractors = {
+            '.docx': self.word_extractor,
+            '.pptx': PowerPointImageExtractor(
+                stats=self.stats, blank_filter=blank_filter, cancellation=self.cancellation
+            ),
+            '.xlsx': ExcelImageExtractor(
+                stats=self.stats, blank_filter=blank_filter, cancellation=self.cancellation
+            )
+        }
+        self.archive_extractor = ArchiveExtractor(
+            min_image_size=min_image_size, stats=self.stats, blank_filter=blank_filter,
+            scan=scan, referenced_only=referenced_only, cancellation=self.cancellation
+        )
+    
+    def extract_images(
+        self,
+        document_path: str,
+        output_dir: Optional[str] = None,
+        pages: Union[str, List, None] = None,
+        max_images: Optional[int] = None,
+        image_ids: Optional[List[Union[str, int]]] = None,
+        incremental: bool = False,
+        force: bool = False
+    ) -> Tuple[List[str], str, Optional[str]]:
+        """
+        Extract images from a document and optionally create a ZIP file.
+        
+        `pages` (PDF only), `max_images` and `image_ids` restrict extraction to
+        a subset of the document; by default every image is extracted. For
+        Word documents extracted with `referenced_only`, `image_occurrences`
+        holds the number of uses of each extracted image. A ZIP archive is
+        extracted document by document (see ArchiveExtractor) into a single
+        output directory and ZIP file, with `archive_documents` describing
+        each document.
+        
+        With `incremental`, a manifest is kept in the output directory and
+        unchanged documents are not re-extracted (see ExtractionManifest);
+        `force` rewrites every output while still updating the manifest.
+        With an output sink, the images and ZIP file are also stored there
+        (see `published_images` and `published_zip`).
+        """
+        file_ext = self._validate_document(document_path)
+        
+        if output_dir is None:
+            output_dir = self.default_output_dir(document_path)
+        
+        if incremental:
+            extracted_images, output_dir, zip_path = self._extract_incremental(
+                document_path, output_dir, file_ext,
+                pages=pages, max_images=max_images, image_ids=image_ids, force=force
+            )
+        else:
+            extracted_images = self._extract_to_directory(
+                document_path, output_dir, file_ext,
+                pages=pages, max_images=max_images, image_ids=image_ids
+            )
+            
+            # Create ZIP file by default if images were extracted
+            zip_path = None
+            if self.create_zip and extracted_images:
+                zip_path = self._create_zip_archive(document_path, extracted_images, output_dir)
+        
+        self._publish(extracted_images, zip_path)
+        return extracted_images, output_dir, zip_path
+    
+    @staticmethod
+    def default_output_dir(document_path: str) -> str:
+        """Default output directory for a document: <name>_<type>_images next to it."""
+        doc_name = os.path.splitext(os.path.basename(document_path))[0]
+        suffix = DocumentExtractor.OUTPUT_DIR_SUFFIXES.get(
+            FileUtils.get_file_extension(document_path), 'images'
+        )
+        return os.path.join(os.path.dirname(document_path), f"{doc_name}_{suffix}")
+    
+    def _extract_to_directory(
+        self,
+        document_path: str,
+        output_dir: str,
+        file_ext: str,
+        pages: Union[str, List, None] = None,
+        max_images: Optional[int] = None,
+        image_ids: Optional[List[Union[str, int]]] = None
+    ) -> List[str]:
+        """Dispatch extraction to the extractor for the document type."""
+        self.archive_documents = None
+        if file_ext == '.pdf':
+            images = self.pdf_extractor.extract_images(
+                document_path, output_dir,
+                pages=pages, max_images=max_images, image_ids=image_ids
+            )
+        elif file_ext in FileUtils.ARCHIVE_EXTENSIONS:
+            images = self.archive_extractor.extract_images(
+                document_path, output_dir,
+                pages=pages, max_images=max_images, image_ids=image_ids
+            )
+            self.archive_documents = self.archive_extractor.documents
+        else:  # Office Open XML
+            images = self.ooxml_extractors[file_ext].extract_images(
+                document_path, output_dir,
+                max_images=max_images, image_ids=image_ids
+            )
+        images = self._filter_similar(images)
+        self._record_occurrences(file_ext, images)
+        return images
+    
+    def _filter_similar(self, images: List[str]) -> List[str]:
+        """Apply the near-duplicate filter, if any, recording the groups found."""
+        self.similar_image_groups = []
+        if self.duplicate_filter is None or len(images) < 2:
+            return images
+        
+        with self.stats.stage("dedup"):
+            images, groups = self.duplicate_filter.apply(images)
+        self.similar_image_groups = [[os.path.basename(path) for path in group] for group in groups]
+        return images
+    
+    def _record_occurrences(self, file_ext: str, images: List[str]) -> None:
+        """Keep the Word and archive extractors' occurrence counts of the images that were kept."""
+        occurrences = {
+            '.docx': self.word_extractor.occurrences,
+            '.zip': self.archive_extractor.occurrences
+        }.get(file_ext, {})
+        self.image_occurrences = {
+            os.path.basename(path): occurrences[os.path.basename(path)]
+            for path in images if os.path.basename(path) in occurrences
+        }
+    
+    def _publish(self, images: List[str], zip_path: Optional[str]) -> None:
+        """Store the extracted images and ZIP file in the output sink, if any."""
+        self.published_images, self.published_zip = None, None
+        if self.output_sink is None:
+            return
+        
+        self.cancellation.check()
+        files = images + ([zip_path] if zip_path else [])
+        with self.stats.stage("upload"):
+            published = self.output_sink.publish(files)
+        self.published_images = published[:len(images)]
+        if zip_path:
+            self.published_zip = published[-1]
+    
+    @property
+    def skipped_blank_images(self) -> int:
+        """Number of blank images rejected so far by the blank image filter."""
+        return self.blank_filter.rejected if self.blank_filter is not None else 0
+    
+    def _extract_incremental(
+        self,
+        document_path: str,
+        output_dir: str,
+        file_ext: str,
+        pages: Union[str, List, None] = None,
+        max_images: Optional[int] = None,
+        image_ids: Optional[List[Union[str, int]]] = None,
+        force: bool = False
+    ) -> Tuple[List[str], str, Optional[str]]:
+        """
+        Extract images, reusing the outputs of a previous run where possible.
+        
+        If the document and options match the manifest and the outputs are still
+        on disk, nothing is extracted. Otherwise images are extracted to a
+        staging directory and only new or changed files are moved into place;
+        files from the previous run that are no longer produced are removed.
+        A manifest written for another document sharing `output_dir` is
+        ignored, so that document's images are neither reused nor removed.
+        """
+        options = {
+            "min_image_size": self.min_image_size,
+            "create_zip": self.create_zip,
+            "pages": pages,
+            "max_images": max_images,
+            "image_ids": image_ids
+        }
+        if self.duplicate_filter is not None:
+            options["similar_images"] = self.duplicate_filter.options()
+        if self.blank_filter is not None:
+            options["skip_blank_images"] = self.blank_filter.options()
+        if self.pdf_extractor.scan != "pages":
+            options["scan"] = self.pdf_extractor.scan
+        if self.word_extractor.referenced_only:
+            options["referenced_only"] = True
+        previous = ExtractionManifest.load(output_dir)
+        if previous and previous.source.get("path") != os.path.abspath(document_path):
+            previous = None
+        source = ExtractionManifest.describe_source(
+            document_path, previous.source if previous else None
+        )
+        
+        if not force and previous and previous.is_current(source, options, output_dir):
+            logger.info(f"Document unchanged since last extraction, skipping: {document_path}")
+            self.similar_image_groups = previous.similar_image_groups
+            self.image_occurrences = {
+                image["filename"]: image["occurrences"] for image in previous.images if "occurrences" in image
+            }
+            return previous.image_paths(output_dir), output_dir, previous.zip_path
+        
+        FileUtils.create_output_directory(output_dir)
+        staging_dir = tempfile.mkdtemp(prefix=".staging_", dir=output_dir)
+        previous_images = {image["filename"]: image for image in previous.images} if previous else {}
+        changed = force or previous is None or previous.source["sha256"] != source["sha256"]
+        images = []
+        
+        try:
+            staged_images = self._extract_to_directory(
+                document_path, staging_dir, file_ext,
+                pages=pages, max_images=max_images, image_ids=image_ids
+            )
+            
+            for staged_path in staged_images:
+                filename = os.path.basename(staged_path)
+                image = {
+                    "filename": filename,
+                    "sha256": FileUtils.compute_file_hash(staged_path),
+                    "size": os.path.getsize(staged_path)
+                }
+                if filename in self.image_occurrences:
+                    image["occurrences"] = self.image_occurrences[filename]
+                target = os.path.join(output_dir, filename)
+                if force or not ExtractionManifest.output_matches(previous_images.get(filename), target) or \
+                        previous_images[filename]["sha256"] != image["sha256"]:
+                    os.replace(staged_path, target)
+                    changed = True
+                images.append(image)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        
+        # Remove outputs of the previous run that are no longer produced
+        current_names = {image["filename"] for image in images}
+        for filename in previous_images:
+            if filename not in current_names:
+                stale_path = os.path.join(output_dir, filename)
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+                changed = True
+        
+        extracted_images = [os.path.join(output_dir, image["filename"]) for image in images]
+        zip_path = None
+        if self.create_zip and extracted_images:
+            zip_path = previous.zip_path if previous else None
+            if changed or not zip_path or not os.path.exists(zip_path):
+                zip_path = self._create_zip_archive(document_path, extracted_images, output_dir)
+        
+        ExtractionManifest(source, options, images, zip_path, self.similar_image_groups).save(output_dir)
+        return extracted_images, output_dir, zip_path
+    
+    def extract_batch(
+        self,
+        document_path: str,
+        output_dir: str,
+        pages: Union[str, List, None] = None,
+        image_ids: Optional[List[Union[str, int]]] = None,
+        start: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        Extract one batch of images for paginated extraction.
+        
+        Returns the extracted files and the position to resume from (None when
+        the document is exhausted). No ZIP archive is created for batches, and
+        near-duplicates are only detected within a batch. With an output sink,
+        the batch's images are also stored there.
+        """
+        file_ext = self._validate_document(document_path)
+        if file_ext in FileUtils.ARCHIVE_EXTENSIONS:
+            raise ValueError("ZIP archives cannot be extracted in batches; omit page_size and cursor")
+        
+        if file_ext == '.pdf':
+            images, next_position = self.pdf_extractor.extract_batch(
+                document_path, output_dir,
+                pages=pages, image_ids=image_ids, start=start, limit=limit
+            )
+        else:  # Office Open XML
+            images, next_position = self.ooxml_extractors[file_ext].extract_batch(
+                document_path, output_dir,
+                image_ids=image_ids, start=start, limit=limit
+            )
+        images = self._filter_similar(images)
+        self._record_occurrences(file_ext, images)
+        self._publish(images, None)
+        return images, next_position
+    
+    def _validate_document(self, document_path: str) -> str:
+        """Check that a document exists and is supported; return its extension."""
+        if not FileUtils.validate_file_exists(document_path):
+            raise FileNotFoundError(f"Document not found: {document_path}")
+        
+        if not FileUtils.is_supported_document(document_path) and not FileUtils.is_archive(document_path):
+            ext = FileUtils.get_file_extension(document_path)
+            raise ValueError(
+                f"Unsupported file type: {ext}. Supported types: "
+                f"{', '.join(FileUtils.SUPPORTED_EXTENSIONS + FileUtils.ARCHIVE_EXTENSIONS)}"
+            )
+        
+        return FileUtils.get_file_extension(document_path)
+    
+    def _create_zip_archive(self, document_path: str, extracted_images: List[str], output_dir: str) -> str:
+        """Create a ZIP archive containing the original document and extracted images."""
+        self.cancellation.check()
+        doc_name = os.path.splitext(os.path.basename(document_path))[0]
+        zip_name = f"{doc_name}_Document_and_Images.zip"
+        zip_path = os.path.join(os.path.dirname(document_path), zip_name)
+        
+        try:
+            with self.stats.stage("zip"), zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                # Add the original document
+                zipf.write(document_path, f"original_document/{os.path.basename(document_path)}")
+                
+                # Add all extracted images
+                for image_path in extracted_images:
+                    image_name = os.path.basename(image_path)
+                    zipf.write(image_path, f"extracted_images/{image_name}")
+            
+            logger.info(f"Created ZIP archive: {zip_path}")
+            return zip_path
+            
+        except Exception as e:
+            logger.error(f"Error creating ZIP archive: {e}")
+            return None
+    
+    def get_document_info(self, document_path: str) -> dict:
+        """Get information about a document."""
+        if not FileUtils.validate_file_exists(document_path):
+            raise FileNotFoundError(f"Document not found: {document_path}")
+        
+        file_ext = FileUtils.get_file_extension(document_path)
+        
+        if file_ext == '.pdf':
+            return self.pdf_extractor.get_pdf_info(document_path)
+        elif file_ext in self.ooxml_extractors:
+            return self.ooxml_extractors[file_ext].get_info(document_path)
+        elif file_ext in FileUtils.ARCHIVE_EXTENSIONS:
+            return self.archive_extractor.get_info(document_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+class ExtractionManifest:
+    """
+    Record of a path-based extraction, written next to its outputs.
+    
+    Stores the source document's size, mtime and SHA-256, the extraction
+    options, and the name, hash and size of every extracted image, so a re-run
+    can tell whether anything needs to be extracted or rewritten.
+    """
+    
+    FILENAME = ".extraction_manifest.json"
+    VERSION = 1
+    
+    def __init__(
+        self,
+        source: dict,
+        options: dict,
+        images: List[dict],
+        zip_path: Optional[str],
+        similar_image_groups: Optional[List[List[str]]] = None
+    ):
+        self.source = source
+        self.options = options
+        self.images = images
+        self.zip_path = zip_path
+        self.similar_image_groups = similar_image_groups or []
+    
+    @classmethod
+    def load(cls, output_dir: str) -> Optional["ExtractionManifest"]:
+        """Load the manifest from an output directory, or None if absent or unreadable."""
+        manifest_path = os.path.join(output_dir, cls.FILENAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != cls.VERSION:
+                return None
+            return cls(
+                data["source"], data["options"], data["images"],
+                data.get("zip_path"), data.get("similar_image_groups")
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def save(self, output_dir: str) -> None:
+        """Write the manifest atomically into the output directory."""
+        manifest_path = os.path.join(output_dir, self.FILENAME)
+        temp_path = manifest_path + ".tmp"
+        data = {
+            "version": self.VERSION,
+            "source": self.source,
+            "options": self.options,
+            "images": self.images,
+            "zip_path": self.zip_path
+        }
+        if self.similar_image_groups:
+            data["similar_image_groups"] = self.similar_image_groups
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, manifest_path)
+    
+    @staticmethod
+    def describe_source(document_path: str, previous: Optional[dict] = None) -> dict:
+        """
+        Describe a source document by size, mtime and hash.
+        
+        The hash of `previous` is reused when size and mtime are unchanged, so an
+        unchanged document is not read again.
+        """
+        stat = os.stat(document_path)
+        source = {
+            "path": os.path.abspath(document_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            source["sha256"] = previous["sha256"]
+        else:
+            source["sha256"] = FileUtils.compute_file_hash(document_path)
+        return source
+    
+    @staticmethod
+    def output_matches(image: Optional[dict], path: str) -> bool:
+        """Check that a recorded image is still on disk with its recorded size."""
+        return image is not None and os.path.isfile(path) and os.path.getsize(path) == image["size"]
+    
+    def is_current(self, source: dict, options: dict, output_dir: str) -> bool:
+        """Check whether this manifest already describes extracting `source` with `options`."""
+        if self.source["sha256"] != source["sha256"] or self.options != options:
+            return False
+        if self.zip_path and not os.path.isfile(self.zip_path):
+            return False
+        return all(
+            self.output_matches(image, os.path.join(output_dir, image["filename"]))
+            for image in self.images
+        )
+    
+    def image_paths(self, output_dir: str) -> List[str]:
+        """Full paths of the recorded images."""
+        return [os.path.join(output_dir, image["filename"]) for image in self.images]
+
+
+class CursorUtils:
+    """
+    Encode and decode opaque continuation cursors for paginated extraction.
+    
+    Cursors carry the extraction options of the first request, so they are
+    signed with HMAC-SHA256 under CURSOR_SECRET: a client cannot alter them,
+    and decoded options are validated again before they are used.
+    """
+    
+    VERSION = 2
+    STATE_KEYS = ("doc", "name", "pos", "emitted", "opts")
+    OPTION_KEYS = (
+        "min_image_size", "pages", "max_images", "image_ids",
+        "similar_images", "skip_blank_images", "scan", "referenced_only"
+    )
+    
+    @staticmethod
+    def _b64(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def _sign(payload: str) -> str:
+        return CursorUtils._b64(hmac.new(CURSOR_SECRET, payload.encode('ascii'), hashlib.sha256).digest())
+    
+    @staticmethod
+    def encode(state: dict) -> str:
+        """Encode cursor state as a signed, URL-safe token."""
+        payload = CursorUtils._b64(
+            json.dumps({"v": CursorUtils.VERSION, **state}, separators=(',', ':')).encode('utf-8')
+        )
+        return f"{payload}.{CursorUtils._sign(payload)}"
+    
+    @staticmethod
+    def decode(cursor: str) -> dict:
+        """Decode a cursor token, raising ValueError if it is malformed, unsigned or altered."""
+        try:
+            payload, signature = cursor.split('.')
+            if not hmac.compare_digest(signature, CursorUtils._sign(payload)):
+                raise ValueError("bad signature")
+            state = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        
+        if not isinstance(state, dict) or state.get("v") != CursorUtils.VERSION:
+            raise ValueError("Invalid cursor")
+        for key in CursorUtils.STATE_KEYS:
+            if key not in state:
+                raise ValueError("Invalid cursor")
+        CursorUtils.validate_options(state["opts"])
+        return state
+    
+    @staticmethod
+    def validate_options(opts: dict) -> None:
+        """Check the shape and ranges of a cursor's extraction options, raising ValueError."""
+        def check(valid: bool) -> None:
+            if not valid:
+                raise ValueError("Invalid cursor")
+        
+        def is_int(value) -> bool:
+            return isinstance(value, int) and not isinstance(value, bool)
+        
+        check(isinstance(opts, dict) and set(opts) == set(CursorUtils.OPTION_KEYS))
+        check(is_int(opts["min_image_size"]) and opts["min_image_size"] >= 0)
+        check(opts["pages"] is None or isinstance(opts["pages"], (str, int, list)))
+        check(opts["max_images"] is None or (is_int(opts["max_images"]) and opts["max_images"] >= 0))
+        check(opts["image_ids"] is None or isinstance(opts["image_ids"], (str, int, list)))
+        check(opts["scan"] in PDFImageExtractor.SCAN_MODES)
+        check(isinstance(opts["referenced_only"], bool))
+        
+        similar = opts["similar_images"]
+        check(similar is None or (
+            isinstance(similar, dict) and set(similar) == {"action", "threshold", "method"}
+            and similar["action"] in NearDuplicateFilter.ACTIONS
+            and similar["method"] in NearDuplicateFilter.METHODS
+            and is_int(similar["threshold"]) and 0 <= similar["threshold"] <= 64
+        ))
+        blank = opts["skip_blank_images"]
+        check(blank is None or (
+            isinstance(blank, dict) and set(blank) == {"max_variance", "near_white_ratio", "near_white_level"}
+            and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in blank.values())
+        ))
+
+
+class ExtractionCheckpointCache:
+    """
+    Content-hash keyed store of decoded documents for paginated extraction.
+    
+    The first batch of a paginated extraction stores the decoded document here;
+    later batches find it by the hash carried in their cursor, so clients send
+    the document once and each batch resumes without re-decoding it. Entries
+    expire after `ttl_seconds` and the least recently used are evicted beyond
+    `max_entries`, on access and from `run_expiry`, so the files of finished
+    paginations do not wait for the next paginated request. Lookups touch
+    their file, so a file's age on disk is its idle time. With a
+    `workspace_manager`, each file's bytes are reserved against the scratch
+    quota until it is evicted; when the quota is reached, the least recently
+    used entries are evicted to make room. Safe to use from extraction worker
+    threads.
+    """
+    
+    HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_entries: int = 32,
+        ttl_seconds: int = 1800,
+        workspace_manager: Optional["ScratchWorkspaceManager"] = None
+    ):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "mcp_doc_checkpoints")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.workspace_manager = workspace_manager
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def store(self, document_path: str, doc_hash: Optional[str] = None) -> str:
+        """Move a decoded document into the cache and return its content hash."""
+        if doc_hash is None:
+            doc_hash = FileUtils.compute_file_hash(document_path)
+        
+        FileUtils.create_output_directory(self.cache_dir)
+        cached_path = os.path.join(
+            self.cache_dir, doc_hash + FileUtils.get_file_extension(document_path)
+        )
+        size_bytes = os.path.getsize(document_path)
+        with self._lock:
+            # The document leaves its workspace, so that workspace's reservation shrinks
+            self._reserve(cached_path, size_bytes, source=os.path.dirname(document_path))
+            try:
+                os.replace(document_path, cached_path)
+            except OSError:
+                if doc_hash not in self._entries and self.workspace_manager is not None:
+                    self.workspace_manager.unreserve(cached_path)
+                raise
+            self._entries[doc_hash] = (cached_path, time.monotonic())
+            self._entries.move_to_end(doc_hash)
+            self._evict()
+        return doc_hash
+    
+    def lookup(self, doc_hash: str) -> Optional[str]:
+        """Return the cached document path for a hash, or None if it has expired."""
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(doc_hash)
+            if entry is None:
+                return None
+            if not os.path.exists(entry[0]):
+                self._remove(doc_hash)
+                return None
+            
+            self._entries[doc_hash] = (entry[0], time.monotonic())
+            self._entries.move_to_end(doc_hash)
+            try:
+                os.utime(entry[0])
+            except OSError:
+                pass
+            return entry[0]
+    
+    def recover(self) -> int:
+        """
+        Index the checkpoints left in `cache_dir` by an earlier process.
+        
+        Each file is adopted with its modification time as its last use, so
+        files older than `ttl_seconds` are removed at once and the rest expire
+        like any other entry; cursors signed with a shared
+        DOC_EXTRACTOR_CURSOR_SECRET keep working across a restart. Returns the
+        number of entries indexed afterwards.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        now, wall_clock = time.monotonic(), time.time()
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            doc_hash = os.path.splitext(entry.name)[0]
+            if not self.HASH_PATTERN.fullmatch(doc_hash) or not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            found.append((doc_hash, entry.path, stat.st_size, now - max(0.0, wall_clock - stat.st_mtime)))
+        
+        with self._lock:
+            for doc_hash, path, size_bytes, last_used in found:
+                if doc_hash in self._entries:
+                    continue
+                if self.workspace_manager is not None:
+                    try:
+                        self.workspace_manager.reserve(path, size_bytes)
+                    except WorkspaceQuotaExceeded:
+                        # No room left for it: the file goes rather than the quota
+                        self._entries[doc_hash] = (path, last_used)
+                        self._remove(doc_hash)
+                        continue
+                self._entries[doc_hash] = (path, last_used)
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1][1]))
+            self._evict()
+            return len(self._entries)
+    
+    def expire(self) -> None:
+        """Drop expired entries now rather than on the next store or lookup."""
+        with self._lock:
+            self._evict()
+    
+    async def run_expiry(self, interval_seconds: int = 300) -> None:
+        """Index leftover checkpoints now, then expire entries every `interval_seconds`."""
+        maintenance = self.recover
+        while True:
+            try:
+                await asyncio.to_thread(maintenance)
+            except Exception as e:
+                logger.warning(f"Checkpoint expiry failed: {str(e)}")
+            maintenance = self.expire
+            await asyncio.sleep(interval_seconds)
+    
+    def _evict(self) -> None:
+        """Drop expired entries and the least recently used ones over capacity."""
+        now = time.monotonic()
+        for doc_hash, (path, last_used) in list(self._entries.items()):
+            if now - last_used > self.ttl_seconds or len(self._entries) > self.max_entries:
+                self._remove(doc_hash)
+    
+    def _reserve(self, path: str, size_bytes: int, source: Optional[str] = None) -> None:
+        """Reserve quota for a checkpoint file, evicting the least recently used entries if needed."""
+        if self.workspace_manager is None:
+            return
+        while True:
+            try:
+                self.workspace_manager.reserve(path, size_bytes, source=source)
+                return
+            except WorkspaceQuotaExceeded:
+                victims = [doc_hash for doc_hash, (cached_path, _) in self._entries.items() if cached_path != path]
+                if not victims:
+                    raise
+                self._remove(victims[0])
+    
+    def _remove(self, doc_hash: str) -> None:
+        """Forget an entry, delete its file and return its bytes to the quota."""
+        path, _ = self._entries.pop(doc_hash)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove checkpoint {path}: {str(e)}")
+        if self.workspace_manager is not None:
+            self.workspace_manager.unreserve(path)
+
+
+class WorkspaceQuotaExceeded(RuntimeError):
+    """Raised when a scratch workspace would exceed the configured disk quota."""
+
+
+class ScratchWorkspaceManager:
+    """
+    Manage per-request scratch directories for base64 extraction.
+    
+    Workspaces live under a configurable root (e.g. /dev/shm for a tmpfs) and
+    carry an owner marker with the creating process id. Released workspaces are
+    emptied on a background thread, off the request path, and kept in a small
+    pool for reuse. A janitor sweeps directories left behind by crashed
+    processes, and pagination checkpoints in `CHECKPOINT_DIR` that no process
+    has used for `checkpoint_ttl_seconds`. The quota is enforced against the
+    bytes reserved by workspaces that are in use or still waiting to be
+    cleaned up, and by checkpoints (see `reserve`).
+    """
+    
+    PREFIX = "mcp_doc_extract_"
+    OWNER_MARKER = ".owner"
+    CHECKPOINT_DIR = "mcp_doc_checkpoints"
+    
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        quota_bytes: int = 0,
+        pool_size: int = 4,
+        orphan_age_seconds: int = 3600,
+        checkpoint_ttl_seconds: int = 1800
+    ):
+        self.root = root or tempfile.gettempdir()
+        self.quota_bytes = quota_bytes
+        self.pool_size = pool_size
+        self.orphan_age_seconds = orphan_age_seconds
+        self.checkpoint_ttl_seconds = checkpoint_ttl_seconds
+        self._lock = threading.Lock()
+        self._reserved: Dict[str, int] = {}
+        self._pool: List[str] = []
+        self._cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workspace-cleanup")
+    
+    @property
+    def reserved_bytes(self) -> int:
+        """Bytes reserved by workspaces in use or pending cleanup."""
+        with self._lock:
+            return sum(self._reserved.values())
+    
+    @property
+    def checkpoint_dir(self) -> str:
+        return os.path.join(self.root, self.CHECKPOINT_DIR)
+    
+    def acquire(self, reserve_bytes: int = 0) -> str:
+        """Return an empty workspace directory, reserving `reserve_bytes` of the quota."""
+        with self._lock:
+            self._check_quota(reserve_bytes)
+            path = self._pool.pop() if self._pool else None
+            if path is None:
+                FileUtils.create_output_directory(self.root)
+                path = tempfile.mkdtemp(prefix=self.PREFIX, dir=self.root)
+                with open(os.path.join(path, self.OWNER_MARKER), 'w') as f:
+                    f.write(str(os.getpid()))
+            self._reserved[path] = reserve_bytes
+        return path
+    
+    def reserve(self, path: str, reserve_bytes: int, source: Optional[str] = None) -> None:
+        """
+        Reserve quota for a file kept outside the workspaces, such as a checkpoint.
+        
+        `source` is the workspace the file was moved out of; its reservation
+        shrinks by the same amount, so the bytes are not counted twice.
+        Raises WorkspaceQuotaExceeded if the quota would be exceeded.
+        """
+        with self._lock:
+            moved = min(reserve_bytes, self._reserved.get(source, 0)) if source is not None else 0
+            self._check_quota(reserve_bytes - moved - self._reserved.get(path, 0))
+            if moved:
+                self._reserved[source] -= moved
+            self._reserved[path] = reserve_bytes
+    
+    def unreserve(self, path: str) -> None:
+        """End the reservation made by `reserve`."""
+        with self._lock:
+            self._reserved.pop(path, None)
+    
+    def _check_quota(self, reserve_bytes: int) -> None:
+        """Raise WorkspaceQuotaExceeded if `reserve_bytes` more would exceed the quota (lock held)."""
+        if self.quota_bytes and sum(self._reserved.values()) + reserve_bytes > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Scratch workspace quota of {self.quota_bytes} bytes exceeded; retry later"
+            )
+    
+    def release(self, path: str) -> None:
+        """Schedule asynchronous cleanup of a workspace; its reservation ends once it is emptied."""
+        self._cleanup_executor.submit(self._recycle, path)
+    
+    def flush(self) -> None:
+        """Wait until all pending cleanups have finished."""
+        self._cleanup_executor.submit(lambda: None).result()
+    
+    def _recycle(self, path: str) -> None:
+        """Empty a released workspace and return it to the pool, or remove it."""
+        try:
+            with self._lock:
+                pooled = len(self._pool) < self.pool_size
+            
+            if pooled:
+                for entry in os.scandir(path):
+                    if entry.name == self.OWNER_MARKER:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.remove(entry.path)
+            else:
+                shutil.rmtree(path)
+                logger.info(f"Cleaned up temporary directory: {path}")
+        except Exception as e:
+            pooled = False
+            logger.warning(f"Failed to cleanup temporary directory {path}: {str(e)}")
+        
+        with self._lock:
+            self._reserved.pop(path, None)
+            if pooled:
+                self._pool.append(path)
+    
+    def sweep_orphans(self) -> int:
+        """Remove workspaces not owned by a live process. Returns the number removed."""
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        
+        for entry in os.scandir(self.root):
+            if not entry.name.startswith(self.PREFIX) or not entry.is_dir(follow_symlinks=False):
+                continue
+            if self._is_known(entry.path) or not self._is_orphan(entry.path):
+                continue
+            # Check again right before removal: the workspace may have been created
+            # after the scan started. Untracked paths cannot become tracked later,
+            # since acquire() creates and registers new workspaces under the lock.
+            if self._is_known(entry.path):
+                continue
+            try:
+                shutil.rmtree(entry.path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Failed to remove orphaned workspace {entry.path}: {str(e)}")
+        
+        if removed:
+            logger.info(f"Janitor removed {removed} orphaned workspace(s) from {self.root}")
+        return removed
+    
+    def sweep_checkpoints(self) -> int:
+        """Remove checkpoints not used for the checkpoint TTL and not held by this process."""
+        removed = 0
+        if not os.path.isdir(self.checkpoint_dir):
+            return removed
+        
+        for entry in os.scandir(self.checkpoint_dir):
+            if not entry.is_file(follow_symlinks=False) or self._is_known(entry.path):
+                continue
+            try:
+                if time.time() - entry.stat().st_mtime <= self.checkpoint_ttl_seconds:
+                    continue
+                # Checkpoints this process stores are reserved before they are created
+                if self._is_known(entry.path):
+                    continue
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Failed to remove expired checkpoint {entry.path}: {str(e)}")
+        
+        if removed:
+            logger.info(f"Janitor removed {removed} expired checkpoint(s) from {self.checkpoint_dir}")
+        return removed
+    
+    def _is_known(self, path: str) -> bool:
+        """Check whether a workspace is in use, pending cleanup or pooled by this process."""
+        with self._lock:
+            return path in self._reserved or path in self._pool
+    
+    def _is_stale(self, path: str) -> bool:
+        """Check whether a workspace has not been modified for the orphan age."""
+        try:
+            return time.time() - os.path.getmtime(path) > self.orphan_age_seconds
+        except OSError:
+            return False
+    
+    def _is_orphan(self, path: str) -> bool:
+        """Check whether a workspace belongs to no live process."""
+        try:
+            with open(os.path.join(path, self.OWNER_MARKER)) as f:
+                owner_pid = int(f.read().strip())
+        except (OSError, ValueError):
+            # No marker (older versions or a half-created workspace): fall back to age
+            return self._is_stale(path)
+        
+        if owner_pid == os.getpid():
+            # Marked with our pid but untracked: only an earlier process that had
+            # the same pid can have left it, so it must also be old
+            return self._is_stale(path)
+        try:
+            os.kill(owner_pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+    
+    async def run_janitor(self, interval_seconds: int = 300) -> None:
+        """Sweep orphaned workspaces and expired checkpoints now and then every `interval_seconds`."""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep_orphans)
+                await asyncio.to_thread(self.sweep_checkpoints)
+            except Exception as e:
+                logger.warning(f"Workspace janitor failed: {str(e)}")
+            await asyncio.sleep(interval_seconds)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one shared execution.
+    
+    The first caller for a key starts `start()` as a task; callers arriving
+    while it runs wait on the same task and receive the same result. Results
+    are reference counted: every successful caller gets a `release` callback
+    to invoke once it has finished with the result, and `cleanup(result)` runs
+    after the last release. A waiter that is cancelled (e.g. its client
+    disconnected) only drops its own reference; the shared task is cancelled
+    only when no waiters remain, and is forgotten at once so that a caller
+    arriving before the cancellation completes starts a fresh call.
+    """
+    
+    class _Flight:
+        def __init__(self, key: object, task: asyncio.Task, cleanup: Callable[[object], None]):
+            self.key = key
+            self.task = task
+            self.cleanup = cleanup
+            self.refs = 0
+    
+    def __init__(self):
+        self._flights: Dict[object, "SingleFlight._Flight"] = {}
+    
+    def __len__(self) -> int:
+        return len(self._flights)
+    
+    async def run(
+        self,
+        key: object,
+        start: Callable[[], Awaitable[object]],
+        cleanup: Callable[[object], None]
+    ) -> Tuple[object, bool, Callable[[], None]]:
+        """
+        Run or join the call for `key`.
+        
+        Returns the result, whether it was shared with an earlier caller, and
+        the release callback. Exceptions from the shared call are raised to
+        every waiter.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None and not flight.task.done()
+        if not shared:
+            flight = SingleFlight._Flight(key, asyncio.ensure_future(start()), cleanup)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        
+        flight.refs += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except BaseException:
+            self._release(flight)
+            raise
+        
+        released = False
+        
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release(flight)
+        
+        return result, shared, release
+    
+    def _forget(self, key: object, flight: "SingleFlight._Flight") -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+    
+    def _release(self, flight: "SingleFlight._Flight") -> None:
+        flight.refs -= 1
+        if flight.refs > 0:
+            return
+        if not flight.task.done():
+            flight.task.cancel()
+            self._forget(flight.key, flight)
+        elif not flight.task.cancelled() and flight.task.exception() is None:
+            try:
+                flight.cleanup(flight.task.result())
+            except Exception as e:
+                logger.warning(f"Failed to clean up shared result: {str(e)}")
+
+
+class ExtractionScheduler:
+    """
+    Admission control and fair ordering for extraction jobs.
+    
+    At most `max_workers` extractions run at once; the rest wait. Each job
+    carries a cost estimated from its byte size, known before any document is
+    opened, and is placed in the small or large lane by `large_cost_threshold`.
+    Small jobs are dispatched first and `reserved_small_slots` workers are kept
+    free of large jobs, so one huge document cannot hold up interactive
+    requests; after `large_job_interval` consecutive small dispatches a waiting
+    large job gets its turn, so large jobs are never starved.
+    
+    Within a lane, clients (API key, client header or MCP session) are served
+    by start-time fair queuing: the client that has received the least work
+    goes next, so one tenant's bulk upload cannot starve the others, and each
+    client's own jobs run shortest first. All methods run on the event loop.
+    """
+    
+    SMALL = "small"
+    LARGE = "large"
+    
+    def __init__(
+        self,
+        max_workers: int = 4,
+        large_cost_threshold: float = 25.0,
+        reserved_small_slots: int = 1,
+        large_job_interval: int = 8
+    ):
+        self.max_workers = max(1, max_workers)
+        self.large_cost_threshold = large_cost_threshold
+        self.reserved_small_slots = max(0, min(reserved_small_slots, self.max_workers - 1))
+        self.large_job_interval = max(1, large_job_interval)
+        self._running = {self.SMALL: 0, self.LARGE: 0}
+        self._queues: Dict[str, Dict[str, list]] = {self.SMALL: {}, self.LARGE: {}}
+        self._finish_tags: Dict[str, Dict[str, float]] = {self.SMALL: {}, self.LARGE: {}}
+        self._virtual_time = {self.SMALL: 0.0, self.LARGE: 0.0}
+        self._small_streak = 0
+        self._sequence = itertools.count()
+    
+    @staticmethod
+    def estimate_cost(size_bytes: int = 0) -> float:
+        """Estimate the relative cost of extracting a document: one unit per MB."""
+        return size_bytes / (1024 * 1024)
+    
+    @classmethod
+    def estimate_document_cost(cls, document_path: str) -> float:
+        """
+        Estimate a document's cost from its size on disk.
+        
+        Only the file's metadata is read: opening the document would do
+        unbounded work before the job has been admitted.
+        """
+        try:
+            return cls.estimate_cost(os.path.getsize(document_path))
+        except OSError:
+            return 0.0
+    
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+    
+    @property
+    def waiting(self) -> int:
+        return sum(
+            1 for queues in self._queues.values() for queue in queues.values()
+            for entry in queue if not entry[2].done()
+        )
+    
+    def lane_for(self, cost: float) -> str:
+        return self.LARGE if cost >= self.large_cost_threshold else self.SMALL
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, cost: float, client: str = "anonymous"):
+        """Wait for a worker slot for a job of `cost` submitted by `client`."""
+        lane = self.lane_for(cost)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queues[lane].setdefault(client, []), (cost, next(self._sequence), future, client)
+        )
+        self._dispatch()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as the waiter went away
+                self._finish(lane)
+            raise
+        
+        try:
+            yield
+        finally:
+            self._finish(lane)
+    
+    async def run(
+        self,
+        cost: float,
+        client: str,
+        func: Callable[[], object],
+        cancellation: Optional[CancellationToken] = None
+    ) -> object:
+        """
+        Run `func` in a worker thread once a slot is free.
+        
+        If the caller is cancelled while the job runs, `cancellation` is
+        cancelled so the extraction stops at its next check; the slot is held
+        until the thread has finished, since the thread itself cannot be
+        interrupted. A job whose deadline passed while it was queued is not
+        started.
+        """
+        async with self.slot(cost, client):
+            if cancellation is not None:
+                cancellation.check()
+            thread_future = asyncio.ensure_future(asyncio.to_thread(func))
+            try:
+                return await asyncio.shield(thread_future)
+            except asyncio.CancelledError:
+                if cancellation is not None:
+                    cancellation.cancel()
+                with contextlib.suppress(Exception):
+                    await thread_future
+                raise
+    
+    def _finish(self, lane: str) -> None:
+        self._running[lane] -= 1
+        self._dispatch()
+    
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting jobs."""
+        while self.running < self.max_workers:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            future = self._pop_fair(lane)
+            self._running[lane] += 1
+            future.set_result(None)
+    
+    def _has_waiting(self, lane: str) -> bool:
+        queues = self._queues[lane]
+        for client in list(queues):
+            queue = queues[client]
+            while queue and queue[0][2].done():
+                heapq.heappop(queue)
+            if not queue:
+                del queues[client]
+        return bool(queues)
+    
+    def _next_lane(self) -> Optional[str]:
+        small_waiting = self._has_waiting(self.SMALL)
+        large_allowed = (
+            self._has_waiting(self.LARGE)
+            and self._running[self.LARGE] < self.max_workers - self.reserved_small_slots
+        )
+        
+        if large_allowed and (not small_waiting or self._small_streak >= self.large_job_interval):
+            self._small_streak = 0
+            return self.LARGE
+        if small_waiting:
+            if self._has_waiting(self.LARGE):
+                self._small_streak += 1
+            return self.SMALL
+        return None
+    
+    def _pop_fair(self, lane: str) -> asyncio.Future:
+        """Pop the next job of the client with the earliest start tag."""
+        queues = self._queues[lane]
+        finish_tags = self._finish_tags[lane]
+        virtual_time = self._virtual_time[lane]
+        
+        def start_tag(client: str) -> Tuple[float, int]:
+            return (max(virtual_time, finish_tags.get(client, 0.0)), queues[client][0][1])
+        
+        client = min(queues, key=start_tag)
+        cost, _, future, _ = heapq.heappop(queues[client])
+        if not queues[client]:
+            del queues[client]
+        
+        start = max(virtual_time, finish_tags.get(client, 0.0))
+        finish_tags[client] = start + max(cost, 0.0)
+        self._virtual_time[lane] = start
+        
+        # Forget clients that have nothing queued and no outstanding service
+        for idle_client in [c for c, tag in finish_tags.items() if c not in queues and tag <= start]:
+            del finish_tags[idle_client]
+        return future
+
+
+def _extract_document_worker(
+    document_path: str,
+    min_image_size: int,
+    create_zip: bool,
+    force: bool,
+    scan: str = "pages",
+    referenced_only: bool = False
+) -> dict:
+    """Extract one document of a directory or command-line batch job; runs in a worker process."""
+    try:
+        previous = ExtractionManifest.load(DocumentExtractor.default_output_dir(document_path))
+        doc_extractor = DocumentExtractor(
+            min_image_size=min_image_size, create_zip=create_zip, scan=scan, referenced_only=referenced_only
+        )
+        extracted_images, output_dir, zip_path = doc_extractor.extract_images(
+            document_path, incremental=True, force=force
+        )
+        current = ExtractionManifest.load(output_dir)
+        unchanged = previous is not None and current is not None and not force and \
+            previous.source["sha256"] == current.source["sha256"] and \
+            previous.options == current.options and previous.images == current.images
+        return {
+            "status": "unchanged" if unchanged else "extracted",
+            "extracted_images": len(extracted_images),
+            "output_directory": output_dir,
+            "zip_file": zip_path,
+            "sha256": current.source["sha256"] if current else None
+        }
+    except Exception as e:
+        return {"status": "failed", "error": str(e)}
+
+
+class DirectoryExtractor:
+    """
+    Bulk image extraction over a directory tree using a process pool.
+    
+    Each document is extracted incrementally next to itself, as with
+    extract_document_images. A consolidated manifest in the root directory
+    records the size, mtime and outcome of every document, so files whose size
+    and mtime are unchanged are skipped without being opened; documents that
+    were touched but not modified are caught by their per-document manifest hash.
+    `workers` is capped at the number of CPUs. With a `scheduler`, every
+    document waits for its own slot as `client`, so a directory job shares the
+    server's extraction capacity with other requests instead of bypassing it.
+    """
+    
+    MANIFEST_FILENAME = ".directory_extraction_manifest.json"
+    VERSION = 1
+    DEFAULT_INCLUDE = ["*" + ext for ext in FileUtils.SUPPORTED_EXTENSIONS]
+    
+    def __init__(
+        self,
+        min_image_size: int = 10,
+        create_zip: bool = True,
+        workers: Optional[int] = None,
+        scheduler: Optional[ExtractionScheduler] = None,
+        client: str = "anonymous"
+    ):
+        self.min_image_size = min_image_size
+        self.create_zip = create_zip
+        self.scheduler = scheduler
+        self.client = client
+        cpu_count = os.cpu_count() or 1
+        if workers is None:
+            self.workers = cpu_count
+        elif isinstance(workers, int) and not isinstance(workers, bool) and workers > 0:
+            self.workers = min(workers, cpu_count)
+        else:
+            raise ValueError("workers must be a positive integer")
+    
+    def find_documents(
+        self,
+        root_path: str,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> List[str]:
+        """List supported documents under `root_path` matching the glob filters (relative paths)."""
+        include = include or self.DEFAULT_INCLUDE
+        exclude = exclude or []
+        documents = []
+        
+        for dir_path, dir_names, file_names in os.walk(root_path):
+            # Don't descend into our own output directories
+            dir_names[:] = sorted(
+                name for name in dir_names
+                if not name.endswith(tuple(DocumentExtractor.OUTPUT_DIR_SUFFIXES.values()))
+                and not name.startswith(".staging_")
+            )
+            for file_name in sorted(file_names):
+                relative_path = os.path.relpath(os.path.join(dir_path, file_name), root_path)
+                match_path = relative_path.replace(os.sep, '/')
+                if not FileUtils.is_supported_document(file_name):
+                    continue
+                if not any(fnmatch.fnmatch(match_path, pattern) or fnmatch.fnmatch(file_name, pattern)
+                           for pattern in include):
+                    continue
+                if any(fnmatch.fnmatch(match_path, pattern) or fnmatch.fnmatch(file_name, pattern)
+                       for pattern in exclude):
+                    continue
+                documents.append(relative_path)
+        
+        return documents
+    
+    def load_manifest(self, root_path: str) -> dict:
+        """Load the consolidated manifest of a directory, or an empty one."""
+        try:
+            with open(os.path.join(root_path, self.MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == self.VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"version": self.VERSION, "options": None, "files": {}}
+    
+    def save_manifest(self, root_path: str, manifest: dict) -> str:
+        """Write the consolidated manifest atomically; returns its path."""
+        manifest_path = os.path.join(root_path, self.MANIFEST_FILENAME)
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, manifest_path)
+        return manifest_path
+    
+    async def extract_directory(
+        self,
+        root_path: str,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        force: bool = False,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> dict:
+        """
+        Extract images from every matching document under `root_path`.
+        
+        `progress_callback(done, total)` is awaited as documents complete.
+        Returns a summary with counts, failures and the manifest path.
+        """
+        if not os.path.isdir(root_path):
+            raise FileNotFoundError(f"Directory not found: {root_path}")
+        
+        documents = await asyncio.to_thread(self.find_documents, root_path, include, exclude)
+        manifest = self.load_manifest(root_path)
+        options = {"min_image_size": self.min_image_size, "create_zip": self.create_zip}
+        same_options = manifest.get("options") == options
+        previous_files = manifest.get("files", {})
+        files = {}
+        pending = []
+        
+        for relative_path in documents:
+            stat = os.stat(os.path.join(root_path, relative_path))
+            entry = previous_files.get(relative_path)
+            if not force and same_options and entry and entry.get("status") != "failed" and \
+                    entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                files[relative_path] = {**entry, "status": "unchanged"}
+            else:
+                pending.append((relative_path, stat))
+        
+        total = len(documents)
+        done = total - len(pending)
+        if progress_callback:
+            await progress_callback(done, total)
+        
+        if pending:
+            loop = asyncio.get_running_loop()
+            mp_context = multiprocessing.get_context("spawn")
+            # Not a `with` block: its exit waits for the workers and would block the event loop
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context)
+            # Keep a bounded window of submissions for very large trees
+            window = self.workers * 4
+            queue = iter(pending)
+            in_flight = {}
+            
+            async def extract_document(relative_path: str, stat: os.stat_result) -> dict:
+                admission = contextlib.nullcontext() if self.scheduler is None else \
+                    self.scheduler.slot(ExtractionScheduler.estimate_cost(stat.st_size), self.client)
+                async with admission:
+                    return await loop.run_in_executor(
+                        pool, _extract_document_worker,
+                        os.path.join(root_path, relative_path),
+                        self.min_image_size, self.create_zip, force
+                    )
+            
+            def submit_next() -> None:
+                item = next(queue, None)
+                if item is not None:
+                    in_flight[asyncio.ensure_future(extract_document(*item))] = item
+            
+            try:
+                
+                for _ in range(window):
+                    submit_next()
+                
+                while in_flight:
+                    completed, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for future in completed:
+                        relative_path, stat = in_flight.pop(future)
+                        files[relative_path] = {
+                            "size": stat.st_size,
+                            "mtime_ns": stat.st_mtime_ns,
+                            **future.result()
+                        }
+                        done += 1
+                        submit_next()
+                    
+                    if progress_callback:
+                        await progress_callback(done, total)
+            except BaseException:
+                # Cancelled or failed: drop queued documents; running ones finish in the background
+                for future in in_flight:
+                    future.cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            await loop.run_in_executor(None, pool.shutdown)
+        
+        manifest = {
+            "version": self.VERSION,
+            "options": options,
+            "files": {relative_path: files[relative_path] for relative_path in documents}
+        }
+        manifest_path = await asyncio.to_thread(self.save_manifest, root_path, manifest)
+        
+        statuses = [entry["status"] for entry in manifest["files"].values()]
+        return {
+            "status": "success",
+            "root_path": root_path,
+            "total_documents": total,
+            "extracted": statuses.count("extracted"),
+            "unchanged": statuses.count("unchanged"),
+            "failed": statuses.count("failed"),
+            "extracted_images": sum(entry.get("extracted_images", 0) for entry in manifest["files"].values()),
+            "failures": {
+                relative_path: entry["error"]
+                for relative_path, entry in manifest["files"].items()
+                if entry["status"] == "failed"
+            },
+            "manifest_path": manifest_path
+        }
+
+
+class RequestProfiler:
+    """
+    Opt-in CPU and memory profiling of a single request.
+    
+    Each stage runs under cProfile and tracemalloc. When the stage ends, its
+    profile (a .prof file for pstats or snakeviz) and its top allocations are
+    written to `output_dir`. Files are labelled by document hash and stage.
+    cProfile and tracemalloc are process-wide, so only one request is
+    profiled at a time; stages of concurrent profiled requests are skipped.
+    """
+    
+    TOP_ALLOCATIONS = 25
+    _active_lock = threading.Lock()
+    
+    def __init__(self, output_dir: str, label: str = "unknown"):
+        self.output_dir = output_dir
+        self.label = label
+        self.files: List[str] = []
+    
+    @classmethod
+    def for_request(cls, enabled: bool) -> Union["RequestProfiler", "NullProfiler"]:
+        """Return a profiler if profiling was requested and a profile directory is configured."""
+        if enabled and PROFILE_DIR:
+            return cls(PROFILE_DIR)
+        return NULL_PROFILER
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Profile the enclosed block as stage `name`."""
+        if not RequestProfiler._active_lock.acquire(blocking=False):
+            logger.warning(f"Another request is being profiled; not profiling stage {name}")
+            yield
+            return
+        
+        try:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                after = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                self._write(name, profile, after.compare_to(before, 'lineno'), peak)
+        finally:
+            RequestProfiler._active_lock.release()
+    
+    def _write(self, stage: str, profile: cProfile.Profile, allocations: list, peak: int) -> None:
+        """Write a stage's CPU profile and top allocations."""
+        try:
+            FileUtils.create_output_directory(self.output_dir)
+            base_name = f"{self.label[:16]}_{stage}_{int(time.time() * 1000)}_{os.getpid()}"
+            profile_path = os.path.join(self.output_dir, base_name + ".prof")
+            profile.dump_stats(profile_path)
+            
+            allocations_path = os.path.join(self.output_dir, base_name + ".alloc.txt")
+            with open(allocations_path, 'w', encoding='utf-8') as f:
+                f.write(f"document: {self.label}\nstage: {stage}\npeak traced memory: {peak} bytes\n\n")
+                for stat in allocations[:self.TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+            
+            self.files.extend([profile_path, allocations_path])
+            logger.info(f"Wrote profile for stage {stage}: {profile_path}")
+        except Exception as e:
+            logger.warning(f"Failed to write profile for stage {stage}: {str(e)}")
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; stages cost nothing."""
+    
+    label = None
+    files: List[str] = []
+    
+    def stage(self, name: str):
+        return contextlib.nullcontext()
+
+
+NULL_PROFILER = NullProfiler()
+
+
+# Open PDF handles shared by the path-based tools
+document_cache = DocumentHandleCache(
+    max_entries=int(os.environ.get("DOC_EXTRACTOR_DOCUMENT_CACHE_SIZE", "8"))
+)
+
+# Largest document read from a ZIP archive into memory (0 for no limit)
+ARCHIVE_MEMBER_MAX_BYTES = int(os.environ.get("DOC_EXTRACTOR_ARCHIVE_MEMBER_MB", "256")) * 1024 * 1024
+
+# Global extractor instance
+extractor = DocumentExtractor(document_cache=document_cache)
+
+# Scratch directories for base64 extraction requests
+workspace_manager = ScratchWorkspaceManager(
+    root=os.environ.get("DOC_EXTRACTOR_SCRATCH_ROOT") or None,
+    quota_bytes=int(os.environ.get("DOC_EXTRACTOR_SCRATCH_QUOTA_MB", "0")) * 1024 * 1024,
+    pool_size=int(os.environ.get("DOC_EXTRACTOR_SCRATCH_POOL_SIZE", "4")),
+    orphan_age_seconds=int(os.environ.get("DOC_EXTRACTOR_ORPHAN_AGE", "3600")),
+    checkpoint_ttl_seconds=int(os.environ.get("DOC_EXTRACTOR_CHECKPOINT_TTL", "1800"))
+)
+
+# Directory for per-request profiles; profiling is unavailable when unset
+PROFILE_DIR = os.environ.get("DOC_EXTRACTOR_PROFILE_DIR") or None
+
+# Token that REST clients must send in X-Profile-Token to profile a request
+ADMIN_TOKEN = os.environ.get("DOC_EXTRACTOR_ADMIN_TOKEN") or None
+
+# Seconds between janitor sweeps of orphaned scratch directories and expired checkpoints
+JANITOR_INTERVAL = int(os.environ.get("DOC_EXTRACTOR_JANITOR_INTERVAL", "300"))
+
+# Scratch space reserved per request, as a multiple of the decoded document size
+# (document, extracted images and ZIP archive)
+WORKSPACE_RESERVE_FACTOR = 3
+
+# Decoded documents kept for cursor-based pagination, counted against the scratch quota
+checkpoint_cache = ExtractionCheckpointCache(
+    cache_dir=workspace_manager.checkpoint_dir,
+    ttl_seconds=workspace_manager.checkpoint_ttl_seconds,
+    workspace_manager=workspace_manager
+)
+
+# Key that signs pagination cursors; set it to share cursors across processes and restarts
+CURSOR_SECRET = (os.environ.get("DOC_EXTRACTOR_CURSOR_SECRET") or "").encode('utf-8') or secrets.token_bytes(32)
+
+# In-flight base64 extractions, shared by concurrent identical requests
+extraction_flights = SingleFlight()
+
+# Concurrency limit and fair ordering of extraction jobs
+extraction_scheduler = ExtractionScheduler(
+    max_workers=int(os.environ.get("DOC_EXTRACTOR_MAX_CONCURRENT_EXTRACTIONS", "4")),
+    large_cost_threshold=float(os.environ.get("DOC_EXTRACTOR_LARGE_JOB_COST", "25"))
+)
+
+# Decoded REST uploads up to this size stay in memory; larger ones spill to disk
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get("DOC_EXTRACTOR_UPLOAD_SPOOL_MB", "8")) * 1024 * 1024
+
+# Sink that base64 extraction outputs are stored in instead of being returned inline
+output_sink = OutputSink.from_environment()
+
+# Deadline in seconds for requests that don't set timeout_seconds; 0 means none
+REQUEST_TIMEOUT = float(os.environ.get("DOC_EXTRACTOR_REQUEST_TIMEOUT", "0"))
+
+
+def resolve_output_sink(output: Optional[str]) -> Optional[OutputSink]:
+    """
+    Sink for a request's `output` option: "sink" stores the outputs in the
+    configured output sink, "inline" returns them base64-encoded. Without the
+    option, outputs go to the sink whenever one is configured.
+    """
+    if output is None:
+        return output_sink
+    if output == "inline":
+        return None
+    if output == "sink":
+        if output_sink is None:
+            raise ValueError("No output sink is configured on this server")
+        return output_sink
+    raise ValueError("output must be one of: inline, sink")
+
+
+def write_document_input(
+    output_path: str,
+    document_base64: Optional[str] = None,
+    document_file: Optional[BinaryIO] = None
+) -> None:
+    """Write a request's document to `output_path` from base64 text or an already decoded file."""
+    if document_file is not None:
+        document_file.seek(0)
+        with open(output_path, 'wb') as output:
+            shutil.copyfileobj(document_file, output, OOXMLMediaExtractor.STREAM_CHUNK_SIZE)
+    else:
+        Base64Utils.decode_base64_to_file(document_base64, output_path)
+
+
+def run_paginated_extraction(
+    work_dir: str,
+    document_base64: Optional[str],
+    document_name: Optional[str],
+    cursor: Optional[str],
+    page_size: int,
+    min_image_size: int = 10,
+    pages: Union[str, List, None] = None,
+    max_images: Optional[int] = None,
+    image_ids: Optional[List[Union[str, int]]] = None,
+    stats: Optional[RequestStats] = None,
+    document_file: Optional[BinaryIO] = None,
+    duplicate_filter: Optional[NearDuplicateFilter] = None,
+    blank_filter: Optional[BlankImageFilter] = None,
+    output_sink: Optional[OutputSink] = None,
+    scan: str = "pages",
+    cancellation: Optional[CancellationToken] = None,
+    referenced_only: bool = False
+) -> Tuple[List[str], Optional[str], str, "DocumentExtractor"]:
+    """
+    Extract one batch of images for a paginated base64 extraction.
+    
+    Without a cursor the document is decoded, stored in the checkpoint cache and
+    the first batch is extracted with the given options. With a cursor, the
+    options and position come from the cursor and the document is taken from the
+    cache (or from `document_base64` if the checkpoint has expired). The
+    document may be given pre-decoded as `document_file` instead of base64.
+    
+    Returns the extracted image paths (inside `work_dir`), the next cursor
+    (None once the document is exhausted), the document name and the
+    extractor used (for its near-duplicate groups, blank image count and
+    published outputs).
+    """
+    stats = stats if stats is not None else RequestStats()
+    profiler = stats.profiler
+    has_document = bool(document_base64) or document_file is not None
+    page_size = int(page_size)
+    if page_size < 1:
+        raise ValueError("page_size must be a positive integer")
+    
+    if cursor:
+        state = CursorUtils.decode(cursor)
+        document_name = state["name"]
+        profiler.label = state["doc"]
+        doc_path = checkpoint_cache.lookup(state["doc"])
+        if doc_path is None:
+            if not has_document:
+                raise ValueError("Cursor has expired; resend document_base64 together with the cursor")
+            with stats.stage("decode", profile=True):
+                temp_doc_path = os.path.join(work_dir, os.path.basename(document_name))
+                write_document_input(temp_doc_path, document_base64, document_file)
+                stats.bytes_in = os.path.getsize(temp_doc_path)
+                if FileUtils.compute_file_hash(temp_doc_path) != state["doc"]:
+                    raise ValueError("document_base64 does not match the document of this cursor")
+                checkpoint_cache.store(temp_doc_path, state["doc"])
+            doc_path = checkpoint_cache.lookup(state["doc"])
+    else:
+        if not has_document:
+            raise ValueError("document_base64 is required")
+        if not document_name:
+            raise ValueError("document_name is required")
+        
+        file_ext = FileUtils.get_file_extension(document_name)
+        if FileUtils.is_archive(document_name):
+            raise ValueError("ZIP archives cannot be extracted in batches; omit page_size and cursor")
+        if not FileUtils.is_supported_document(document_name):
+            raise ValueError(
+                f"Unsupported file type: {file_ext}. Supported types: {', '.join(FileUtils.SUPPORTED_EXTENSIONS)}"
+            )
+        
+        with stats.stage("decode", profile=True):
+            temp_doc_path = os.path.join(work_dir, os.path.basename(document_name))
+            write_document_input(temp_doc_path, document_base64, document_file)
+            stats.bytes_in = os.path.getsize(temp_doc_path)
+            doc_hash = checkpoint_cache.store(temp_doc_path)
+            profiler.label = doc_hash
+        doc_path = checkpoint_cache.lookup(doc_hash)
+        state = {
+            "doc": doc_hash,
+            "name": document_name,
+            "pos": [0, 0],
+            "emitted": 0,
+            "opts": {
+                "min_image_size": min_image_size,
+                "pages": pages,
+                "max_images": SelectionUtils.validate_max_images(max_images),
+                "image_ids": image_ids,
+                "similar_images": duplicate_filter.options() if duplicate_filter else None,
+                "skip_blank_images": blank_filter.options() if blank_filter else None,
+                "scan": scan,
+                "referenced_only": referenced_only
+            }
+        }
+    
+    opts = state["opts"]
+    limit = page_size
+    if opts["max_images"] is not None:
+        limit = min(limit, opts["max_images"] - state["emitted"])
+    
+    duplicate_filter = NearDuplicateFilter(**opts["similar_images"]) if opts.get("similar_images") else None
+    blank_filter = BlankImageFilter(**opts["skip_blank_images"]) if opts.get("skip_blank_images") else None
+    doc_extractor = DocumentExtractor(
+        min_image_size=opts["min_image_size"], create_zip=False, stats=stats,
+        duplicate_filter=duplicate_filter, blank_filter=blank_filter, output_sink=output_sink,
+        scan=opts.get("scan", "pages"), cancellation=cancellation,
+        referenced_only=opts.get("referenced_only", False)
+    )
+    with stats.stage("extract", profile=True):
+        extracted_images, next_position = doc_extractor.extract_batch(
+            doc_path,
+            os.path.join(work_dir, "extracted_images"),
+            pages=opts["pages"],
+            image_ids=opts["image_ids"],
+            start=tuple(state["pos"]),
+            limit=max(limit, 0)
+        )
+    
+    emitted = state["emitted"] + len(extracted_images)
+    next_cursor = None
+    if next_position is not None and (opts["max_images"] is None or emitted < opts["max_images"]):
+        next_cursor = CursorUtils.encode({
+            **{key: value for key, value in state.items() if key != "v"},
+            "pos": list(next_position),
+            "emitted": emitted
+        })
+    
+    return extracted_images, next_cursor, document_name, doc_extractor
+
+
+def run_base64_extraction(
+    work_dir: str,
+    document_base64: Optional[str],
+    document_name: Optional[str],
+    min_image_size: int = 10,
+    pages: Union[str, List, None] = None,
+    max_images: Optional[int] = None,
+    image_ids: Optional[List[Union[str, int]]] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stats: Optional[RequestStats] = None,
+    document_file: Optional[BinaryIO] = None,
+    duplicate_filter: Optional[NearDuplicateFilter] = None,
+    blank_filter: Optional[BlankImageFilter] = None,
+    output_sink: Optional[OutputSink] = None,
+    scan: str = "pages",
+    cancellation: Optional[CancellationToken] = None,
+    referenced_only: bool = False
+) -> dict:
+    """
+    Decode a base64 document into `work_dir` and extract its images there.
+    
+    Shared by the MCP tool and the REST endpoint. With `page_size` or `cursor`
+    a single paginated batch is extracted instead (see run_paginated_extraction).
+    `document_file`, if given, holds the already decoded document and takes the
+    place of `document_base64`.
+    Returns the document name, extracted image paths, output directory, ZIP
+    path, near-duplicate groups, number of skipped blank images, occurrence
+    counts of referenced Word images, the per-document results of a ZIP
+    archive (None for other documents), the objects
+    stored in `output_sink` (if given) and, for paginated calls, the next
+    cursor.
+    """
+    stats = stats if stats is not None else RequestStats()
+    paginated = page_size is not None or bool(cursor)
+    
+    if paginated:
+        # Extract a single batch; the document is kept in the checkpoint cache
+        extracted_images, next_cursor, document_name, doc_extractor = run_paginated_extraction(
+            work_dir,
+            document_base64,
+            document_name,
+            cursor,
+            page_size if page_size is not None else DEFAULT_PAGE_SIZE,
+            min_image_size=min_image_size,
+            pages=pages,
+            max_images=max_images,
+            image_ids=image_ids,
+            stats=stats,
+            document_file=document_file,
+            duplicate_filter=duplicate_filter,
+            blank_filter=blank_filter,
+            output_sink=output_sink,
+            scan=scan,
+            cancellation=cancellation,
+            referenced_only=referenced_only
+        )
+        return {
+            "document_name": document_name,
+            "extracted_images": extracted_images,
+            "output_directory": os.path.join(work_dir, "extracted_images"),
+            "zip_path": None,
+            "similar_image_groups": doc_extractor.similar_image_groups,
+            "skipped_blank_images": doc_extractor.skipped_blank_images,
+            "image_occurrences": doc_extractor.image_occurrences,
+            "archive_documents": None,
+            "published_images": doc_extractor.published_images,
+            "published_zip": None,
+            "paginated": True,
+            "next_cursor": next_cursor
+        }
+    
+    if not document_base64 and document_file is None:
+        raise ValueError("document_base64 is required")
+    if not document_name:
+        raise ValueError("document_name is required")
+    
+    # Validate file extension
+    file_ext = FileUtils.get_file_extension(document_name)
+    if not FileUtils.is_supported_document(document_name) and not FileUtils.is_archive(document_name):
+        raise ValueError(
+            f"Unsupported file type: {file_ext}. Supported types: "
+            f"{', '.join(FileUtils.SUPPORTED_EXTENSIONS + FileUtils.ARCHIVE_EXTENSIONS)}"
+        )
+    
+    # Decode base64 to temporary file
+    with stats.stage("decode", profile=True):
+        temp_doc_path = os.path.join(work_dir, os.path.basename(document_name))
+        write_document_input(temp_doc_path, document_base64, document_file)
+        stats.bytes_in = os.path.getsize(temp_doc_path)
+        if stats.profiler is not NULL_PROFILER:
+            stats.profiler.label = FileUtils.compute_file_hash(temp_doc_path)
+    logger.info(f"Decoded base64 document to: {temp_doc_path}")
+    
+    # Create extractor with settings
+    doc_extractor = DocumentExtractor(
+        min_image_size=min_image_size, create_zip=True, stats=stats,
+        duplicate_filter=duplicate_filter, blank_filter=blank_filter, output_sink=output_sink,
+        scan=scan, cancellation=cancellation, referenced_only=referenced_only
+    )
+    
+    # Extract images into the workspace
+    with stats.stage("extract", profile=True):
+        extracted_images, actual_output_dir, zip_path = doc_extractor.extract_images(
+            temp_doc_path,
+            os.path.join(work_dir, "extracted_images"),
+            pages=pages,
+            max_images=max_images,
+            image_ids=image_ids
+        )
+    
+    return {
+        "document_name": document_name,
+        "extracted_images": extracted_images,
+        "output_directory": actual_output_dir,
+        "zip_path": zip_path,
+        "similar_image_groups": doc_extractor.similar_image_groups,
+        "skipped_blank_images": doc_extractor.skipped_blank_images,
+        "image_occurrences": doc_extractor.image_occurrences,
+        "archive_documents": doc_extractor.archive_documents,
+        "published_images": doc_extractor.published_images,
+        "published_zip": doc_extractor.published_zip,
+        "paginated": False,
+        "next_cursor": None
+    }
+
+
+async def run_shared_base64_extraction(
+    document_base64: Optional[str],
+    document_name: Optional[str],
+    document_size: int,
+    min_image_size: int = 10,
+    pages: Union[str, List, None] = None,
+    max_images: Optional[int] = None,
+    image_ids: Optional[List[Union[str, int]]] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stats: Optional[RequestStats] = None,
+    document_file: Optional[BinaryIO] = None,
+    document_hash: Optional[str] = None,
+    client: str = "anonymous",
+    duplicate_filter: Optional[NearDuplicateFilter] = None,
+    blank_filter: Optional[BlankImageFilter] = None,
+    output_sink: Optional[OutputSink] = None,
+    scan: str = "pages",
+    cancellation: Optional[CancellationToken] = None,
+    referenced_only: bool = False
+) -> Tuple[dict, Callable[[], None]]:
+    """
+    Run run_base64_extraction in a scratch workspace, off the event loop.
+    
+    The extraction is queued on `extraction_scheduler` as a job of `client`,
+    costed by the decoded `document_size`. Concurrent requests for the same
+    document (by content hash), name and options share a single extraction
+    through `extraction_flights`; later arrivals record the time they waited
+    as the "coalesced" stage. Paginated and profiled requests always run on
+    their own. `document_file` is owned by this function and closed once it
+    is no longer needed. `cancellation` stops the extraction once every
+    request waiting for it has gone, or when its deadline passes.
+    
+    Returns the extraction and a callback releasing the workspace, to be
+    called once the caller has finished reading the extracted files. Raises
+    WorkspaceQuotaExceeded if no scratch space is available.
+    """
+    stats = stats if stats is not None else RequestStats()
+    cancellation = cancellation if cancellation is not None else CancellationToken()
+    started = False
+    
+    def close_document_file() -> None:
+        if document_file is not None:
+            document_file.close()
+    
+    async def start() -> dict:
+        nonlocal started
+        started = True
+        try:
+            work_dir = workspace_manager.acquire(document_size * WORKSPACE_RESERVE_FACTOR)
+        except BaseException:
+            close_document_file()
+            raise
+        
+        future = asyncio.ensure_future(extraction_scheduler.run(
+            ExtractionScheduler.estimate_cost(size_bytes=document_size),
+            client,
+            lambda: run_base64_extraction(
+                work_dir,
+                document_base64,
+                document_name,
+                min_image_size=min_image_size,
+                pages=pages,
+                max_images=max_images,
+                image_ids=image_ids,
+                page_size=page_size,
+                cursor=cursor,
+                stats=stats,
+                document_file=document_file,
+                duplicate_filter=duplicate_filter,
+                blank_filter=blank_filter,
+                output_sink=output_sink,
+                scan=scan,
+                cancellation=cancellation,
+                referenced_only=referenced_only
+            ),
+            cancellation=cancellation
+        ))
+        
+        def finish(_) -> None:
+            close_document_file()
+        
+        future.add_done_callback(finish)
+        try:
+            extraction = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # A queued job is dropped; a running worker thread cannot be
+            # interrupted, so its workspace is freed when it finishes
+            future.cancel()
+            future.add_done_callback(lambda _: workspace_manager.release(work_dir))
+            raise
+        except BaseException:
+            workspace_manager.release(work_dir)
+            raise
+        
+        extraction["work_dir"] = work_dir
+        return extraction
+    
+    paginated = page_size is not None or bool(cursor)
+    if document_hash is None and document_base64:
+        document_hash = hashlib.sha256(document_base64.encode('utf-8')).hexdigest()
+    
+    if paginated or stats.profiler is not NULL_PROFILER or document_hash is None:
+        key = object()
+    else:
+        key = (
+            document_hash,
+            document_name,
+            json.dumps(
+                [
+                    min_image_size, pages, max_images, image_ids, scan, referenced_only, cancellation.timeout,
+                    duplicate_filter.options() if duplicate_filter else None,
+                    blank_filter.options() if blank_filter else None,
+                    output_sink.kind if output_sink else None
+                ],
+                sort_keys=True, default=str
+            )
+        )
+    
+    wait_start = time.perf_counter()
+    try:
+        extraction, shared, release = await extraction_flights.run(
+            key, start, lambda extraction: workspace_manager.release(extraction["work_dir"])
+        )
+    finally:
+        if not started:
+            close_document_file()
+    
+    if shared:
+        stats.add_duration("coalesced", time.perf_counter() - wait_start)
+        logger.info(f"Coalesced extraction of {document_name} with an in-flight request")
+    return extraction, release
+
+
+def encode_extraction_outputs(
+    extracted_images: List[str],
+    zip_path: Optional[str],
+    stats: Optional[RequestStats] = None
+) -> Tuple[List[dict], Optional[dict]]:
+    """Base64-encode extracted images and the ZIP archive (if any) for a response."""
+    stats = stats if stats is not None else RequestStats()
+    with stats.stage("encode", profile=True):
+        images = [
+            {
+                "filename": os.path.basename(img_path),
+                "mime_type": Base64Utils.get_mime_type(img_path),
+                "base64": Base64Utils.encode_file_to_base64(img_path)
+            }
+            for img_path in extracted_images
+        ]
+        
+        zip_data = None
+        if zip_path and os.path.exists(zip_path):
+            zip_data = {
+                "filename": os.path.basename(zip_path),
+                "mime_type": "application/zip",
+                "base64": Base64Utils.encode_file_to_base64(zip_path)
+            }
+    
+    return images, zip_data
+
+
+# Bytes encoded per base64 chunk when streaming files into a response; a multiple
+# of 3 so that the encoded chunks concatenate to the encoding of the whole file
+RESPONSE_ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def dumps_compact(value) -> bytes:
+    """Serialize a value exactly as Starlette's JSONResponse renders it."""
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def iter_encoded_file_member(key: bytes, file_path: str, mime_type: str, stats: RequestStats) -> Iterator[bytes]:
+    """Yield a `{"filename", "mime_type", "base64"}` object, encoding the file in chunks."""
+    yield key + b'{"filename":' + dumps_compact(os.path.basename(file_path)) + \
+        b',"mime_type":' + dumps_compact(mime_type) + b',"base64":"'
+    with Base64Utils.map_file(file_path) as data:
+        for offset in range(0, len(data), RESPONSE_ENCODE_CHUNK_SIZE):
+            with stats.stage("encode"):
+                encoded = base64.b64encode(data[offset:offset + RESPONSE_ENCODE_CHUNK_SIZE])
+            yield encoded
+    yield b'"}'
+
+
+def iter_encoded_outputs(
+    extracted_images: List[str],
+    zip_path: Optional[str],
+    stats: RequestStats
+) -> Iterator[bytes]:
+    """
+    Yield the "images" and "zip" members of a REST response as JSON fragments.
+    
+    Produces the same bytes as serializing the output of
+    encode_extraction_outputs, but only one chunk of one file is held at a time.
+    """
+    yield b',"images":['
+    for index, img_path in enumerate(extracted_images):
+        yield from iter_encoded_file_member(
+            b',' if index else b'', img_path, Base64Utils.get_mime_type(img_path), stats
+        )
+    yield b']'
+    
+    if zip_path and os.path.exists(zip_path):
+        yield from iter_encoded_file_member(b',"zip":', zip_path, "application/zip", stats)
+
+
+def iter_extraction_response(
+    result: dict,
+    outputs: Iterable[bytes],
+    stats: RequestStats
+) -> Iterator[bytes]:
+    """
+    Stream a REST extraction response as a single JSON document.
+    
+    The body is byte-identical to JSONResponse of `result` followed by the
+    encoded outputs, "profile_files" (when profiling) and the stats block, so
+    the response schema is unchanged while memory no longer grows with the
+    total size of the images. Errors after the first byte abort the response.
+    """
+    with stats.stage("serialize"):
+        head = dumps_compact(result)[:-1]
+    stats.bytes_out += len(head)
+    yield head
+    
+    for fragment in outputs:
+        stats.bytes_out += len(fragment)
+        yield fragment
+    
+    with stats.stage("serialize"):
+        tail = b''
+        if stats.profiler.files:
+            tail += b',"profile_files":' + dumps_compact(stats.profiler.files)
+    stats.bytes_out += len(tail)
+    yield tail + b',"stats":' + dumps_compact(stats.as_dict()) + b'}'
+
+
+# Input schema properties shared by the extraction tools for selecting a subset of images
+SELECTION_SCHEMA_PROPERTIES = {
+    "pages": {
+        "type": "string",
+        "description": "PDF pages to extract from, 1-based (e.g. '1-3,7,10-'). Defaults to all pages"
+    },
+    "max_images": {
+        "type": "integer",
+        "description": "Maximum number of images to extract (optional)"
+    },
+    "image_ids": {
+        "type": "array",
+        "items": {"type": ["string", "integer"]},
+        "description": "Extract only these images: PDF xrefs or Office media names, as reported by get_document_info (optional)"
+    },
+    "scan": {
+        "type": "string",
+        "enum": list(PDFImageExtractor.SCAN_MODES),
+        "description": "How PDF images are found: 'pages' walks the page tree (files named by page); 'xref' reads the xref table directly, extracting every unique image once and much faster on long documents (files named by xref, which get_document_info maps to pages; cannot be combined with pages)",
+        "default": "pages"
+    },
+    "referenced_only": {
+        "type": "boolean",
+        "description": "Word documents only: extract just the images the document, headers, footers and notes actually reference, in reading order, and report how often each is used (image_occurrences). By default every file in the media folder is extracted, including orphaned media",
+        "default": False
+    }
+}
+
+# Input schema properties for paginated base64 extraction
+PAGINATION_SCHEMA_PROPERTIES = {
+    "page_size": {
+        "type": "integer",
+        "description": "Return at most this many images per call together with a next_cursor (enables paginated mode; no ZIP is returned)"
+    },
+    "cursor": {
+        "type": "string",
+        "description": "Continuation cursor from a previous paginated call; the document and options are resumed from it"
+    }
+}
+
+# Input schema property for a per-request deadline
+DEADLINE_SCHEMA_PROPERTIES = {
+    "timeout_seconds": {
+        "type": "number",
+        "description": "Stop extracting and return an error once this many seconds have passed (optional; defaults to the server's request timeout)",
+        "exclusiveMinimum": 0
+    }
+}
+
+# Input schema property for opt-in request profiling
+PROFILE_SCHEMA_PROPERTIES = {
+    "profile": {
+        "type": "boolean",
+        "description": "Write a CPU profile and top memory allocations for this request to the server's profile directory (only if the server enables profiling)",
+        "default": False
+    }
+}
+
+# Input schema properties for filtering out blank and near-duplicate images
+FILTER_SCHEMA_PROPERTIES = {
+    "skip_blank_images": {
+        "type": "boolean",
+        "description": "Drop blank and solid-colour images (white page backgrounds, separator bars, fills) before encoding (requires NumPy on the server)",
+        "default": False
+    },
+    "similar_images": {
+        "type": "string",
+        "enum": ["keep", "drop", "group"],
+        "description": "Handle visually near-identical images (e.g. re-scanned stamps or signatures): 'drop' keeps only the first of each group, 'group' keeps all and reports the groups (requires NumPy on the server)",
+        "default": "keep"
+    },
+    "similarity_threshold": {
+        "type": "integer",
+        "description": "Maximum Hamming distance (out of 64 bits) between perceptual hashes of near-identical images",
+        "default": NearDuplicateFilter.DEFAULT_THRESHOLD,
+        "minimum": 0,
+        "maximum": 64
+    },
+    "similarity_hash": {
+        "type": "string",
+        "enum": list(NearDuplicateFilter.METHODS),
+        "description": "Perceptual hash: 'dhash' (gradient, fast) or 'phash' (DCT, more robust to re-scanning)",
+        "default": "dhash"
+    }
+}
+
+# Input schema properties for returning outputs by reference
+OUTPUT_SCHEMA_PROPERTIES = {
+    "output": {
+        "type": "string",
+        "enum": ["inline", "sink"],
+        "description": "'sink' stores the images and ZIP file in the server's output sink (local directory or S3-compatible store) and returns their keys and URLs; 'inline' returns them as base64. Defaults to 'sink' when the server has one configured"
+    }
+}
+
+# Images per batch when a cursor is given without page_size
+DEFAULT_PAGE_SIZE = 50
+
+
+@server.list_tools()
+async def handle_list_tools() -> list[types.Tool]:
+    """List available document extraction tools."""
+    return [
+        types.Tool(
+            name="extract_document_images",
+            description="Extract all images from a PDF, Word, PowerPoint or Excel document, or from every such document in a ZIP archive, save them as separate files, and create a ZIP archive containing both the original document and extracted images",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "document_path": {
+                        "type": "string", 
+                        "description": "Path to the document file (.pdf, .docx, .pptx or .xlsx), or a .zip archive of such documents"
+                    },
+                    "output_dir": {
+                        "type": "string", 
+                        "description": "Directory to save extracted images (optional, defaults to document directory)"
+                    },
+                    "min_image_size": {
+                        "type": "integer",
+                        "description": "Minimum image dimension for PDF extraction (filters decorative images)",
+                        "default": 10
+                    },
+                    **SELECTION_SCHEMA_PROPERTIES,
+                    **FILTER_SCHEMA_PROPERTIES,
+                    "force": {
+                        "type": "boolean",
+                        "description": "Re-extract even if the document and options are unchanged since the last run",
+                        "default": False
+                    },
+                    **DEADLINE_SCHEMA_PROPERTIES,
+                    **PROFILE_SCHEMA_PROPERTIES
+                },
+                "required": ["document_path"],
+            },
+        ),
+        types.Tool(
+            name="extract_document_images_base64",
+            description="Extract images from a base64-encoded PDF, Word, PowerPoint or Excel document, or from every such document in a base64-encoded ZIP archive. Accepts the document as base64 string and returns extracted images as base64-encoded data. Perfect for HTTP/remote scenarios where file system access is not shared. Set page_size to receive images in bounded batches with a continuation cursor. document_base64 and document_name are required unless a cursor is given.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "document_base64": {
+                        "type": "string",
+                        "description": "Base64-encoded document data (PDF, DOCX, PPTX or XLSX)"
+                    },
+                    "document_name": {
+                        "type": "string",
+                        "description": "Original filename with extension (e.g., 'document.pdf', 'report.docx', 'deck.pptx' or 'bundle.zip')"
+                    },
+                    "min_image_size": {
+                        "type": "integer",
+                        "description": "Minimum image dimension for PDF extraction (filters decorative images)",
+                        "default": 10
+                    },
+                    "return_images_as_base64": {
+                        "type": "boolean",
+                        "description": "If true, return extracted images as base64 strings; if false, return file paths",
+                        "default": True
+                    },
+                    **SELECTION_SCHEMA_PROPERTIES,
+                    **FILTER_SCHEMA_PROPERTIES,
+                    **OUTPUT_SCHEMA_PROPERTIES,
+                    **PAGINATION_SCHEMA_PROPERTIES,
+                    **DEADLINE_SCHEMA_PROPERTIES,
+                    **PROFILE_SCHEMA_PROPERTIES
+                },
+                "required": [],
+            },
+        ),
+        types.Tool(
+            name="extract_directory_images",
+            description="Extract images from every supported document under a directory in one call, using parallel worker processes. Documents unchanged since the last run are skipped, and a consolidated manifest is written to the root directory. Reports progress when the client supplies a progress token.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "root_path": {
+                        "type": "string",
+                        "description": "Directory to scan recursively"
+                    },
+                    "include": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Glob patterns of documents to include, matched against the relative path or file name (default: all supported extensions)"
+                    },
+                    "exclude": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Glob patterns of documents to skip (optional)"
+                    },
+                    "workers": {
+                        "type": "integer",
+                        "description": "Number of worker processes (default and maximum: CPU count)"
                     },
                     "min_image_size": {
                         "type": "integer",
                         "description": "Minimum image dimension for PDF extraction (filters decorative images)",
                         "default": 10
                     },
-                    "return_images_as_base64": {
+                    "force": {
                         "type": "boolean",
-                        "description": "If true, return extracted images as base64 strings; if false, return file paths",
-                        "default": True
+                        "description": "Re-extract every document even if unchanged",
+                        "default": False
                     }
                 },
-                "required": ["document_base64", "document_name"],
+                "required": ["root_path"],
             },
         ),
         types.Tool(
@@ -363,7 +4438,7 @@ async def handle_list_tools() -> list[types.Tool]:
                 "properties": {
                     "document_path": {
                         "type": "string", 
-                        "description": "Path to the document file (.pdf or .docx)"
+                        "description": "Path to the document file (.pdf, .docx, .pptx or .xlsx)"
                     }
                 },
                 "required": ["document_path"],
@@ -394,11 +4469,66 @@ async def handle_list_tools() -> list[types.Tool]:
     ]
 
 
+def _mcp_progress_callback() -> Optional[Callable[[int, int], Awaitable[None]]]:
+    """Build a progress callback for the current tool call, if the client asked for progress."""
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return None
+    
+    progress_token = ctx.meta.progressToken if ctx.meta else None
+    if progress_token is None:
+        return None
+    
+    async def send_progress(done: int, total: int) -> None:
+        await ctx.session.send_progress_notification(progress_token, done, total)
+    
+    return send_progress
+
+
+def _mcp_client_id() -> str:
+    """
+    Scheduling identity of the MCP client making the current tool call.
+    
+    Calls over the streamable HTTP transport are identified like REST callers
+    (see _rest_client_id), as stateless requests have no lasting session;
+    otherwise each MCP session is its own client.
+    """
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return "mcp"
+    request = ctx.request
+    if request is not None and getattr(request, "url", None) is not None and \
+            request.url.path.rstrip("/") == STREAMABLE_HTTP_PATH:
+        return _rest_client_id(request)
+    return f"mcp:{id(ctx.session):x}"
+
+
+def _current_sse_session() -> Optional["SSESession"]:
+    """The SSE session the current MCP request was posted to, if any."""
+    try:
+        request = server.request_context.request
+    except LookupError:
+        return None
+    if request is None or getattr(request, "query_params", None) is None:
+        return None
+    return sse_sessions.find(request.query_params.get("session_id"))
+
+
 @server.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle document extraction tool calls."""
+    with sse_sessions.serving(_current_sse_session()):
+        return await _call_tool(name, arguments)
+
+
+async def _call_tool(
+    name: str, arguments: dict | None
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    """Run a tool call for handle_call_tool."""
     
     if not arguments:
         arguments = {}
@@ -407,19 +4537,54 @@ async def handle_call_tool(
         document_path = arguments.get("document_path")
         output_dir = arguments.get("output_dir", "")
         min_image_size = arguments.get("min_image_size", 10)
+        pages = arguments.get("pages")
+        max_images = arguments.get("max_images")
+        image_ids = arguments.get("image_ids")
+        force = arguments.get("force", False)
+        stats = RequestStats(RequestProfiler.for_request(arguments.get("profile", False)))
         
         if not document_path:
             raise ValueError("document_path is required")
         
         try:
+            duplicate_filter = NearDuplicateFilter.from_options(
+                arguments.get("similar_images"),
+                arguments.get("similarity_threshold"),
+                arguments.get("similarity_hash")
+            )
+            blank_filter = BlankImageFilter() if arguments.get("skip_blank_images") else None
+            cancellation = CancellationToken.for_request(arguments.get("timeout_seconds"))
+            
             # Update extractor settings
             global extractor
-            extractor = DocumentExtractor(min_image_size=min_image_size, create_zip=True)
+            extractor = doc_extractor = DocumentExtractor(
+                min_image_size=min_image_size, create_zip=True, stats=stats,
+                duplicate_filter=duplicate_filter, blank_filter=blank_filter,
+                document_cache=document_cache, scan=arguments.get("scan") or "pages",
+                cancellation=cancellation, referenced_only=bool(arguments.get("referenced_only"))
+            )
+            
+            if os.path.isfile(document_path):
+                stats.bytes_in = os.path.getsize(document_path)
+                if stats.profiler is not NULL_PROFILER:
+                    stats.profiler.label = FileUtils.compute_file_hash(document_path)
             
-            # Extract images
-            extracted_images, actual_output_dir, zip_path = extractor.extract_images(
-                document_path, 
-                output_dir if output_dir else None
+            def extract():
+                with stats.stage("extract", profile=True):
+                    return doc_extractor.extract_images(
+                        document_path, 
+                        output_dir if output_dir else None,
+                        pages=pages,
+                        max_images=max_images,
+                        image_ids=image_ids,
+                        incremental=True,
+                        force=force
+                    )
+            
+            # Extract images on a worker thread once the scheduler admits the job
+            cost = ExtractionScheduler.estimate_document_cost(document_path)
+            extracted_images, actual_output_dir, zip_path = await extraction_scheduler.run(
+                cost, _mcp_client_id(), extract, cancellation=cancellation
             )
             
             result = {
@@ -432,6 +4597,19 @@ async def handle_call_tool(
                 "zip_file": zip_path
             }
             
+            if duplicate_filter is not None:
+                result["similar_image_groups"] = doc_extractor.similar_image_groups
+            if blank_filter is not None:
+                result["skipped_blank_images"] = blank_filter.rejected
+            if doc_extractor.image_occurrences:
+                result["image_occurrences"] = doc_extractor.image_occurrences
+            if doc_extractor.archive_documents is not None:
+                result["documents"] = doc_extractor.archive_documents
+            
+            if stats.profiler.files:
+                result["profile_files"] = stats.profiler.files
+            
+            stats.record_images(extracted_images)
             zip_info = f"\n📦 ZIP Archive: {zip_path}" if zip_path else ""
             
             return [types.TextContent(
@@ -439,7 +4617,7 @@ async def handle_call_tool(
                 text=f"Successfully extracted {len(extracted_images)} images from {os.path.basename(document_path)}\n" +
                      f"Output directory: {actual_output_dir}{zip_info}\n" +
                      f"Files: {', '.join([os.path.basename(img) for img in extracted_images])}\n\n" +
-                     f"Full result: {json.dumps(result, indent=2)}"
+                     f"Full result: {stats.serialize_with_stats(result, indent=2)}"
             )]
             
         except Exception as e:
@@ -451,38 +4629,55 @@ async def handle_call_tool(
         document_name = arguments.get("document_name")
         min_image_size = arguments.get("min_image_size", 10)
         return_images_as_base64 = arguments.get("return_images_as_base64", True)
+        pages = arguments.get("pages")
+        max_images = arguments.get("max_images")
+        image_ids = arguments.get("image_ids")
+        page_size = arguments.get("page_size")
+        cursor = arguments.get("cursor")
+        stats = RequestStats(RequestProfiler.for_request(arguments.get("profile", False)))
         
-        if not document_base64:
-            raise ValueError("document_base64 is required")
-        if not document_name:
-            raise ValueError("document_name is required")
-        
-        # Create temporary directory for processing
-        temp_dir = tempfile.mkdtemp(prefix="mcp_doc_extract_")
-        temp_doc_path = None
+        if page_size is None and not cursor:
+            if not document_base64:
+                raise ValueError("document_base64 is required")
+            if not document_name:
+                raise ValueError("document_name is required")
         
+        release_workspace = None
         try:
-            # Validate file extension
-            file_ext = FileUtils.get_file_extension(document_name)
-            if file_ext not in ['.pdf', '.docx']:
-                raise ValueError(f"Unsupported file type: {file_ext}. Supported types: .pdf, .docx")
-            
-            # Decode base64 to temporary file
-            temp_doc_path = os.path.join(temp_dir, document_name)
-            Base64Utils.decode_base64_to_file(document_base64, temp_doc_path)
-            logger.info(f"Decoded base64 document to: {temp_doc_path}")
-            
-            # Create extractor with settings
-            doc_extractor = DocumentExtractor(min_image_size=min_image_size, create_zip=True)
-            
-            # Create output directory within temp directory
-            output_dir = os.path.join(temp_dir, "extracted_images")
+            duplicate_filter = NearDuplicateFilter.from_options(
+                arguments.get("similar_images"),
+                arguments.get("similarity_threshold"),
+                arguments.get("similarity_hash")
+            )
+            blank_filter = BlankImageFilter() if arguments.get("skip_blank_images") else None
+            request_sink = resolve_output_sink(arguments.get("output"))
+            cancellation = CancellationToken.for_request(arguments.get("timeout_seconds"))
             
-            # Extract images
-            extracted_images, actual_output_dir, zip_path = doc_extractor.extract_images(
-                temp_doc_path,
-                output_dir
+            # Extract in a scratch workspace, sharing the work with identical in-flight requests
+            extraction, release_workspace = await run_shared_base64_extraction(
+                document_base64,
+                document_name,
+                Base64Utils.estimate_decoded_size(document_base64),
+                min_image_size=min_image_size,
+                pages=pages,
+                max_images=max_images,
+                image_ids=image_ids,
+                page_size=page_size,
+                cursor=cursor,
+                stats=stats,
+                client=_mcp_client_id(),
+                duplicate_filter=duplicate_filter,
+                blank_filter=blank_filter,
+                output_sink=request_sink,
+                scan=arguments.get("scan") or "pages",
+                cancellation=cancellation,
+                referenced_only=bool(arguments.get("referenced_only"))
             )
+            document_name = extraction["document_name"]
+            extracted_images = extraction["extracted_images"]
+            actual_output_dir = extraction["output_directory"]
+            zip_path = extraction["zip_path"]
+            next_cursor = extraction["next_cursor"]
             
             result = {
                 "status": "success",
@@ -491,38 +4686,59 @@ async def handle_call_tool(
                 "image_files": [os.path.basename(img) for img in extracted_images]
             }
             
+            if extraction["paginated"]:
+                result["next_cursor"] = next_cursor
+                result["has_more"] = next_cursor is not None
+            
+            if duplicate_filter is not None or extraction["similar_image_groups"]:
+                result["similar_image_groups"] = extraction["similar_image_groups"]
+            if blank_filter is not None or extraction["skipped_blank_images"]:
+                result["skipped_blank_images"] = extraction["skipped_blank_images"]
+            if extraction["image_occurrences"]:
+                result["image_occurrences"] = extraction["image_occurrences"]
+            if extraction["archive_documents"] is not None:
+                result["documents"] = extraction["archive_documents"]
+            
+            stored = extraction["published_images"] is not None
+            if stored:
+                # Images and ZIP file were stored in the output sink; return references
+                result["images"] = extraction["published_images"]
+                if extraction["published_zip"]:
+                    result["zip"] = extraction["published_zip"]
+            
             # Return images as base64 if requested
-            if return_images_as_base64:
-                result["images_base64"] = []
-                for img_path in extracted_images:
-                    img_data = {
-                        "filename": os.path.basename(img_path),
-                        "mime_type": Base64Utils.get_mime_type(img_path),
-                        "base64": Base64Utils.encode_file_to_base64(img_path)
-                    }
-                    result["images_base64"].append(img_data)
+            elif return_images_as_base64:
+                result["images_base64"], zip_data = encode_extraction_outputs(
+                    extracted_images, zip_path, stats
+                )
                 
-                # Also encode the ZIP file if it exists
-                if zip_path and os.path.exists(zip_path):
-                    result["zip_base64"] = {
-                        "filename": os.path.basename(zip_path),
-                        "mime_type": "application/zip",
-                        "base64": Base64Utils.encode_file_to_base64(zip_path)
-                    }
+                # Also include the ZIP file if it exists
+                if zip_data:
+                    result["zip_base64"] = zip_data
             else:
                 result["output_directory"] = actual_output_dir
                 result["full_paths"] = extracted_images
                 result["zip_file"] = zip_path
             
+            if stats.profiler.files:
+                result["profile_files"] = stats.profiler.files
+            
+            stats.record_images(extracted_images)
             response_text = f"Successfully extracted {len(extracted_images)} images from {document_name}\n"
-            if return_images_as_base64:
+            if stored:
+                response_text += f"Images stored in the {request_sink.kind} output sink\n"
+                response_text += f"Files: {', '.join([os.path.basename(img) for img in extracted_images])}\n\n"
+            elif return_images_as_base64:
                 response_text += f"Images returned as base64-encoded data\n"
                 response_text += f"Files: {', '.join([os.path.basename(img) for img in extracted_images])}\n\n"
             else:
                 response_text += f"Output directory: {actual_output_dir}\n"
                 response_text += f"Files: {', '.join([os.path.basename(img) for img in extracted_images])}\n\n"
             
-            response_text += f"Full result: {json.dumps(result, indent=2)}"
+            if next_cursor:
+                response_text += f"More images available; call again with cursor to continue\n\n"
+            
+            response_text += f"Full result: {stats.serialize_with_stats(result, indent=2)}"
             
             return [types.TextContent(type="text", text=response_text)]
             
@@ -531,14 +4747,44 @@ async def handle_call_tool(
             return [types.TextContent(type="text", text=f"Error: {str(e)}")]
         
         finally:
-            # Cleanup temporary files
-            try:
-                import shutil
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-                    logger.info(f"Cleaned up temporary directory: {temp_dir}")
-            except Exception as e:
-                logger.warning(f"Failed to cleanup temporary directory: {str(e)}")
+            # Cleanup happens in the background, off the request path
+            if release_workspace is not None:
+                release_workspace()
+    
+    elif name == "extract_directory_images":
+        root_path = arguments.get("root_path")
+        
+        if not root_path:
+            raise ValueError("root_path is required")
+        
+        try:
+            directory_extractor = DirectoryExtractor(
+                min_image_size=arguments.get("min_image_size", 10),
+                create_zip=True,
+                workers=arguments.get("workers"),
+                scheduler=extraction_scheduler,
+                client=_mcp_client_id()
+            )
+            summary = await directory_extractor.extract_directory(
+                root_path,
+                include=arguments.get("include"),
+                exclude=arguments.get("exclude"),
+                force=arguments.get("force", False),
+                progress_callback=_mcp_progress_callback()
+            )
+            
+            return [types.TextContent(
+                type="text",
+                text=f"Processed {summary['total_documents']} documents under {root_path}: "
+                     f"{summary['extracted']} extracted, {summary['unchanged']} unchanged, "
+                     f"{summary['failed']} failed\n"
+                     f"Manifest: {summary['manifest_path']}\n\n"
+                     f"Full result: {json.dumps(summary, indent=2)}"
+            )]
+            
+        except Exception as e:
+            logger.error(f"Error extracting directory: {str(e)}")
+            return [types.TextContent(type="text", text=f"Error: {str(e)}")]
     
     elif name == "get_document_info":
         document_path = arguments.get("document_path")
@@ -563,13 +4809,17 @@ async def handle_call_tool(
     
     elif name == "list_supported_formats":
         formats = {
-            "supported_extensions": [".pdf", ".docx"],
+            "supported_extensions": FileUtils.SUPPORTED_EXTENSIONS,
+            "archive_extensions": FileUtils.ARCHIVE_EXTENSIONS,
             "pdf_description": "Portable Document Format - extracts embedded images",
             "docx_description": "Microsoft Word Document - extracts images from media folder",
+            "pptx_description": "Microsoft PowerPoint Presentation - extracts images from media folder",
+            "xlsx_description": "Microsoft Excel Workbook - extracts images from media folder",
             "notes": [
                 "PDF files: Extracts raster images embedded in pages",
-                "Word files: Extracts images from the document's media archive",
-                "Minimum image size filtering available for PDF files"
+                "Word, PowerPoint and Excel files: Extracts images from the document's media archive, as stored (no re-rendering)",
+                "Minimum image size filtering available for PDF files",
+                "ZIP archives: Extracts the images of every supported document inside, read straight from the archive"
             ]
         }
         
@@ -586,7 +4836,7 @@ async def handle_call_tool(
         
         try:
             exists = FileUtils.validate_file_exists(document_path)
-            supported = FileUtils.is_supported_document(document_path)
+            supported = FileUtils.is_supported_document(document_path) or FileUtils.is_archive(document_path)
             file_ext = FileUtils.get_file_extension(document_path)
             
             validation = {
@@ -601,6 +4851,14 @@ async def handle_call_tool(
                 validation["error"] = "File does not exist"
             elif not supported:
                 validation["error"] = f"Unsupported file type: {file_ext}"
+            elif file_ext == '.pdf':
+                # Parse the PDF once here; later calls on this path reuse the open handle
+                try:
+                    page_count = await asyncio.to_thread(_pdf_page_count, document_path)
+                    validation["page_count"] = page_count
+                except Exception as e:
+                    validation["status"] = "invalid"
+                    validation["error"] = f"Cannot open PDF: {str(e)}"
             
             return [types.TextContent(
                 type="text", 
@@ -615,38 +4873,270 @@ async def handle_call_tool(
         raise ValueError(f"Unknown tool: {name}")
 
 
-# Create SSE transport handler
+def _pdf_page_count(document_path: str) -> int:
+    """Page count of a PDF on disk, opened through the shared document cache."""
+    with document_cache.open(document_path) as doc:
+        return doc.page_count
+
+
+class SSESession:
+    """Bookkeeping for one SSE connection (see SSESessionRegistry)."""
+    
+    def __init__(self):
+        self.session_id: Optional[str] = None
+        self.started = self.last_activity = time.monotonic()
+        self.messages_in = 0
+        self.messages_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Tool calls still running; a busy session is never idle
+        self.in_flight = 0
+        # The connection's own transport, so its message writer goes with it
+        self.transport = SseServerTransport("/messages")
+        # Scope of the connection and its server loop; cancelling it closes both
+        self.cancel_scope: Optional[anyio.CancelScope] = None
+    
+    def record_in(self, size: int) -> None:
+        """Count a message posted by the client."""
+        self.messages_in += 1
+        self.bytes_in += size
+        self.last_activity = time.monotonic()
+    
+    def record_out(self, size: int, keepalive: bool = False) -> None:
+        """Count bytes sent on the stream; keepalive pings do not count as activity."""
+        self.bytes_out += size
+        if not keepalive:
+            self.messages_out += 1
+            self.last_activity = time.monotonic()
+    
+    def describe(self, now: float) -> dict:
+        """Monitoring entry; only a prefix of the session ID is exposed."""
+        return {
+            "session": self.session_id[:8] if self.session_id else None,
+            "age_seconds": round(now - self.started, 1),
+            "idle_seconds": round(now - self.last_activity, 1),
+            "in_flight": self.in_flight,
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out
+        }
+
+
+class SSESessionRegistry:
+    """
+    Lifecycle management for SSE sessions.
+    
+    Every SSE connection keeps a full server loop running for as long as the
+    client stays connected, so idle clients pile up. The registry caps the
+    number of open sessions at `max_sessions` (0 for no limit), evicting idle
+    sessions first and rejecting new connections when none can be evicted.
+    Sessions without messages in either direction for `idle_timeout` seconds
+    (0 to disable) are closed by `evict_idle`, which `run_reaper` calls
+    periodically; sessions with a tool call in flight are never idle.
+    Per-session message and byte counters, ages and idle times are exposed
+    for monitoring.
+    """
+    
+    def __init__(self, max_sessions: int = 100, idle_timeout: float = 900.0):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: List[SSESession] = []
+        self.evicted = 0
+        self.rejected = 0
+    
+    def __len__(self) -> int:
+        return len(self.sessions)
+    
+    def open(self) -> Optional[SSESession]:
+        """Register a new connection; None if the session limit is reached."""
+        if self.max_sessions and len(self.sessions) >= self.max_sessions:
+            self.evict_idle()
+            if len(self.sessions) >= self.max_sessions:
+                self.rejected += 1
+                return None
+        session = SSESession()
+        self.sessions.append(session)
+        return session
+    
+    def close(self, session: SSESession) -> None:
+        if session in self.sessions:
+            self.sessions.remove(session)
+    
+    def find(self, session_id: Optional[str]) -> Optional[SSESession]:
+        """Look up an open session by the transport's session ID."""
+        for session in self.sessions:
+            if session_id is not None and session.session_id == session_id:
+                return session
+        return None
+    
+    @contextlib.contextmanager
+    def serving(self, session: Optional[SSESession]) -> Iterator[None]:
+        """Mark a tool call in flight on `session` (None for other transports)."""
+        if session is None:
+            yield
+            return
+        session.in_flight += 1
+        try:
+            yield
+        finally:
+            session.in_flight -= 1
+            session.last_activity = time.monotonic()
+    
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Close sessions idle for at least `idle_timeout`; return how many were closed."""
+        if not self.idle_timeout:
+            return 0
+        now = now if now is not None else time.monotonic()
+        idle = [
+            session for session in self.sessions
+            if not session.in_flight and now - session.last_activity >= self.idle_timeout
+        ]
+        for session in idle:
+            logger.info(
+                f"Evicting SSE session {session.session_id} idle for {now - session.last_activity:.0f}s"
+            )
+            if session.cancel_scope is not None:
+                session.cancel_scope.cancel()
+            self.close(session)
+        self.evicted += len(idle)
+        return len(idle)
+    
+    async def run_reaper(self) -> None:
+        """Evict idle sessions periodically (a few times per idle timeout)."""
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+    
+    def summary(self) -> dict:
+        """Session counts and ages for the health check."""
+        now = time.monotonic()
+        return {
+            "active": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout_seconds": self.idle_timeout,
+            "oldest_age_seconds": round(max((now - s.started for s in self.sessions), default=0.0), 1),
+            "idle_over_60s": sum(1 for s in self.sessions if now - s.last_activity >= 60),
+            "bytes_in": sum(s.bytes_in for s in self.sessions),
+            "bytes_out": sum(s.bytes_out for s in self.sessions),
+            "evicted_total": self.evicted,
+            "rejected_total": self.rejected
+        }
+    
+    def describe(self) -> List[dict]:
+        """Per-session monitoring entries, oldest first."""
+        now = time.monotonic()
+        return [session.describe(now) for session in self.sessions]
+
+
+# Answers messages posted for unknown sessions; each connection has its own transport
 sse = SseServerTransport("/messages")
 
+sse_sessions = SSESessionRegistry(
+    max_sessions=int(os.environ.get("DOC_EXTRACTOR_MAX_SSE_SESSIONS", "100")),
+    idle_timeout=float(os.environ.get("DOC_EXTRACTOR_SSE_IDLE_TIMEOUT", "900"))
+)
+
+# The session ID announced in the stream's first ("endpoint") event
+SSE_SESSION_ID_PATTERN = re.compile(rb"session_id=([0-9a-f]{32})")
+
 
 async def handle_sse(request):
-    """Handle SSE connections."""
-    async with sse.connect_sse(
-        request.scope,
-        request.receive,
-        request._send,
-    ) as streams:
-        await server.run(
-            streams[0],
-            streams[1],
-            InitializationOptions(
-                server_name="document-image-extractor-mcp",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                ),
-            ),
+    """Handle SSE connections, within the session limits of `sse_sessions`."""
+    session = sse_sessions.open()
+    if session is None:
+        logger.warning("Rejected SSE connection: session limit reached")
+        return JSONResponse(
+            {"error": "Too many open SSE sessions"},
+            status_code=503,
+            headers={"Retry-After": "30"}
         )
+    
+    async def send(message) -> None:
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if session.session_id is None:
+                match = SSE_SESSION_ID_PATTERN.search(body)
+                if match:
+                    session.session_id = match.group(1).decode("ascii")
+            session.record_out(len(body), keepalive=body.startswith(b": ping"))
+        await request._send(message)
+    
+    session.cancel_scope = anyio.CancelScope()
+    try:
+        with session.cancel_scope:
+            async with session.transport.connect_sse(
+                request.scope,
+                request.receive,
+                send,
+            ) as streams:
+                await server.run(streams[0], streams[1], initialization_options())
+    finally:
+        sse_sessions.close(session)
     return Response()
 
 
 async def handle_messages(request):
-    """Handle incoming messages."""
-    await sse.handle_post_message(request.scope, request.receive, request._send)
+    """Handle incoming messages, routed to the transport of their session."""
+    session = sse_sessions.find(request.query_params.get("session_id"))
+    if session is not None:
+        session.record_in(int(request.headers.get("content-length") or 0))
+    transport = session.transport if session is not None else sse
+    await transport.handle_post_message(request.scope, request.receive, request._send)
     return Response()
 
 
+# Path of the streamable HTTP transport
+STREAMABLE_HTTP_PATH = "/mcp"
+
+
+class StreamableHTTPEndpoint:
+    """
+    ASGI endpoint serving the MCP streamable HTTP transport.
+    
+    In stateless mode (the default) every request gets a fresh transport and
+    no session ID is issued, so any replica can serve any tool call and the
+    server scales out behind a plain round-robin load balancer. Stateful mode
+    keeps sessions in the process that created them (sticky routing needed).
+    `json_response` answers with plain JSON instead of an SSE stream.
+    
+    A session manager can only be run once, so `run` creates a new one for
+    each lifespan of the app.
+    """
+    
+    def __init__(self, stateless: bool = True, json_response: bool = False):
+        self.stateless = stateless
+        self.json_response = json_response
+        self.session_manager: Optional[StreamableHTTPSessionManager] = None
+    
+    @contextlib.asynccontextmanager
+    async def run(self) -> AsyncIterator[None]:
+        """Run a session manager for the lifetime of the enclosed block."""
+        session_manager = StreamableHTTPSessionManager(
+            app=server, stateless=self.stateless, json_response=self.json_response
+        )
+        async with session_manager.run():
+            self.session_manager = session_manager
+            try:
+                yield
+            finally:
+                self.session_manager = None
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if self.session_manager is None:
+            response = JSONResponse({"error": "MCP transport is not running"}, status_code=503)
+            await response(scope, receive, send)
+            return
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+streamable_http = StreamableHTTPEndpoint(
+    stateless=os.environ.get("DOC_EXTRACTOR_MCP_STATELESS", "true").lower() not in ("0", "false", "no"),
+    json_response=os.environ.get("DOC_EXTRACTOR_MCP_JSON_RESPONSE", "false").lower() in ("1", "true", "yes")
+)
+
+
 # REST API endpoints for Power Automate and simple HTTP clients
 
 async def handle_health(request):
@@ -654,16 +5144,93 @@ async def handle_health(request):
     return JSONResponse({
         "status": "healthy",
         "service": "document-image-extractor-mcp",
-        "version": "0.1.0",
+        "version": SERVER_VERSION,
         "endpoints": {
             "mcp_sse": "/sse",
             "mcp_messages": "/messages",
+            "mcp_streamable_http": STREAMABLE_HTTP_PATH,
             "rest_extract_base64": "/api/extract-base64",
-            "rest_health": "/api/health"
-        }
+            "rest_extract_directory": "/api/extract-directory",
+            "rest_health": "/api/health",
+            "rest_sessions": "/api/sessions"
+        },
+        "sse_sessions": sse_sessions.summary(),
+        "document_cache": document_cache.summary()
+    })
+
+
+async def handle_sessions(request):
+    """
+    List open SSE sessions with their ages, idle times and traffic.
+    
+    For monitoring; only available with the server's admin token in
+    X-Profile-Token.
+    """
+    if ADMIN_TOKEN is None:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    token = request.headers.get("x-profile-token")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return JSONResponse({"error": "Admin token required"}, status_code=403)
+    return JSONResponse({
+        "summary": sse_sessions.summary(),
+        "sessions": sse_sessions.describe()
     })
 
 
+class ClientDisconnected(Exception):
+    """Raised when a REST client disconnects before its response is ready."""
+
+
+async def run_until_disconnected(request, awaitable: Awaitable, cleanup: Callable[[object], None]) -> object:
+    """
+    Await `awaitable` for a REST request, cancelling it if the client disconnects first.
+    
+    The request body must already have been read. Raises ClientDisconnected
+    once the work has been cancelled; a result that was ready regardless is
+    passed to `cleanup`.
+    """
+    task = asyncio.ensure_future(awaitable)
+    
+    async def wait_for_disconnect() -> None:
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+    
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    
+    if task.done():
+        return task.result()
+    
+    task.cancel()
+    try:
+        result = await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    else:
+        cleanup(result)
+    raise ClientDisconnected()
+
+
+def _rest_client_id(request) -> str:
+    """
+    Scheduling identity of a REST caller: the X-Client-Id header, a digest of
+    the X-API-Key header, or the client address.
+    """
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return f"client:{client_id[:64]}"
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return f"key:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+    return f"addr:{request.client.host if request.client else 'unknown'}"
+
+
 async def handle_extract_base64_rest(request):
     """
     REST API endpoint for extracting images from base64 documents.
@@ -677,92 +5244,203 @@ async def handle_extract_base64_rest(request):
         "document_base64": "<base64_string>",
         "document_name": "report.pdf",
         "min_image_size": 10,
-        "return_images_as_base64": true
+        "return_images_as_base64": true,
+        "pages": "1-3,7",          (optional, PDF only)
+        "max_images": 20,          (optional)
+        "image_ids": [12, 15],     (optional, PDF xrefs or Office media names)
+        "scan": "xref",            (optional, PDF only, "pages" / "xref": read images from the xref table)
+        "referenced_only": true,   (optional, Word only, referenced images in reading order with counts)
+        "timeout_seconds": 100,    (optional, give up with HTTP 504 after this long)
+        "skip_blank_images": true, (optional, drop blank/solid-colour images)
+        "output": "sink",          (optional, "inline" / "sink": return keys/URLs from the output sink)
+        "similar_images": "drop",  (optional, "keep" / "drop" / "group" near-duplicates)
+        "similarity_threshold": 6, (optional, max Hamming distance of 64-bit hashes)
+        "similarity_hash": "dhash",(optional, "dhash" or "phash")
+        "page_size": 50,           (optional, enables paginated mode)
+        "cursor": "<next_cursor>"  (optional, resumes a paginated extraction)
     }
+    
+    Sending X-Profile-Token with the server's admin token profiles the request
+    (see RequestProfiler); the profile files are listed in "profile_files".
+    
+    In paginated mode the response carries at most page_size images plus
+    "next_cursor"; follow-up calls need only the cursor.
+    
+    When the outputs go to the output sink, "images" and "zip" list object
+    keys and URLs instead of base64 data.
+    
+    If the client disconnects before the response is ready, the extraction is
+    cancelled (unless identical requests are still waiting for it). With
+    "timeout_seconds" it is cancelled after that long, answering HTTP 504.
+    
+    The body is parsed as it streams in and "document_base64" is decoded
+    chunk by chunk into a spooled buffer, so neither the JSON text nor the
+    base64 string is ever held in memory as a whole.
     """
+    document_file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, dir=workspace_manager.root)
     try:
-        # Parse request body
-        body = await request.json()
-        
-        document_base64 = body.get("document_base64")
-        document_name = body.get("document_name")
-        min_image_size = body.get("min_image_size", 10)
-        return_images_as_base64 = body.get("return_images_as_base64", True)
+        # Profiling is restricted to callers presenting the admin token
+        profile_token = request.headers.get("x-profile-token")
+        stats = RequestStats(RequestProfiler.for_request(
+            bool(profile_token and ADMIN_TOKEN and hmac.compare_digest(profile_token, ADMIN_TOKEN))
+        ))
         
-        if not document_base64:
-            return JSONResponse(
-                {"error": "document_base64 is required"},
-                status_code=400
-            )
-        if not document_name:
+        # Parse request body, decoding the document as it arrives
+        parser = StreamingJSONBodyParser("document_base64", document_file)
+        try:
+            with stats.stage("decode"):
+                body = await parser.parse(request.stream())
+        except ValueError as e:
+            logger.warning(f"REST API: Invalid request body: {str(e)}")
             return JSONResponse(
-                {"error": "document_name is required"},
+                {"error": f"Invalid request format: {str(e)}"},
                 status_code=400
             )
+        decoded_size = document_file.tell()
+        has_document = parser.streamed and decoded_size > 0
         
-        # Create temporary directory for processing
-        temp_dir = tempfile.mkdtemp(prefix="mcp_doc_extract_")
-        temp_doc_path = None
+        document_name = body.get("document_name")
+        min_image_size = body.get("min_image_size", 10)
+        return_images_as_base64 = body.get("return_images_as_base64", True)
+        pages = body.get("pages")
+        max_images = body.get("max_images")
+        image_ids = body.get("image_ids")
+        page_size = body.get("page_size")
+        cursor = body.get("cursor")
         
-        try:
-            # Validate file extension
-            file_ext = FileUtils.get_file_extension(document_name)
-            if file_ext not in ['.pdf', '.docx']:
+        if page_size is None and not cursor:
+            if not has_document:
                 return JSONResponse(
-                    {"error": f"Unsupported file type: {file_ext}. Supported: .pdf, .docx"},
+                    {"error": "document_base64 is required"},
                     status_code=400
                 )
-            
-            # Decode base64 to temporary file
-            temp_doc_path = os.path.join(temp_dir, document_name)
-            Base64Utils.decode_base64_to_file(document_base64, temp_doc_path)
-            logger.info(f"REST API: Decoded base64 document to: {temp_doc_path}")
-            
-            # Update extractor settings
-            global extractor
-            extractor = DocumentExtractor(min_image_size=min_image_size, create_zip=True)
-            
-            # Create output directory within temp directory
-            output_dir = os.path.join(temp_dir, "extracted_images")
-            
-            # Extract images
-            extracted_images, actual_output_dir, zip_path = extractor.extract_images(
-                temp_doc_path,
-                output_dir
+            if not document_name:
+                return JSONResponse(
+                    {"error": "document_name is required"},
+                    status_code=400
+                )
+        
+        stats.bytes_in = decoded_size
+        
+        # The decoded document is handed over to the (possibly shared) extraction
+        uploaded_file, document_file = (document_file if has_document else None), None
+        release_workspace = None
+        try:
+            duplicate_filter = NearDuplicateFilter.from_options(
+                body.get("similar_images"),
+                body.get("similarity_threshold"),
+                body.get("similarity_hash")
             )
+            blank_filter = BlankImageFilter() if body.get("skip_blank_images") else None
+            request_sink = resolve_output_sink(body.get("output"))
+            cancellation = CancellationToken.for_request(body.get("timeout_seconds"))
+            
+            # Extract in a scratch workspace, sharing the work with identical in-flight
+            # requests; the extraction is abandoned if the client disconnects first
+            extraction, release_workspace = await run_until_disconnected(request, run_shared_base64_extraction(
+                None,
+                document_name,
+                decoded_size,
+                min_image_size=min_image_size,
+                pages=pages,
+                max_images=max_images,
+                image_ids=image_ids,
+                page_size=page_size,
+                cursor=cursor,
+                stats=stats,
+                document_file=uploaded_file,
+                document_hash=parser.document_hash if has_document else None,
+                client=_rest_client_id(request),
+                duplicate_filter=duplicate_filter,
+                blank_filter=blank_filter,
+                output_sink=request_sink,
+                scan=body.get("scan") or "pages",
+                cancellation=cancellation,
+                referenced_only=bool(body.get("referenced_only"))
+            ), cleanup=lambda shared: shared[1]())
+            extracted_images = extraction["extracted_images"]
+            zip_path = extraction["zip_path"]
             
             result = {
                 "status": "success",
-                "document_name": document_name,
+                "document_name": extraction["document_name"],
                 "extracted_images_count": len(extracted_images),
                 "image_files": [os.path.basename(img) for img in extracted_images]
             }
             
-            # Return images as base64 if requested
-            if return_images_as_base64:
-                result["images"] = []
-                for img_path in extracted_images:
-                    img_data = {
-                        "filename": os.path.basename(img_path),
-                        "mime_type": Base64Utils.get_mime_type(img_path),
-                        "base64": Base64Utils.encode_file_to_base64(img_path)
-                    }
-                    result["images"].append(img_data)
-                
-                # Also encode the ZIP file if it exists
-                if zip_path and os.path.exists(zip_path):
-                    result["zip"] = {
-                        "filename": os.path.basename(zip_path),
-                        "mime_type": "application/zip",
-                        "base64": Base64Utils.encode_file_to_base64(zip_path)
-                    }
+            if extraction["paginated"]:
+                result["next_cursor"] = extraction["next_cursor"]
+                result["has_more"] = extraction["next_cursor"] is not None
+            
+            if duplicate_filter is not None or extraction["similar_image_groups"]:
+                result["similar_image_groups"] = extraction["similar_image_groups"]
+            if blank_filter is not None or extraction["skipped_blank_images"]:
+                result["skipped_blank_images"] = extraction["skipped_blank_images"]
+            if extraction["image_occurrences"]:
+                result["image_occurrences"] = extraction["image_occurrences"]
+            if extraction["archive_documents"] is not None:
+                result["documents"] = extraction["archive_documents"]
+            
+            # Images (and the ZIP file, if it exists) are base64-encoded
+            # while the response is written
+            outputs: Iterable[bytes] = ()
+            if extraction["published_images"] is not None:
+                # Stored in the output sink; only references are returned
+                result["images"] = extraction["published_images"]
+                if extraction["published_zip"]:
+                    result["zip"] = extraction["published_zip"]
+            elif return_images_as_base64:
+                outputs = iter_encoded_outputs(extracted_images, zip_path, stats)
+                if stats.profiler is not NULL_PROFILER:
+                    # Profiled requests encode up front so the stage is profiled as a whole
+                    with stats.profiler.stage("encode"):
+                        outputs = list(outputs)
             else:
-                result["output_directory"] = actual_output_dir
+                result["output_directory"] = extraction["output_directory"]
                 result["image_paths"] = extracted_images
                 result["zip_path"] = zip_path
             
-            return JSONResponse(result)
+            stats.record_images(extracted_images)
             
+            # The workspace is released once the response has been sent
+            response = StreamingResponse(
+                iter_extraction_response(result, outputs, stats),
+                media_type="application/json",
+                headers={"Server-Timing": stats.server_timing_header()},
+                background=BackgroundTask(release_workspace)
+            )
+            release_workspace = None
+            return response
+            
+        except WorkspaceQuotaExceeded as e:
+            logger.warning(f"REST API: {str(e)}")
+            return JSONResponse(
+                {"error": str(e)},
+                status_code=503,
+                headers={"Retry-After": "30"}
+            )
+        
+        except ClientDisconnected:
+            logger.info("REST API: Client disconnected; extraction abandoned")
+            return JSONResponse(
+                {"error": "Client disconnected"},
+                status_code=499
+            )
+        
+        except ExtractionCancelled as e:
+            logger.warning(f"REST API: {str(e)}")
+            return JSONResponse(
+                {"error": str(e)},
+                status_code=504
+            )
+        
+        except ValueError as e:
+            logger.warning(f"REST API: Invalid extraction request: {str(e)}")
+            return JSONResponse(
+                {"error": str(e)},
+                status_code=400
+            )
+        
         except Exception as e:
             logger.error(f"REST API: Error extracting images: {str(e)}")
             return JSONResponse(
@@ -771,39 +5449,176 @@ async def handle_extract_base64_rest(request):
             )
         
         finally:
-            # Cleanup temporary files
-            try:
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-                    logger.info(f"REST API: Cleaned up temporary directory: {temp_dir}")
-            except Exception as e:
-                logger.warning(f"REST API: Failed to cleanup: {str(e)}")
+            # Cleanup happens in the background, off the request path
+            if release_workspace is not None:
+                release_workspace()
+    
+    except Exception as e:
+        logger.error(f"REST API: Request error: {str(e)}")
+        return JSONResponse(
+            {"error": "Invalid request format"},
+            status_code=400
+        )
+    
+    finally:
+        if document_file is not None:
+            document_file.close()
+
+
+async def handle_extract_directory_rest(request):
+    """
+    REST API endpoint for bulk extraction over a server-side directory.
+    
+    POST /api/extract-directory
+    Content-Type: application/json
     
+    Body:
+    {
+        "root_path": "/data/share",
+        "include": ["*.pdf"],       (optional)
+        "exclude": ["archive/*"],   (optional)
+        "workers": 8,               (optional)
+        "min_image_size": 10,       (optional)
+        "force": false              (optional)
+    }
+    """
+    try:
+        body = await request.json()
     except Exception as e:
         logger.error(f"REST API: Request error: {str(e)}")
         return JSONResponse(
             {"error": "Invalid request format"},
             status_code=400
         )
+    
+    root_path = body.get("root_path")
+    if not root_path:
+        return JSONResponse(
+            {"error": "root_path is required"},
+            status_code=400
+        )
+    
+    async def log_progress(done: int, total: int) -> None:
+        if total and (done == total or done % 100 == 0):
+            logger.info(f"REST API: Directory extraction progress {done}/{total}")
+    
+    try:
+        directory_extractor = DirectoryExtractor(
+            min_image_size=body.get("min_image_size", 10),
+            create_zip=True,
+            workers=body.get("workers"),
+            scheduler=extraction_scheduler,
+            client=_rest_client_id(request)
+        )
+        summary = await directory_extractor.extract_directory(
+            root_path,
+            include=body.get("include"),
+            exclude=body.get("exclude"),
+            force=body.get("force", False),
+            progress_callback=log_progress
+        )
+        return JSONResponse(summary)
+    
+    except FileNotFoundError as e:
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=404
+        )
+    
+    except ValueError as e:
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=400
+        )
+    
+    except Exception as e:
+        logger.error(f"REST API: Error extracting directory: {str(e)}")
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=500
+        )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Start the streamable HTTP transport and background maintenance tasks for the lifetime of the HTTP app."""
+    janitor = asyncio.create_task(workspace_manager.run_janitor(JANITOR_INTERVAL))
+    checkpoint_expiry = asyncio.create_task(checkpoint_cache.run_expiry(JANITOR_INTERVAL))
+    reaper = asyncio.create_task(sse_sessions.run_reaper()) if sse_sessions.idle_timeout else None
+    try:
+        async with streamable_http.run():
+            yield
+    finally:
+        janitor.cancel()
+        checkpoint_expiry.cancel()
+        if reaper is not None:
+            reaper.cancel()
+        await asyncio.to_thread(workspace_manager.flush)
 
 
 # Create Starlette app
 app = Starlette(
     debug=True,
+    lifespan=lifespan,
     routes=[
         # MCP protocol endpoints
         Route("/sse", endpoint=handle_sse),
         Route("/messages", endpoint=handle_messages, methods=["POST"]),
+        Route(STREAMABLE_HTTP_PATH, endpoint=streamable_http, methods=["GET", "POST", "DELETE"]),
         
         # REST API endpoints (for Power Automate, etc.)
         Route("/api/health", endpoint=handle_health, methods=["GET"]),
+        Route("/api/sessions", endpoint=handle_sessions, methods=["GET"]),
         Route("/api/extract-base64", endpoint=handle_extract_base64_rest, methods=["POST"]),
+        Route("/api/extract-directory", endpoint=handle_extract_directory_rest, methods=["POST"]),
     ],
 )
 
 
-async def main():
-    """Main entry point for the HTTP server."""
+def initialization_options() -> InitializationOptions:
+    """Server name, version and capabilities announced to MCP clients."""
+    return InitializationOptions(
+        server_name="document-image-extractor-mcp",
+        server_version=SERVER_VERSION,
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        ),
+    )
+
+
+# Transports the server can be started with (see main)
+TRANSPORTS = ("http", "stdio")
+
+
+async def run_stdio() -> None:
+    """
+    Serve MCP over stdin/stdout for a local client that launches the server.
+    
+    Nothing HTTP-related is started: no port is opened, and uvicorn, the
+    streamable HTTP transport and the SSE session reaper are never set up.
+    Logs and PyMuPDF messages go to stderr, leaving stdout to the protocol.
+    """
+    from mcp.server.stdio import stdio_server
+    
+    fitz.set_messages(pylogging=True)
+    janitor = asyncio.create_task(workspace_manager.run_janitor(JANITOR_INTERVAL))
+    checkpoint_expiry = asyncio.create_task(checkpoint_cache.run_expiry(JANITOR_INTERVAL))
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, initialization_options())
+    finally:
+        janitor.cancel()
+        checkpoint_expiry.cancel()
+        await asyncio.to_thread(workspace_manager.flush)
+
+
+async def main(transport: str = "http"):
+    """Main entry point: serve MCP and the REST API over HTTP, or MCP alone over stdio."""
+    if transport == "stdio":
+        await run_stdio()
+        return
+    
     import uvicorn
     
     config = uvicorn.Config(
@@ -0,0 +1,39 @@
+"""
+PDF fixtures shared by the test scripts.
+"""
+
+import base64
+from pathlib import Path
+from typing import Union
+
+import fitz  # PyMuPDF
+
+
+def create_test_pdf_bytes(page_count: int = 1, images_per_page: int = 1, size: int = 40, shade: int = 0) -> bytes:
+    """
+    Create a PDF with `images_per_page` solid size x size images on each page.
+
+    Every image in the document has a different colour; `shade` varies the
+    colours between documents.
+    """
+    doc = fitz.open()
+    for page_num in range(page_count):
+        page = doc.new_page()
+        for img_num in range(images_per_page):
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, size, size), False)
+            pix.set_rect(pix.irect, ((shade + page_num * 7) % 256, (page_num // 37 * 50) % 256, img_num * 90 % 256))
+            top = 50 + img_num * 110
+            page.insert_image(fitz.Rect(50, top, 150, top + 100), pixmap=pix)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def create_test_pdf(path: Union[str, Path], **options) -> None:
+    """Write a PDF from create_test_pdf_bytes to `path`."""
+    Path(path).write_bytes(create_test_pdf_bytes(**options))
+
+
+def create_test_pdf_base64(**options) -> str:
+    """A PDF from create_test_pdf_bytes, base64-encoded."""
+    return base64.b64encode(create_test_pdf_bytes(**options)).decode('utf-8')
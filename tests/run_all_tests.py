@@ -55,6 +55,30 @@ def main():
         ("test-mcp-config.py", "MCP Server Configuration and Accessibility"),
         ("test-copilot-mcp.py", "GitHub Copilot MCP Integration"),
         ("test_zip_mcp.py", "ZIP File Creation Functionality"),
+        ("test_image_selection.py", "Page-Range and Image Selection"),
+        ("test_pagination.py", "Cursor-Based Pagination"),
+        ("test_workspace_manager.py", "Scratch Workspace Management"),
+        ("test_incremental_extraction.py", "Incremental Re-Extraction"),
+        ("test_directory_extraction.py", "Bulk Directory Extraction"),
+        ("test_ooxml_extraction.py", "PowerPoint and Excel Extraction"),
+        ("test_request_profiling.py", "Per-Request Profiling"),
+        ("test_request_stats.py", "Per-Request Stats"),
+        ("test_streaming_upload.py", "Streamed Uploads"),
+        ("test_streamed_response.py", "Streamed Responses"),
+        ("test_request_coalescing.py", "Request Coalescing"),
+        ("test_scheduler.py", "Extraction Scheduling"),
+        ("test_near_duplicates.py", "Near-Duplicate Filtering"),
+        ("test_blank_images.py", "Blank Image Filtering"),
+        ("test_output_sinks.py", "Output Sinks"),
+        ("test_streamable_http.py", "Streamable HTTP Transport"),
+        ("test_sse_sessions.py", "SSE Session Management"),
+        ("test_document_cache.py", "Document Handle Cache"),
+        ("test_xref_scan.py", "Xref Scan Extraction"),
+        ("test_cli.py", "Command-Line Interface"),
+        ("test_stdio_transport.py", "stdio Transport"),
+        ("test_cancellation.py", "Cooperative Cancellation"),
+        ("test_docx_references.py", "Relationship-Aware Word Extraction"),
+        ("test_archive_input.py", "Archive Input"),
     ]
     
     # Track results
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test extracting images from ZIP archives of documents without unpacking them to disk.
+"""
+
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from starlette.testclient import TestClient
+from document_image_extractor_mcp.server import (
+    ArchiveExtractor, DocumentExtractor, RequestStats, app, handle_call_tool
+)
+from pdf_fixtures import create_test_pdf_bytes
+
+
+def docx_bytes() -> bytes:
+    """A Word package with two media files."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as docx:
+        docx.writestr("word/document.xml", "<document/>")
+        docx.writestr("word/media/image1.png", b"first")
+        docx.writestr("word/media/image2.png", b"second")
+    return buffer.getvalue()
+
+
+def create_archive(path: str) -> None:
+    """Two PDFs (one in a folder), a Word document, a broken PDF and files that are not documents."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("summary.pdf", create_test_pdf_bytes(page_count=2, shade=10))
+        archive.writestr("reports/", b"")
+        archive.writestr("reports/q1 final.pdf", create_test_pdf_bytes(page_count=3, shade=200))
+        archive.writestr("notes.txt", b"not a document")
+        archive.writestr("letter.docx", docx_bytes())
+        archive.writestr("broken.pdf", b"not a pdf")
+        archive.writestr("nested.zip", b"PK")
+        archive.writestr("__MACOSX/._summary.pdf", b"resource fork")
+
+
+def test_archive_members_are_extracted():
+    """Every document is extracted in archive order, with prefixed names and per-document results."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = str(Path(temp_dir) / "bundle.zip")
+        create_archive(archive_path)
+        output_dir = Path(temp_dir) / "out"
+
+        stats = RequestStats()
+        extractor = ArchiveExtractor(stats=stats)
+        start = time.perf_counter()
+        with stats.stage("extract"):
+            images = extractor.extract_images(archive_path, str(output_dir))
+        elapsed = (time.perf_counter() - start) * 1000
+        # Members run one after another, and their stages are not counted twice
+        assert "read" in stats.durations
+        assert sum(stats.durations.values()) <= elapsed + 1
+        assert [os.path.basename(path) for path in images] == [
+            "summary.pdf_page_1_image_1.png", "summary.pdf_page_2_image_1.png",
+            "reports_q1_final.pdf_page_1_image_1.png", "reports_q1_final.pdf_page_2_image_1.png",
+            "reports_q1_final.pdf_page_3_image_1.png",
+            "letter.docx_image1.png", "letter.docx_image2.png"
+        ]
+        assert sorted(os.listdir(output_dir)) == sorted(os.path.basename(path) for path in images)
+        # Nothing but the images is written: members are read into memory
+        assert sorted(os.listdir(temp_dir)) == ["bundle.zip", "out"]
+
+        statuses = {document["document"]: document["status"] for document in extractor.documents}
+        assert statuses == {
+            "summary.pdf": "extracted", "reports/q1 final.pdf": "extracted",
+            "letter.docx": "extracted", "broken.pdf": "failed"
+        }
+        assert extractor.documents[1]["extracted_images"] == 3
+    print("✅ Archive members are extracted in archive order")
+
+
+def test_selection_and_limits():
+    """pages applies per PDF, max_images caps the total and oversized members fail on their own."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = str(Path(temp_dir) / "bundle.zip")
+        create_archive(archive_path)
+
+        extractor = ArchiveExtractor()
+        images = extractor.extract_images(archive_path, str(Path(temp_dir) / "pages"), pages="2")
+        assert [os.path.basename(path) for path in images][:2] == [
+            "summary.pdf_page_2_image_1.png", "reports_q1_final.pdf_page_2_image_1.png"
+        ]
+
+        output_dir = Path(temp_dir) / "capped"
+        images = extractor.extract_images(archive_path, str(output_dir), max_images=3)
+        assert len(images) == 3 and len(os.listdir(output_dir)) == 3
+        assert extractor.documents[1]["extracted_images"] == 1
+        assert [document["status"] for document in extractor.documents[2:]] == ["skipped", "skipped"]
+
+        small = ArchiveExtractor(max_member_bytes=1000)
+        assert small.extract_images(archive_path, str(Path(temp_dir) / "small")) == [
+            str(Path(temp_dir) / "small" / "letter.docx_image1.png"),
+            str(Path(temp_dir) / "small" / "letter.docx_image2.png")
+        ]
+        assert "limit for archive members" in small.documents[0]["error"]
+
+        try:
+            extractor.extract_images(archive_path, temp_dir, image_ids=["image1.png"])
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    print("✅ Selections and limits apply across the archive")
+
+
+def test_document_extractor_and_info():
+    """The path-based extractor creates one combined ZIP; get_document_info lists the documents."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = str(Path(temp_dir) / "bundle.zip")
+        create_archive(archive_path)
+
+        doc_extractor = DocumentExtractor()
+        images, output_dir, zip_path = doc_extractor.extract_images(archive_path)
+        assert output_dir.endswith("bundle_archive_images") and len(images) == 7
+        assert len(doc_extractor.archive_documents) == 4
+        with zipfile.ZipFile(zip_path) as combined:
+            assert "original_document/bundle.zip" in combined.namelist()
+            assert "extracted_images/letter.docx_image2.png" in combined.namelist()
+
+        info = doc_extractor.get_document_info(archive_path)
+        assert info["document_count"] == 4 and "reports/q1 final.pdf" in info["documents"]
+    print("✅ Archives are combined into one result and ZIP file")
+
+
+def test_base64_tools():
+    """The MCP base64 tool and the REST endpoint accept ZIP archives."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = Path(temp_dir) / "bundle.zip"
+        create_archive(str(archive_path))
+        archive_base64 = base64.b64encode(archive_path.read_bytes()).decode('utf-8')
+
+    response = asyncio.run(handle_call_tool("extract_document_images_base64", {
+        "document_base64": archive_base64,
+        "document_name": "bundle.zip",
+        "return_images_as_base64": False
+    }))
+    result = json.loads(response[0].text.split("Full result: ", 1)[1])
+    assert result["extracted_images"] == 7
+    assert [document["status"] for document in result["documents"]] == ["extracted"] * 3 + ["failed"]
+
+    response = asyncio.run(handle_call_tool("extract_document_images_base64", {
+        "document_base64": archive_base64,
+        "document_name": "bundle.zip",
+        "page_size": 2
+    }))
+    assert response[0].text == "Error: ZIP archives cannot be extracted in batches; omit page_size and cursor"
+
+    response = TestClient(app).post("/api/extract-base64", json={
+        "document_base64": archive_base64,
+        "document_name": "bundle.zip"
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["images"]) == 7 and body["zip"]["filename"] == "bundle_Document_and_Images.zip"
+    assert body["documents"][3]["document"] == "broken.pdf"
+    print("✅ The base64 tools accept ZIP archives")
+
+
+if __name__ == "__main__":
+    print("🗜️  Testing Archive Input")
+    print("=" * 50)
+    test_archive_members_are_extracted()
+    test_selection_and_limits()
+    test_document_extractor_and_info()
+    test_base64_tools()
+    print("\n🎉 Archive input tests completed successfully!")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test rejection of blank and solid-colour images before encoding.
+"""
+
+import asyncio
+import base64
+import json
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import fitz  # PyMuPDF
+import numpy as np
+from document_image_extractor_mcp.server import BlankImageFilter, DocumentExtractor, handle_call_tool
+
+
+def make_pixmap(pixels: np.ndarray, colorspace=fitz.csRGB) -> fitz.Pixmap:
+    """Build a pixmap from an (h, w, n) uint8 array."""
+    return fitz.Pixmap(colorspace, pixels.shape[1], pixels.shape[0], pixels.astype(np.uint8).tobytes(), 0)
+
+
+def patterned(height: int = 80, width: int = 80) -> np.ndarray:
+    """A real-looking RGB image with plenty of variation."""
+    y, x = np.mgrid[0:height, 0:width]
+    gray = 128 + 100 * np.sin(x / 7.0) * np.cos(y / 11.0)
+    return np.stack([gray, 255 - gray, (x * 3) % 255], axis=2)
+
+
+def create_pdf(path: str) -> None:
+    """A white page background with speckles, a solid separator bar and a real image."""
+    rng = np.random.default_rng(3)
+    background = np.full((400, 300, 3), 255)
+    background[rng.integers(0, 400, 5), rng.integers(0, 300, 5)] = 0
+    bar = np.tile(np.array([30, 60, 200]), (12, 300, 1))
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=make_pixmap(background))
+    page.insert_image(fitz.Rect(50, 700, 550, 720), pixmap=make_pixmap(bar))
+    page.insert_image(fitz.Rect(50, 50, 250, 250), pixmap=make_pixmap(patterned()))
+    doc.save(path)
+    doc.close()
+
+
+def test_is_blank():
+    """Solid, near-white, transparent and CMYK blanks are detected; real images are not."""
+    blank_filter = BlankImageFilter()
+    assert blank_filter.is_blank(make_pixmap(np.full((50, 70, 3), 255)))
+    assert blank_filter.is_blank(make_pixmap(np.full((50, 70, 1), 90), fitz.csGRAY))
+    assert blank_filter.is_blank(make_pixmap(np.zeros((50, 70, 4)), fitz.csCMYK))
+    assert not blank_filter.is_blank(make_pixmap(patterned()))
+
+    transparent = fitz.Pixmap(make_pixmap(patterned()), 1)
+    transparent.set_alpha(bytes(transparent.width * transparent.height))
+    assert blank_filter.is_blank(transparent)
+
+    # A large near-white image is checked through a downsampled view
+    scan = np.full((2000, 1500, 3), 252)
+    scan[100:104, 100:104] = 0
+    assert blank_filter.is_blank(make_pixmap(scan))
+    assert blank_filter.rejected == 0
+    print("✅ Blank pixmaps are detected")
+
+
+def test_thin_lines_are_kept():
+    """1-pixel line-art on white is not mistaken for a blank page at any sampling offset."""
+    blank_filter = BlankImageFilter()
+    for offset in (0, 5, 17):
+        grid = np.full((1200, 1200, 3), 255)
+        grid[offset::100, :] = 0
+        grid[:, offset::100] = 0
+        assert not blank_filter.is_blank(make_pixmap(grid)), offset
+
+    # A page-size scan with a single rule or a short pen stroke is not blank either
+    rule = np.full((3508, 2480, 3), 250)
+    rule[1700:1702, 300:2200] = 20
+    assert not blank_filter.is_blank(make_pixmap(rule))
+
+    signature = np.full((3508, 2480, 3), 250)
+    x = np.arange(1500, 2000)
+    y = (3000 + 40 * np.sin(x / 25.0)).astype(int)
+    for dy in range(3):
+        signature[y + dy, x] = 30
+    assert not blank_filter.is_blank(make_pixmap(signature))
+
+    form = np.full((3508, 2480, 3), 255)
+    form[::60, :] = 0
+    form[1::60, :] = 0
+    assert not blank_filter.is_blank(make_pixmap(form))
+    print("✅ Thin lines are kept")
+
+
+def test_pdf_extraction_skips_blank_images():
+    """Only the real image is saved when blank filtering is enabled."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "scan.pdf")
+        create_pdf(pdf_path)
+
+        everything, _, _ = DocumentExtractor(create_zip=False).extract_images(pdf_path, str(Path(temp_dir) / "all"))
+        assert len(everything) == 3
+
+        blank_filter = BlankImageFilter()
+        extractor = DocumentExtractor(create_zip=False, blank_filter=blank_filter)
+        images, _, _ = extractor.extract_images(pdf_path, str(Path(temp_dir) / "filtered"))
+        assert [Path(image).name for image in images] == ["page_1_image_3.png"]
+        assert blank_filter.rejected == 2
+    print("✅ PDF extraction skips blank images")
+
+
+def test_ooxml_and_tool_results():
+    """Blank OOXML media is dropped and the tool reports how many images were skipped."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        docx_path = Path(temp_dir) / "report.docx"
+        with zipfile.ZipFile(docx_path, "w") as docx:
+            docx.writestr("[Content_Types].xml", "<Types/>")
+            docx.writestr("word/document.xml", "<document/>")
+            docx.writestr("word/media/image1.png", make_pixmap(np.full((40, 40, 3), 255)).tobytes("png"))
+            docx.writestr("word/media/image2.png", make_pixmap(patterned()).tobytes("png"))
+
+        response = asyncio.run(handle_call_tool("extract_document_images_base64", {
+            "document_base64": base64.b64encode(docx_path.read_bytes()).decode('utf-8'),
+            "document_name": "report.docx",
+            "skip_blank_images": True,
+            "return_images_as_base64": False
+        }))
+        result = json.loads(response[0].text.split("Full result: ", 1)[1])
+        assert result["extracted_images"] == 1
+        assert result["skipped_blank_images"] == 1
+
+        pdf_path = str(Path(temp_dir) / "scan.pdf")
+        create_pdf(pdf_path)
+        response = asyncio.run(handle_call_tool("extract_document_images", {"document_path": pdf_path}))
+        result = json.loads(response[0].text.split("Full result: ", 1)[1])
+        assert result["extracted_images"] == 3
+        assert "skipped_blank_images" not in result
+    print("✅ Tool results report skipped blank images")
+
+
+if __name__ == "__main__":
+    print("⬜ Testing Blank Image Filtering")
+    print("=" * 50)
+    test_is_blank()
+    test_thin_lines_are_kept()
+    test_pdf_extraction_skips_blank_images()
+    test_ooxml_and_tool_results()
+    print("\n🎉 Blank image filtering tests completed successfully!")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Test cooperative cancellation of extractions (client disconnects, MCP cancellation, deadlines).
+"""
+
+import asyncio
+import base64
+import json
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from sse_starlette.sse import AppStatus
+from starlette.requests import Request
+from starlette.testclient import TestClient
+from document_image_extractor_mcp import server
+from document_image_extractor_mcp.server import (
+    CancellationToken, DocumentExtractor, ExtractionCancelled, ExtractionScheduler,
+    app, handle_call_tool, handle_extract_base64_rest
+)
+from pdf_fixtures import create_test_pdf
+
+
+class CancelAfter(CancellationToken):
+    """A token that cancels itself after a number of checks."""
+
+    def __init__(self, checks: int):
+        super().__init__()
+        self.remaining = checks
+
+    def check(self) -> None:
+        self.remaining -= 1
+        if self.remaining < 0:
+            self.cancel("test")
+        super().check()
+
+
+def test_token():
+    """Tokens are cancelled explicitly or by their deadline."""
+    token = CancellationToken()
+    token.check()
+    token.cancel("client went away")
+    try:
+        token.check()
+        assert False, "Expected ExtractionCancelled"
+    except ExtractionCancelled as e:
+        assert str(e) == "Extraction cancelled: client went away"
+
+    timed = CancellationToken(0.05)
+    assert not timed.cancelled
+    time.sleep(0.06)
+    assert timed.cancelled and timed.reason == "deadline of 0.05s exceeded"
+
+    for bad in (0, -1):
+        try:
+            CancellationToken(bad)
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    assert CancellationToken.for_request("2.5").timeout == 2.5
+    print("✅ Tokens are cancelled explicitly and by deadlines")
+
+
+def test_extractors_stop_between_images():
+    """PDF and Office extraction stop at the next check once cancelled."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "long.pdf")
+        create_test_pdf(pdf_path, page_count=20, size=120)
+        output_dir = Path(temp_dir) / "pdf"
+        try:
+            DocumentExtractor(create_zip=False, cancellation=CancelAfter(6)).extract_images(pdf_path, str(output_dir))
+            assert False, "Expected ExtractionCancelled"
+        except ExtractionCancelled:
+            pass
+        assert 0 < len(list(output_dir.glob("*.png"))) < 20
+
+        docx_path = str(Path(temp_dir) / "report.docx")
+        with zipfile.ZipFile(docx_path, "w") as docx:
+            docx.writestr("word/document.xml", "<document/>")
+            for index in range(10):
+                docx.writestr(f"word/media/image{index}.png", b"png-bytes")
+        output_dir = Path(temp_dir) / "docx"
+        try:
+            DocumentExtractor(create_zip=False, cancellation=CancelAfter(3)).extract_images(docx_path, str(output_dir))
+            assert False, "Expected ExtractionCancelled"
+        except ExtractionCancelled:
+            pass
+        assert len(list(output_dir.iterdir())) == 3
+    print("✅ Extractors stop between images")
+
+
+def test_scheduler_cancels_running_job():
+    """Cancelling the caller cancels the token; expired jobs never start."""
+    async def scenario():
+        scheduler = ExtractionScheduler(max_workers=1)
+        token = CancellationToken()
+        stopped = threading.Event()
+
+        def work():
+            while True:
+                try:
+                    token.check()
+                except ExtractionCancelled:
+                    stopped.set()
+                    raise
+                time.sleep(0.01)
+
+        job = asyncio.ensure_future(scheduler.run(1, "c", work, cancellation=token))
+        await asyncio.sleep(0.1)
+        job.cancel()
+        try:
+            await job
+            assert False, "Expected CancelledError"
+        except asyncio.CancelledError:
+            pass
+        assert stopped.is_set() and token.reason == "request cancelled"
+        assert scheduler.running == 0
+
+        started = []
+        release = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot(1, "c"):
+                await release.wait()
+
+        blocking = asyncio.ensure_future(blocker())
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(scheduler.run(1, "c", lambda: started.append(1), CancellationToken(0.01)))
+        await asyncio.sleep(0.05)
+        release.set()
+        await blocking
+        try:
+            await queued
+            assert False, "Expected ExtractionCancelled"
+        except ExtractionCancelled:
+            pass
+        assert started == []
+
+    asyncio.run(scenario())
+    print("✅ The scheduler cancels abandoned and expired jobs")
+
+
+def test_deadlines_in_tools():
+    """timeout_seconds ends a long extraction with an error (HTTP 504 over REST)."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "long.pdf"
+        create_test_pdf(pdf_path, page_count=200, size=120)
+
+        response = asyncio.run(handle_call_tool("extract_document_images", {
+            "document_path": str(pdf_path),
+            "timeout_seconds": 0.001
+        }))
+        assert response[0].text.startswith("Error: Extraction cancelled: deadline of 0.001s exceeded")
+
+        response = TestClient(app).post("/api/extract-base64", json={
+            "document_base64": base64.b64encode(pdf_path.read_bytes()).decode('utf-8'),
+            "document_name": "long.pdf",
+            "timeout_seconds": 0.001
+        })
+        assert response.status_code == 504
+        assert "deadline" in response.json()["error"]
+
+        response = asyncio.run(handle_call_tool("extract_document_images", {
+            "document_path": str(pdf_path),
+            "timeout_seconds": -1
+        }))
+        assert response[0].text == "Error: timeout_seconds must be a positive number"
+    print("✅ Deadlines stop extractions")
+
+
+def test_rest_disconnect_cancels_extraction():
+    """A REST client that disconnects mid-extraction stops the work."""
+    AppStatus.should_exit_event = None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "long.pdf"
+        create_test_pdf(pdf_path, page_count=300, size=120)
+        body = json.dumps({
+            "document_base64": base64.b64encode(pdf_path.read_bytes()).decode('utf-8'),
+            "document_name": "long.pdf"
+        }).encode()
+
+    tokens = []
+    original = CancellationToken.for_request
+
+    def recording(timeout_seconds=None):
+        tokens.append(original(timeout_seconds))
+        return tokens[-1]
+
+    async def scenario():
+        disconnect = asyncio.Event()
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http", "method": "POST", "path": "/api/extract-base64", "raw_path": b"/api/extract-base64",
+            "headers": [(b"content-type", b"application/json")], "query_string": b"", "root_path": "",
+            "client": ("127.0.0.1", 5000), "server": ("test", 80), "scheme": "http", "http_version": "1.1"
+        }
+        handler = asyncio.ensure_future(handle_extract_base64_rest(Request(scope, receive)))
+        while server.extraction_scheduler.running == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        disconnect.set()
+        response = await asyncio.wait_for(handler, 10)
+
+        started = time.monotonic()
+        while server.extraction_scheduler.running:
+            await asyncio.sleep(0.01)
+        return response, time.monotonic() - started
+
+    server.CancellationToken.for_request = recording
+    try:
+        response, wind_down = asyncio.run(scenario())
+    finally:
+        server.CancellationToken.for_request = original
+    assert response.status_code == 499
+    assert tokens[0].cancelled and tokens[0].reason == "request cancelled"
+    assert wind_down < 2
+    print("✅ Client disconnects cancel REST extractions")
+
+
+if __name__ == "__main__":
+    print("🛑 Testing Cooperative Cancellation")
+    print("=" * 50)
+    test_token()
+    test_extractors_stop_between_images()
+    test_scheduler_cancels_running_job()
+    test_deadlines_in_tools()
+    test_rest_disconnect_cancels_extraction()
+    print("\n🎉 Cancellation tests completed successfully!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test the offline command-line subcommands (extract, info, batch).
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from document_image_extractor_mcp import cli
+from pdf_fixtures import create_test_pdf
+
+
+def run_cli(*argv: str) -> tuple:
+    """Run the CLI in-process; returns the exit code and the parsed JSON lines."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        exit_code = cli.main(list(argv))
+    return exit_code, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_extract_and_info():
+    """extract writes images and one JSON line; info reports each document."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "report.pdf")
+        create_test_pdf(pdf_path, page_count=3)
+
+        exit_code, [result] = run_cli("extract", pdf_path, "-o", str(Path(temp_dir) / "out"), "--pages", "2-3", "--no-zip")
+        assert exit_code == 0
+        assert result["status"] == "extracted" and result["extracted_images"] == 2
+        assert result["zip_file"] is None
+        assert sorted(os.listdir(Path(temp_dir) / "out")) == ["page_2_image_1.png", "page_3_image_1.png"]
+
+        exit_code, [result] = run_cli("extract", str(Path(temp_dir) / "missing.pdf"))
+        assert exit_code == 1 and result["status"] == "failed"
+
+        exit_code, results = run_cli("info", pdf_path, str(Path(temp_dir) / "notes.txt"))
+        assert exit_code == 1
+        assert results[0]["page_count"] == 3 and results[0]["file_type"] == ".pdf"
+        assert results[1]["status"] == "failed"
+    print("✅ extract and info print JSON lines with useful exit codes")
+
+
+def test_batch_from_stdin():
+    """batch reads paths from stdin, extracts in worker processes and skips unchanged documents."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        documents = []
+        for index in range(3):
+            path = str(Path(temp_dir) / f"doc{index}.pdf")
+            create_test_pdf(path, page_count=index + 1)
+            documents.append(path)
+
+        def batch(*paths: str) -> tuple:
+            completed = subprocess.run(
+                [sys.executable, "-m", "document_image_extractor_mcp", "batch", "-j", "2", "--no-zip", *paths],
+                input="\n".join(documents) + "\n", capture_output=True, text=True, timeout=300,
+                env={**os.environ, "PYTHONPATH": str(SRC_DIR)}
+            )
+            return completed.returncode, {
+                Path(result["document"]).name: result for result in map(json.loads, completed.stdout.splitlines())
+            }
+
+        exit_code, results = batch("-")
+        assert exit_code == 0
+        assert {name: result["extracted_images"] for name, result in results.items()} == {
+            "doc0.pdf": 1, "doc1.pdf": 2, "doc2.pdf": 3
+        }
+        assert (Path(temp_dir) / "doc2_pdf_images" / "page_3_image_1.png").exists()
+
+        exit_code, results = batch("-", str(Path(temp_dir) / "missing.pdf"))
+        assert exit_code == 1
+        assert results["doc1.pdf"]["status"] == "unchanged"
+        assert results["missing.pdf"]["status"] == "failed"
+    print("✅ batch extracts documents in parallel from a stdin list")
+
+
+if __name__ == "__main__":
+    print("⌨️  Testing Command-Line Interface")
+    print("=" * 50)
+    test_extract_and_info()
+    test_batch_from_stdin()
+    print("\n🎉 Command-line interface tests completed successfully!")
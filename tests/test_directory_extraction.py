@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test bulk directory extraction with parallel workers.
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import DirectoryExtractor, ExtractionScheduler
+from pdf_fixtures import create_test_pdf
+
+
+def create_test_tree(root: Path) -> None:
+    """Create a small directory tree of documents."""
+    (root / "invoices").mkdir()
+    (root / "archive").mkdir()
+    create_test_pdf(root / "invoices" / "a.pdf", shade=10)
+    create_test_pdf(root / "invoices" / "b.pdf", shade=90)
+    create_test_pdf(root / "archive" / "old.pdf", shade=200)
+    with zipfile.ZipFile(root / "memo.docx", 'w') as docx_zip:
+        docx_zip.writestr('word/media/image1.png', b'\x89PNG-memo')
+    (root / "notes.txt").write_text("not a document")
+
+
+def test_directory_extraction_skips_unchanged():
+    """Documents are extracted once and skipped on the next run."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        create_test_tree(root)
+        extractor = DirectoryExtractor(workers=2)
+        progress = []
+
+        async def record_progress(done, total):
+            progress.append((done, total))
+
+        summary = asyncio.run(extractor.extract_directory(
+            str(root), exclude=["archive/*"], progress_callback=record_progress
+        ))
+        assert summary["total_documents"] == 3
+        assert summary["extracted"] == 3
+        assert summary["failed"] == 0
+        assert summary["extracted_images"] == 3
+        assert progress[-1] == (3, 3)
+        assert (root / "invoices" / "a_pdf_images" / "page_1_image_1.png").exists()
+        assert not (root / "archive" / "old_pdf_images").exists()
+        assert Path(summary["manifest_path"]).exists()
+
+        summary = asyncio.run(extractor.extract_directory(str(root), exclude=["archive/*"]))
+        assert summary["unchanged"] == 3
+
+        # A touched but unmodified file is detected by hash, a modified one is re-extracted
+        os.utime(root / "invoices" / "a.pdf")
+        create_test_pdf(root / "invoices" / "b.pdf", shade=150)
+        summary = asyncio.run(extractor.extract_directory(str(root), exclude=["archive/*"]))
+        assert summary["unchanged"] == 2
+        assert summary["extracted"] == 1
+    print("✅ Directory extraction skips unchanged documents")
+
+
+def test_workers_are_bounded():
+    """Worker counts are capped at the CPU count and must be positive integers."""
+    assert DirectoryExtractor(workers=10_000).workers == (os.cpu_count() or 1)
+    assert DirectoryExtractor().workers == (os.cpu_count() or 1)
+    for bad in (0, -2, "8", True):
+        try:
+            DirectoryExtractor(workers=bad)
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    print("✅ Worker counts are bounded")
+
+
+def test_documents_are_admitted_by_the_scheduler():
+    """Each document waits for a scheduler slot, so a full server holds the directory job back."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        create_test_tree(root)
+
+        async def scenario():
+            scheduler = ExtractionScheduler(max_workers=1)
+            release = asyncio.Event()
+
+            async def busy_server():
+                async with scheduler.slot(1, "someone else"):
+                    await release.wait()
+
+            blocker = asyncio.ensure_future(busy_server())
+            await asyncio.sleep(0)
+            extractor = DirectoryExtractor(workers=2, scheduler=scheduler, client="bulk")
+            job = asyncio.ensure_future(extractor.extract_directory(str(root)))
+            await asyncio.sleep(1)
+            assert not job.done() and scheduler.waiting >= 1
+            assert not list(root.glob("**/*_pdf_images"))
+
+            release.set()
+            await blocker
+            summary = await job
+            assert scheduler.running == 0
+            return summary
+
+        summary = asyncio.run(scenario())
+        assert summary["extracted"] == 4
+    print("✅ Directory documents are admitted by the scheduler")
+
+
+def test_cancellation_does_not_block():
+    """Cancelling a directory job returns at once and drops documents that have not started."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        create_test_pdf(root / "doc0.pdf", page_count=400, size=120)
+        for index in range(1, 8):
+            shutil.copy(root / "doc0.pdf", root / f"doc{index}.pdf")
+
+        async def scenario():
+            first_done = asyncio.Event()
+
+            async def record_progress(done, total):
+                if done:
+                    first_done.set()
+
+            job = asyncio.ensure_future(
+                DirectoryExtractor(workers=1).extract_directory(str(root), progress_callback=record_progress)
+            )
+            await first_done.wait()
+            started = time.monotonic()
+            job.cancel()
+            try:
+                await job
+                assert False, "Expected CancelledError"
+            except asyncio.CancelledError:
+                pass
+            return time.monotonic() - started
+
+        assert asyncio.run(scenario()) < 0.5
+
+        # Documents already handed to the worker finish in the background; queued ones never start
+        deadline = time.monotonic() + 30
+        settled = None
+        while True:
+            output_dirs = sorted(root.glob("*_pdf_images"))
+            if output_dirs == settled and all((d / ".extraction_manifest.json").exists() for d in output_dirs):
+                break
+            assert time.monotonic() < deadline
+            settled = output_dirs
+            time.sleep(1)
+        assert len(output_dirs) < 8
+    print("✅ Cancelled directory jobs do not block the event loop")
+
+
+if __name__ == "__main__":
+    print("📁 Testing Directory Extraction")
+    print("=" * 50)
+    test_directory_extraction_skips_unchanged()
+    test_workers_are_bounded()
+    test_documents_are_admitted_by_the_scheduler()
+    test_cancellation_does_not_block()
+    print("\n🎉 Directory extraction tests completed successfully!")
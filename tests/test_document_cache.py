@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test the LRU cache of open PDF handles shared by the path-based tools.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp import server
+from document_image_extractor_mcp.server import DocumentExtractor, DocumentHandleCache, handle_call_tool
+from pdf_fixtures import create_test_pdf
+
+
+def test_reuse_and_lru_eviction():
+    """Unchanged files reuse their handle; the least recently used handle is closed."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = [str(Path(temp_dir) / f"doc{index}.pdf") for index in range(3)]
+        for path in paths:
+            create_test_pdf(path, page_count=2)
+
+        cache = DocumentHandleCache(max_entries=2)
+        with cache.open(paths[0]) as first:
+            pass
+        with cache.open(paths[0]) as again:
+            assert again is first and not first.is_closed
+        with cache.open(paths[1]):
+            pass
+        with cache.open(paths[2]):
+            pass
+
+        assert first.is_closed
+        assert len(cache) == 2
+        assert cache.summary() == {"open_documents": 2, "max_entries": 2, "hits": 1, "misses": 3}
+
+        cache.clear()
+        assert len(cache) == 0
+    print("✅ Handles are reused and evicted in LRU order")
+
+
+def test_changed_file_is_reopened():
+    """Rewriting a file invalidates its cached handle."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "report.pdf")
+        create_test_pdf(path, page_count=2)
+        cache = DocumentHandleCache()
+        with cache.open(path) as old:
+            assert old.page_count == 2
+
+        create_test_pdf(path, page_count=5)
+        with cache.open(path) as new:
+            assert new is not old and new.page_count == 5
+        assert old.is_closed and len(cache) == 1
+
+        with DocumentHandleCache(max_entries=0).open(path) as uncached:
+            assert uncached.page_count == 5
+        assert uncached.is_closed
+    print("✅ Changed files are re-opened")
+
+
+def test_concurrent_use():
+    """A busy handle is never shared, and evicting it waits until it is released."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "shared.pdf")
+        other = str(Path(temp_dir) / "other.pdf")
+        create_test_pdf(path, page_count=2)
+        create_test_pdf(other, page_count=2)
+        cache = DocumentHandleCache(max_entries=1)
+        holding, release = threading.Event(), threading.Event()
+        held = []
+
+        def hold():
+            with cache.open(path) as doc:
+                held.append(doc)
+                holding.set()
+                release.wait(5)
+                assert not doc.is_closed
+
+        worker = threading.Thread(target=hold)
+        worker.start()
+        holding.wait(5)
+
+        with cache.open(path) as private:
+            assert private is not held[0]
+        assert private.is_closed
+
+        with cache.open(other):
+            pass
+        assert not held[0].is_closed
+
+        release.set()
+        worker.join(5)
+        assert held[0].is_closed
+    print("✅ Busy handles are not shared and are closed after eviction")
+
+
+def test_tool_workflow_parses_once():
+    """validate_document, get_document_info and extract_document_images share one handle."""
+    original_cache, original_extractor = server.document_cache, server.extractor
+    server.document_cache = DocumentHandleCache()
+    server.extractor = DocumentExtractor(document_cache=server.document_cache)
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = str(Path(temp_dir) / "workflow.pdf")
+            create_test_pdf(path, page_count=3)
+
+            response = asyncio.run(handle_call_tool("validate_document", {"document_path": path}))
+            validation = json.loads(response[0].text.split("\n\n", 1)[1])
+            assert validation["status"] == "valid" and validation["page_count"] == 3
+
+            response = asyncio.run(handle_call_tool("get_document_info", {"document_path": path}))
+            assert json.loads(response[0].text.split("\n\n", 1)[1])["page_count"] == 3
+
+            response = asyncio.run(handle_call_tool("extract_document_images", {
+                "document_path": path,
+                "output_dir": os.path.join(temp_dir, "out")
+            }))
+            assert json.loads(response[0].text.split("Full result: ", 1)[1])["extracted_images"] == 3
+
+            summary = server.document_cache.summary()
+            assert summary["misses"] == 1 and summary["hits"] >= 2
+
+            broken = Path(temp_dir) / "broken.pdf"
+            broken.write_bytes(b"not a pdf")
+            response = asyncio.run(handle_call_tool("validate_document", {"document_path": str(broken)}))
+            validation = json.loads(response[0].text.split("\n\n", 1)[1])
+            assert validation["status"] == "invalid"
+            assert validation["error"].startswith("Cannot open PDF")
+            server.document_cache.clear()
+    finally:
+        server.document_cache, server.extractor = original_cache, original_extractor
+    print("✅ A validate/info/extract workflow parses the PDF once")
+
+
+if __name__ == "__main__":
+    print("📂 Testing Document Handle Cache")
+    print("=" * 50)
+    test_reuse_and_lru_eviction()
+    test_changed_file_is_reopened()
+    test_concurrent_use()
+    test_tool_workflow_parses_once()
+    print("\n🎉 Document handle cache tests completed successfully!")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test relationship-aware Word extraction (referenced images only, in reading order).
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import DocumentExtractor, WordImageExtractor, handle_call_tool
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+V = 'xmlns:v="urn:schemas-microsoft-com:vml"'
+RELS = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+HEADER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+
+
+def blip(rel_id: str) -> str:
+    return f'<w:p><w:r><w:drawing><a:blip r:embed="{rel_id}"/></w:drawing></w:r></w:p>'
+
+
+def create_docx(path: str) -> None:
+    """A document using its media out of archive order, with an orphan, a header image and odd relationships."""
+    with zipfile.ZipFile(path, "w") as docx:
+        docx.writestr("word/document.xml", (
+            f'<w:document {W} {R} {A} {V}><w:body>'
+            + blip("rId3") + blip("rId2")
+            + '<w:p><w:r><w:pict><v:imagedata r:id="rId4"/></w:pict></w:r></w:p>'
+            + blip("rId2") + blip("rId5") + blip("rId7")
+            + '<w:sectPr><w:headerReference r:id="rId6"/></w:sectPr></w:body></w:document>'
+        ))
+        docx.writestr("word/_rels/document.xml.rels", (
+            f'<Relationships {RELS}>'
+            f'<Relationship Id="rId2" Type="{IMAGE}" Target="media/image1.png"/>'
+            f'<Relationship Id="rId3" Type="{IMAGE}" Target="media/image2.png"/>'
+            f'<Relationship Id="rId4" Type="{IMAGE}" Target="/word/media/image3.jpeg"/>'
+            f'<Relationship Id="rId5" Type="{IMAGE}" Target="https://example.com/x.png" TargetMode="External"/>'
+            f'<Relationship Id="rId6" Type="{HEADER}" Target="header1.xml"/>'
+            f'<Relationship Id="rId7" Type="{IMAGE}" Target="media/missing.png"/>'
+            '</Relationships>'
+        ))
+        docx.writestr("word/header1.xml", f'<w:hdr {W} {R} {A}>{blip("rId1")}</w:hdr>')
+        docx.writestr("word/_rels/header1.xml.rels", (
+            f'<Relationships {RELS}><Relationship Id="rId1" Type="{IMAGE}" Target="media/logo.png"/></Relationships>'
+        ))
+        for name in ("image1.png", "orphan.png", "image2.png", "image3.jpeg", "logo.png"):
+            docx.writestr(f"word/media/{name}", name.encode())
+
+
+def test_referenced_images_in_reading_order():
+    """Only referenced images are extracted, in reading order, with occurrence counts."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        docx_path = str(Path(temp_dir) / "report.docx")
+        create_docx(docx_path)
+
+        everything = WordImageExtractor().extract_images(docx_path, str(Path(temp_dir) / "all"))
+        assert [os.path.basename(path) for path in everything] == [
+            "image1.png", "orphan.png", "image2.png", "image3.jpeg", "logo.png"
+        ]
+
+        extractor = WordImageExtractor(referenced_only=True)
+        referenced = extractor.extract_images(docx_path, str(Path(temp_dir) / "referenced"))
+        assert [os.path.basename(path) for path in referenced] == [
+            "image2.png", "image1.png", "image3.jpeg", "logo.png"
+        ]
+        assert extractor.occurrences == {"image2.png": 1, "image1.png": 2, "image3.jpeg": 1, "logo.png": 1}
+        assert Path(referenced[1]).read_bytes() == b"image1.png"
+    print("✅ Referenced images are extracted in reading order")
+
+
+def test_batches_and_incremental_runs():
+    """Batches resume in reading order and occurrence counts survive unchanged re-runs."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        docx_path = str(Path(temp_dir) / "report.docx")
+        create_docx(docx_path)
+
+        extractor = WordImageExtractor(referenced_only=True)
+        first, position = extractor.extract_batch(docx_path, str(Path(temp_dir) / "a"), limit=3)
+        second, end = extractor.extract_batch(docx_path, str(Path(temp_dir) / "b"), start=position, limit=3)
+        assert position == (0, 3) and end is None
+        assert [os.path.basename(path) for path in second] == ["logo.png"]
+        assert extractor.occurrences == {"logo.png": 1}
+
+        for _ in range(2):
+            doc_extractor = DocumentExtractor(create_zip=False, referenced_only=True)
+            images, output_dir, _ = doc_extractor.extract_images(docx_path, incremental=True)
+            assert len(images) == 4
+            assert doc_extractor.image_occurrences["image1.png"] == 2
+
+        doc_extractor = DocumentExtractor(create_zip=False)
+        images, _, _ = doc_extractor.extract_images(docx_path, output_dir, incremental=True)
+        assert len(images) == 5 and doc_extractor.image_occurrences == {}
+    print("✅ Batches and incremental runs keep reading order and counts")
+
+
+def test_parsing_memory_is_bounded():
+    """A document far larger than the parser's peak memory is scanned incrementally."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        docx_path = str(Path(temp_dir) / "huge.docx")
+        paragraphs = 100_000
+        with zipfile.ZipFile(docx_path, "w", zipfile.ZIP_DEFLATED) as docx:
+            with docx.open("word/document.xml", "w") as part:
+                part.write(f'<w:document {W} {R} {A}><w:body>'.encode())
+                for index in range(paragraphs):
+                    part.write((blip("rId1") if index % 1000 == 0 else
+                                f'<w:p><w:r><w:t>Paragraph {index} of a very long report</w:t></w:r></w:p>').encode())
+                part.write(b'</w:body></w:document>')
+            docx.writestr("word/_rels/document.xml.rels", (
+                f'<Relationships {RELS}><Relationship Id="rId1" Type="{IMAGE}" Target="media/image1.png"/></Relationships>'
+            ))
+            docx.writestr("word/media/image1.png", b"png")
+            document_size = docx.getinfo("word/document.xml").file_size
+
+        extractor = WordImageExtractor(referenced_only=True)
+        tracemalloc.start()
+        images = extractor.extract_images(docx_path, str(Path(temp_dir) / "out"))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert len(images) == 1 and extractor.occurrences == {"image1.png": paragraphs // 1000}
+        assert peak < document_size / 10, (peak, document_size)
+    print("✅ Parsing memory stays bounded")
+
+
+def test_tool_option():
+    """The base64 tool reports occurrence counts for referenced_only extractions."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        docx_path = Path(temp_dir) / "report.docx"
+        create_docx(str(docx_path))
+        document_base64 = base64.b64encode(docx_path.read_bytes()).decode('utf-8')
+
+    response = asyncio.run(handle_call_tool("extract_document_images_base64", {
+        "document_base64": document_base64,
+        "document_name": "report.docx",
+        "referenced_only": True,
+        "return_images_as_base64": False
+    }))
+    result = json.loads(response[0].text.split("Full result: ", 1)[1])
+    assert result["image_files"] == ["image2.png", "image1.png", "image3.jpeg", "logo.png"]
+    assert result["image_occurrences"]["image1.png"] == 2
+    print("✅ The referenced_only option is honoured by the tools")
+
+
+if __name__ == "__main__":
+    print("🔗 Testing Relationship-Aware Word Extraction")
+    print("=" * 50)
+    test_referenced_images_in_reading_order()
+    test_batches_and_incremental_runs()
+    test_parsing_memory_is_bounded()
+    test_tool_option()
+    print("\n🎉 Word relationship tests completed successfully!")
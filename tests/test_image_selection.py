@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test page-range and image-selection parameters for extraction.
+"""
+
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import DocumentExtractor, SelectionUtils
+from pdf_fixtures import create_test_pdf
+
+
+def create_test_docx(path: str, image_count: int = 3) -> None:
+    """Create a minimal .docx archive with media entries."""
+    with zipfile.ZipFile(path, 'w') as docx_zip:
+        docx_zip.writestr('word/document.xml', '<w:document/>')
+        for index in range(image_count):
+            docx_zip.writestr(f'word/media/image{index + 1}.png', b'\x89PNG' + bytes([index]))
+
+
+def test_parse_page_ranges():
+    """Page range strings are parsed into zero-based page numbers."""
+    assert SelectionUtils.parse_page_ranges(None, 5) == [0, 1, 2, 3, 4]
+    assert SelectionUtils.parse_page_ranges("1-2,4", 5) == [0, 1, 3]
+    assert SelectionUtils.parse_page_ranges("4-", 5) == [3, 4]
+    assert SelectionUtils.parse_page_ranges([2, "5-9"], 5) == [1, 4]
+
+    for invalid in ("0", "3-1", "abc"):
+        try:
+            SelectionUtils.parse_page_ranges(invalid, 5)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for {invalid!r}")
+    print("✅ Page range parsing works")
+
+
+def test_pdf_page_and_image_selection():
+    """Only selected pages and images are extracted from a PDF."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "sample.pdf")
+        create_test_pdf(pdf_path, page_count=4)
+        extractor = DocumentExtractor(create_zip=False)
+
+        images, _, _ = extractor.extract_images(pdf_path, str(Path(temp_dir) / "pages"), pages="2-3")
+        assert [Path(img).name for img in images] == ["page_2_image_1.png", "page_3_image_1.png"]
+
+        images, _, _ = extractor.extract_images(pdf_path, str(Path(temp_dir) / "limit"), max_images=1)
+        assert [Path(img).name for img in images] == ["page_1_image_1.png"]
+
+        info = extractor.get_document_info(pdf_path)
+        xref = info['image_xrefs_by_page'][4][0]
+        images, _, _ = extractor.extract_images(pdf_path, str(Path(temp_dir) / "ids"), image_ids=[str(xref)])
+        assert [Path(img).name for img in images] == ["page_4_image_1.png"]
+    print("✅ PDF page and image selection works")
+
+
+def test_docx_image_selection():
+    """Word media can be selected by full or base name."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        docx_path = str(Path(temp_dir) / "sample.docx")
+        create_test_docx(docx_path)
+        extractor = DocumentExtractor(create_zip=False)
+
+        images, _, _ = extractor.extract_images(
+            docx_path, str(Path(temp_dir) / "ids"),
+            image_ids=["word/media/image3.png", "image1.png"]
+        )
+        assert sorted(Path(img).name for img in images) == ["image1.png", "image3.png"]
+
+        images, _, _ = extractor.extract_images(docx_path, str(Path(temp_dir) / "limit"), max_images=2)
+        assert len(images) == 2
+    print("✅ Word image selection works")
+
+
+if __name__ == "__main__":
+    print("🔍 Testing Image Selection Parameters")
+    print("=" * 50)
+    test_parse_page_ranges()
+    test_pdf_page_and_image_selection()
+    test_docx_image_selection()
+    print("\n🎉 Image selection tests completed successfully!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test incremental re-extraction driven by the extraction manifest.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import DocumentExtractor, ExtractionManifest
+from pdf_fixtures import create_test_pdf
+
+
+def mtimes(paths):
+    """Map file names to modification times."""
+    return {Path(path).name: os.stat(path).st_mtime_ns for path in paths}
+
+
+def test_unchanged_document_is_a_no_op():
+    """A second run over an unchanged document rewrites nothing."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "report.pdf")
+        create_test_pdf(pdf_path, page_count=3)
+        extractor = DocumentExtractor()
+
+        images, output_dir, zip_path = extractor.extract_images(pdf_path, incremental=True)
+        assert len(images) == 3
+        assert Path(output_dir, ExtractionManifest.FILENAME).exists()
+        before = mtimes(images + [zip_path])
+
+        time.sleep(0.01)
+        images_again, _, zip_again = extractor.extract_images(pdf_path, incremental=True)
+        assert images_again == images
+        assert zip_again == zip_path
+        assert mtimes(images_again + [zip_again]) == before
+    print("✅ Unchanged documents are not re-extracted")
+
+
+def test_option_change_rewrites_only_changed_outputs():
+    """Changing options keeps unchanged images and removes dropped ones."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "report.pdf")
+        create_test_pdf(pdf_path, page_count=3)
+
+        images, output_dir, _ = DocumentExtractor().extract_images(pdf_path, incremental=True)
+        before = mtimes(images)
+
+        time.sleep(0.01)
+        images, _, zip_path = DocumentExtractor().extract_images(pdf_path, pages="1-2", incremental=True)
+        assert [Path(img).name for img in images] == ["page_1_image_1.png", "page_2_image_1.png"]
+        assert mtimes(images) == {name: before[name] for name in mtimes(images)}
+        assert not Path(output_dir, "page_3_image_1.png").exists()
+
+        manifest = ExtractionManifest.load(output_dir)
+        assert manifest.options["pages"] == "1-2"
+        assert [image["filename"] for image in manifest.images] == ["page_1_image_1.png", "page_2_image_1.png"]
+    print("✅ Option changes only rewrite changed images")
+
+
+def test_shared_output_directory_keeps_other_documents():
+    """Extracting a second document into the same directory leaves the first one's images alone."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "report.pdf")
+        create_test_pdf(pdf_path, page_count=3)
+        docx_path = str(Path(temp_dir) / "letter.docx")
+        with zipfile.ZipFile(docx_path, "w") as docx:
+            docx.writestr("word/document.xml", "<document/>")
+            docx.writestr("word/media/image1.png", b"png")
+        output_dir = str(Path(temp_dir) / "shared")
+
+        pdf_images, _, _ = DocumentExtractor(create_zip=False).extract_images(pdf_path, output_dir, incremental=True)
+        docx_images, _, _ = DocumentExtractor(create_zip=False).extract_images(docx_path, output_dir, incremental=True)
+        assert all(Path(path).exists() for path in pdf_images + docx_images)
+
+        again, _, _ = DocumentExtractor(create_zip=False).extract_images(pdf_path, output_dir, incremental=True)
+        assert again == pdf_images
+        assert all(Path(path).exists() for path in pdf_images + docx_images)
+        assert ExtractionManifest.load(output_dir).source["path"] == os.path.abspath(pdf_path)
+    print("✅ Documents sharing an output directory keep their images")
+
+
+if __name__ == "__main__":
+    print("🔁 Testing Incremental Extraction")
+    print("=" * 50)
+    test_unchanged_document_is_a_no_op()
+    test_option_change_rewrites_only_changed_outputs()
+    test_shared_output_directory_keeps_other_documents()
+    print("\n🎉 Incremental extraction tests completed successfully!")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test perceptual-hash near-duplicate filtering of extracted images.
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import fitz  # PyMuPDF
+import numpy as np
+from document_image_extractor_mcp.server import DocumentExtractor, NearDuplicateFilter, handle_call_tool
+
+
+def make_pixmap(pixels: np.ndarray) -> fitz.Pixmap:
+    """Build an RGB pixmap from an (h, w) grayscale array."""
+    rgb = np.repeat(pixels.astype(np.uint8)[:, :, None], 3, axis=2)
+    return fitz.Pixmap(fitz.csRGB, pixels.shape[1], pixels.shape[0], rgb.tobytes(), 0)
+
+
+def create_scanned_pdf(path: str) -> None:
+    """A stamp, the same stamp re-scanned with noise and at another size, and an unrelated image."""
+    rng = np.random.default_rng(7)
+    y, x = np.mgrid[0:96, 0:96]
+    stamp = 128 + 100 * np.sin(x / 9.0) * np.cos(y / 13.0)
+    rescanned = np.clip(stamp + rng.normal(0, 6, stamp.shape), 0, 255)
+    smaller = stamp[::2, ::2]
+    unrelated = (x * 2.6) % 255
+
+    doc = fitz.open()
+    for pixels in (stamp, rescanned, unrelated, smaller):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(50, 50, 250, 250), pixmap=make_pixmap(pixels))
+    doc.save(path)
+    doc.close()
+
+
+def test_hash_methods_group_rescans():
+    """Both hash methods group the stamp variants and leave the unrelated image alone."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "scanned.pdf")
+        create_scanned_pdf(pdf_path)
+        images, _, _ = DocumentExtractor(create_zip=False).extract_images(pdf_path, str(Path(temp_dir) / "all"))
+        assert len(images) == 4
+
+        for method in NearDuplicateFilter.METHODS:
+            groups = NearDuplicateFilter("group", threshold=10, method=method).find_groups(images)
+            assert [[Path(image).name for image in group] for group in groups] == [
+                ["page_1_image_1.png", "page_2_image_1.png", "page_4_image_1.png"]
+            ], method
+    print("✅ dHash and pHash group re-scanned images")
+
+
+def test_drop_and_incremental_groups():
+    """Dropping removes the duplicates; an unchanged re-run reports the same groups."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "scanned.pdf")
+        create_scanned_pdf(pdf_path)
+        output_dir = str(Path(temp_dir) / "dedup")
+
+        extractor = DocumentExtractor(duplicate_filter=NearDuplicateFilter("drop", threshold=10))
+        images, _, zip_path = extractor.extract_images(pdf_path, output_dir, incremental=True)
+        assert sorted(Path(image).name for image in images) == ["page_1_image_1.png", "page_3_image_1.png"]
+        assert not (Path(output_dir) / "page_2_image_1.png").exists()
+        assert len(extractor.similar_image_groups[0]) == 3
+        assert "dedup" in extractor.stats.as_dict()["durations_ms"]
+
+        rerun = DocumentExtractor(duplicate_filter=NearDuplicateFilter("drop", threshold=10))
+        again, _, _ = rerun.extract_images(pdf_path, output_dir, incremental=True)
+        assert again == images
+        assert rerun.similar_image_groups == extractor.similar_image_groups
+    print("✅ Near-duplicates are dropped and groups are remembered")
+
+
+def test_tool_option_validation():
+    """The MCP tool reports groups and rejects invalid options."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "scanned.pdf")
+        create_scanned_pdf(pdf_path)
+
+        response = asyncio.run(handle_call_tool("extract_document_images", {
+            "document_path": pdf_path,
+            "similar_images": "group",
+            "similarity_threshold": 10
+        }))
+        result = json.loads(response[0].text.split("Full result: ", 1)[1])
+        assert result["extracted_images"] == 4
+        assert len(result["similar_image_groups"]) == 1
+
+        response = asyncio.run(handle_call_tool("extract_document_images", {
+            "document_path": pdf_path,
+            "similar_images": "merge"
+        }))
+        assert response[0].text.startswith("Error: similar_images must be one of")
+    print("✅ Tool options are applied and validated")
+
+
+def test_blockwise_distances_match_brute_force():
+    """Groups found block by block, with and without np.bitwise_count, match a dense comparison."""
+    rng = np.random.default_rng(7)
+    base = rng.integers(0, 2, (12, 64)).astype(bool)
+    bits = np.repeat(base, 5, axis=0)
+    bits ^= rng.random(bits.shape) < 0.03
+    paths = [f"image{index}.png" for index in range(len(bits))]
+
+    class FixedHashes(NearDuplicateFilter):
+        BLOCK_ROWS = 7
+
+        def compute_hashes(self, image_paths):
+            return list(range(len(image_paths))), bits
+
+    dense = (bits[:, None, :] != bits[None, :, :]).sum(axis=2)
+    expected, assigned = [], np.zeros(len(bits), dtype=bool)
+    for row in range(len(bits)):
+        if not assigned[row]:
+            members = np.flatnonzero((dense[row] <= 6) & ~assigned)
+            assigned[members] = True
+            if len(members) > 1:
+                expected.append([paths[member] for member in members])
+
+    duplicate_filter = FixedHashes(threshold=6)
+    assert expected and duplicate_filter.find_groups(paths) == expected
+
+    hashes = np.packbits(bits, axis=1).view(np.uint64).ravel()
+    bitwise_count = getattr(np, "bitwise_count", None)
+    if bitwise_count is not None:
+        del np.bitwise_count
+    try:
+        assert (NearDuplicateFilter._hamming_distances(hashes, hashes) == dense).all()
+    finally:
+        if bitwise_count is not None:
+            np.bitwise_count = bitwise_count
+    print("✅ Block-wise distances match a dense comparison")
+
+
+if __name__ == "__main__":
+    print("👯 Testing Near-Duplicate Filtering")
+    print("=" * 50)
+    test_hash_methods_group_rescans()
+    test_drop_and_incremental_groups()
+    test_tool_option_validation()
+    test_blockwise_distances_match_brute_force()
+    print("\n🎉 Near-duplicate filtering tests completed successfully!")
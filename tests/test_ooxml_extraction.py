@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test image extraction from PowerPoint and Excel packages via the OOXML media engine.
+"""
+
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import DocumentExtractor, FileUtils
+
+
+def create_package(path: Path, media_prefix: str, media: dict) -> None:
+    """Create a minimal OOXML package with the given media entries."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', '<Types/>')
+        package.writestr(media_prefix, '')  # explicit directory entry
+        for name, data in media.items():
+            package.writestr(media_prefix + name, data)
+
+
+def test_pptx_and_xlsx_extraction():
+    """Media is extracted byte-for-byte from presentations and workbooks."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pptx_path = Path(temp_dir) / "deck.pptx"
+        xlsx_path = Path(temp_dir) / "book.xlsx"
+        slide_image = b'\x89PNG' + b'slide' * 1000
+        create_package(pptx_path, 'ppt/media/', {'image1.png': slide_image, 'image2.jpeg': b'\xff\xd8jpeg'})
+        create_package(xlsx_path, 'xl/media/', {'image1.png': b'\x89PNGchart'})
+
+        assert FileUtils.is_supported_document(str(pptx_path))
+        assert FileUtils.is_supported_document(str(xlsx_path))
+
+        extractor = DocumentExtractor()
+        images, output_dir, zip_path = extractor.extract_images(str(pptx_path))
+        assert Path(output_dir).name == "deck_powerpoint_images"
+        assert sorted(Path(img).name for img in images) == ["image1.png", "image2.jpeg"]
+        assert Path(output_dir, "image1.png").read_bytes() == slide_image
+        assert zip_path and Path(zip_path).exists()
+
+        images, output_dir, _ = extractor.extract_images(str(xlsx_path))
+        assert Path(output_dir).name == "book_excel_images"
+        assert [Path(img).name for img in images] == ["image1.png"]
+
+        info = extractor.get_document_info(str(pptx_path))
+        assert info["image_count"] == 2
+        assert info["image_files"] == ["ppt/media/image1.png", "ppt/media/image2.jpeg"]
+    print("✅ PowerPoint and Excel media extracted")
+
+
+if __name__ == "__main__":
+    print("📊 Testing OOXML Media Extraction")
+    print("=" * 50)
+    test_pptx_and_xlsx_extraction()
+    print("\n🎉 OOXML extraction tests completed successfully!")
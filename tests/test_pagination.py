@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test cursor-based pagination of base64 extraction results.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from starlette.testclient import TestClient
+from document_image_extractor_mcp.server import (
+    CursorUtils, ExtractionCheckpointCache, app, handle_call_tool
+)
+from pdf_fixtures import create_test_pdf_base64
+
+
+def parse_tool_result(result) -> dict:
+    """Extract the JSON result from a tool response."""
+    text = result[0].text
+    return json.loads(text.split("Full result: ", 1)[1])
+
+
+def test_mcp_pagination():
+    """The MCP tool returns bounded batches and resumes from the cursor alone."""
+    document_base64 = create_test_pdf_base64(page_count=4, images_per_page=2, size=30)
+    batches = []
+
+    result = parse_tool_result(asyncio.run(handle_call_tool("extract_document_images_base64", {
+        "document_base64": document_base64,
+        "document_name": "paged.pdf",
+        "page_size": 3
+    })))
+    batches.append(result["image_files"])
+
+    while result["next_cursor"]:
+        result = parse_tool_result(asyncio.run(handle_call_tool("extract_document_images_base64", {
+            "cursor": result["next_cursor"],
+            "page_size": 3
+        })))
+        batches.append(result["image_files"])
+
+    assert all(len(batch) <= 3 for batch in batches)
+    all_files = [name for batch in batches for name in batch]
+    assert len(all_files) == 8
+    assert len(set(all_files)) == 8
+    assert result["has_more"] is False
+    print(f"✅ MCP pagination returned {len(batches)} batches")
+
+
+def test_rest_pagination_with_max_images():
+    """The REST endpoint honours max_images across batches."""
+    client = TestClient(app)
+    response = client.post("/api/extract-base64", json={
+        "document_base64": create_test_pdf_base64(page_count=4, images_per_page=2, size=30),
+        "document_name": "paged.pdf",
+        "page_size": 2,
+        "max_images": 3
+    })
+    assert response.status_code == 200
+    first = response.json()
+    assert first["extracted_images_count"] == 2
+    assert len(first["images"]) == 2
+    assert "zip" not in first
+
+    response = client.post("/api/extract-base64", json={"cursor": first["next_cursor"]})
+    second = response.json()
+    assert second["extracted_images_count"] == 1
+    assert second["next_cursor"] is None
+
+    response = client.post("/api/extract-base64", json={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    print("✅ REST pagination honours max_images")
+
+
+def test_exact_last_batch_has_no_cursor():
+    """A batch that ends on the document's last image does not point at an empty page."""
+    for scan in ("pages", "xref"):
+        result = parse_tool_result(asyncio.run(handle_call_tool("extract_document_images_base64", {
+            "document_base64": create_test_pdf_base64(page_count=2),
+            "document_name": "exact.pdf",
+            "page_size": 2,
+            "scan": scan
+        })))
+        assert len(result["image_files"]) == 2
+        assert result["next_cursor"] is None and result["has_more"] is False
+    print("✅ Exactly filled last batches end the pagination")
+
+
+def test_cursors_are_signed():
+    """Altered cursors and cursors carrying invalid options are rejected."""
+    result = parse_tool_result(asyncio.run(handle_call_tool("extract_document_images_base64", {
+        "document_base64": create_test_pdf_base64(page_count=4, images_per_page=2, size=30),
+        "document_name": "paged.pdf",
+        "page_size": 3
+    })))
+    state = CursorUtils.decode(result["next_cursor"])
+    assert state["pos"] == [1, 1] and state["emitted"] == 3
+
+    payload, signature = result["next_cursor"].split(".")
+    forged_state = {**state, "opts": {**state["opts"], "similar_images": {"action": "drop", "threshold": "x"}}}
+    forged = base64.urlsafe_b64encode(json.dumps(forged_state).encode()).decode().rstrip("=")
+    for cursor in (f"{forged}.{signature}", payload, f"{payload}.{signature[::-1]}"):
+        try:
+            CursorUtils.decode(cursor)
+            assert False, "Expected ValueError"
+        except ValueError as e:
+            assert str(e) == "Invalid cursor"
+
+    try:
+        CursorUtils.decode(CursorUtils.encode({k: v for k, v in forged_state.items() if k != "v"}))
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+    response = TestClient(app).post("/api/extract-base64", json={"cursor": f"{forged}.{signature}"})
+    assert response.status_code == 400
+    print("✅ Cursors are signed and their options re-validated")
+
+
+def test_checkpoints_expire_without_traffic():
+    """Documents left by an earlier process are re-indexed, and expiry needs no further requests."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stale, fresh = Path(temp_dir) / ("a" * 64 + ".pdf"), Path(temp_dir) / ("b" * 64 + ".pdf")
+        for path in (stale, fresh):
+            path.write_bytes(b"%PDF")
+        os.utime(stale, (time.time() - 120, time.time() - 120))
+
+        cache = ExtractionCheckpointCache(cache_dir=temp_dir, ttl_seconds=60)
+        assert cache.recover() == 1
+        assert not stale.exists()
+        assert cache.lookup("b" * 64) == str(fresh)
+
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+        cache.expire()
+        assert not fresh.exists()
+        assert cache.lookup("b" * 64) is None
+    print("✅ Checkpoints are recovered and expire without traffic")
+
+
+if __name__ == "__main__":
+    print("📄 Testing Paginated Extraction")
+    print("=" * 50)
+    test_mcp_pagination()
+    test_rest_pagination_with_max_images()
+    test_exact_last_batch_has_no_cursor()
+    test_cursors_are_signed()
+    test_checkpoints_expire_without_traffic()
+    print("\n🎉 Pagination tests completed successfully!")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test single-flight coalescing of concurrent identical extraction requests.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp import server
+from document_image_extractor_mcp.server import SingleFlight, handle_call_tool
+from pdf_fixtures import create_test_pdf_base64
+
+
+def test_single_flight_sharing_and_cleanup():
+    """Concurrent callers share one execution; cleanup waits for the last release."""
+    async def scenario():
+        flights = SingleFlight()
+        calls, cleaned = [], []
+
+        async def start():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        outcomes = await asyncio.gather(*[flights.run("key", start, cleaned.append) for _ in range(5)])
+        assert len(calls) == 1
+        assert [shared for _, shared, _ in outcomes] == [False, True, True, True, True]
+        assert len(flights) == 0
+
+        for _, _, release in outcomes[:-1]:
+            release()
+            release()  # releasing twice has no effect
+        assert cleaned == []
+        outcomes[-1][2]()
+        assert cleaned == ["result"]
+
+    asyncio.run(scenario())
+    print("✅ Single-flight shares one execution per key")
+
+
+def test_single_flight_cancellation():
+    """A cancelled waiter leaves the shared call running; the last one cancels it."""
+    async def scenario():
+        flights = SingleFlight()
+        started = []
+
+        async def start():
+            started.append(asyncio.current_task())
+            await asyncio.sleep(0.2)
+            return "done"
+
+        first = asyncio.ensure_future(flights.run("key", start, lambda result: None))
+        second = asyncio.ensure_future(flights.run("key", start, lambda result: None))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        result, shared, release = await second
+        assert (result, shared) == ("done", True)
+        release()
+
+        lonely = asyncio.ensure_future(flights.run("other", start, lambda result: None))
+        await asyncio.sleep(0.01)
+        lonely.cancel()
+        await asyncio.sleep(0.01)
+        assert started[-1].cancelled()
+
+        # A caller arriving just after the last waiter left starts a fresh call
+        abandoned = asyncio.ensure_future(flights.run("late", start, lambda result: None))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        late = asyncio.ensure_future(flights.run("late", start, lambda result: None))
+        result, shared, release = await late
+        assert (result, shared) == ("done", False)
+        release()
+
+    asyncio.run(scenario())
+    print("✅ Cancellation only drops the waiter's own reference")
+
+
+def test_concurrent_tool_calls_coalesce():
+    """Identical concurrent MCP calls run a single extraction."""
+    document_base64 = create_test_pdf_base64(page_count=2)
+    original = server.run_base64_extraction
+    runs = []
+
+    def counting_extraction(*args, **kwargs):
+        runs.append(1)
+        return original(*args, **kwargs)
+
+    async def scenario():
+        return await asyncio.gather(*[
+            handle_call_tool("extract_document_images_base64", {
+                "document_base64": document_base64,
+                "document_name": "shared.pdf"
+            })
+            for _ in range(6)
+        ])
+
+    server.run_base64_extraction = counting_extraction
+    try:
+        responses = asyncio.run(scenario())
+    finally:
+        server.run_base64_extraction = original
+
+    results = [json.loads(response[0].text.split("Full result: ", 1)[1]) for response in responses]
+    assert len(runs) == 1
+    assert all(result["extracted_images"] == 2 for result in results)
+    assert all(len(result["images_base64"]) == 2 for result in results)
+    assert sum("coalesced" in result["stats"]["durations_ms"] for result in results) == 5
+    print("✅ Concurrent identical requests share one extraction")
+
+
+if __name__ == "__main__":
+    print("🔗 Testing Request Coalescing")
+    print("=" * 50)
+    test_single_flight_sharing_and_cleanup()
+    test_single_flight_cancellation()
+    test_concurrent_tool_calls_coalesce()
+    print("\n🎉 Request coalescing tests completed successfully!")
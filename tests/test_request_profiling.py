@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test opt-in per-request CPU and memory profiling.
+"""
+
+import pstats
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from starlette.testclient import TestClient
+from document_image_extractor_mcp import server
+from pdf_fixtures import create_test_pdf_base64
+
+
+def test_profiling_requires_admin_token():
+    """Profiles are written only for requests carrying the admin token."""
+    with tempfile.TemporaryDirectory() as profile_dir:
+        server.PROFILE_DIR = profile_dir
+        server.ADMIN_TOKEN = "secret-token"
+        try:
+            client = TestClient(server.app)
+            body = {"document_base64": create_test_pdf_base64(), "document_name": "profiled.pdf"}
+
+            response = client.post("/api/extract-base64", json=body, headers={"X-Profile-Token": "wrong"})
+            assert response.status_code == 200
+            assert "profile_files" not in response.json()
+            assert list(Path(profile_dir).iterdir()) == []
+
+            response = client.post("/api/extract-base64", json=body, headers={"X-Profile-Token": "secret-token"})
+            assert response.status_code == 200
+            profile_files = response.json()["profile_files"]
+            stages = {Path(path).name.split("_")[1] for path in profile_files}
+            assert stages == {"decode", "extract", "encode"}
+
+            prof_file = next(path for path in profile_files if path.endswith(".prof"))
+            pstats.Stats(prof_file)  # loadable CPU profile
+            alloc_file = next(path for path in profile_files if path.endswith(".alloc.txt"))
+            assert "peak traced memory" in Path(alloc_file).read_text()
+        finally:
+            server.PROFILE_DIR = None
+            server.ADMIN_TOKEN = None
+    print("✅ Profiling is opt-in and admin-only")
+
+
+if __name__ == "__main__":
+    print("⏱️  Testing Request Profiling")
+    print("=" * 50)
+    test_profiling_requires_admin_token()
+    print("\n🎉 Request profiling tests completed successfully!")
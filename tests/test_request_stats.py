@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test per-request timing breakdowns (Server-Timing header and stats block).
+"""
+
+import asyncio
+import base64
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from starlette.testclient import TestClient
+from document_image_extractor_mcp.server import RequestStats, app, handle_call_tool
+from pdf_fixtures import create_test_pdf
+
+
+def test_serialize_with_stats():
+    """The stats block is appended as the last key of an otherwise unchanged body."""
+    stats = RequestStats()
+    with stats.stage("decode"):
+        pass
+    result = {"status": "success", "name": "ü"}
+
+    text = stats.serialize_with_stats(result)
+    body = json.loads(text)
+    assert list(body) == ["status", "name", "stats"]
+    assert body["stats"]["bytes_out"] > 0
+    assert set(body["stats"]["durations_ms"]) == {"decode", "serialize"}
+    assert text.startswith(json.dumps(result, indent=2)[:-2])
+    assert "decode;dur=" in stats.server_timing_header()
+    print("✅ Stats are appended to serialized responses")
+
+
+def test_nested_stages_are_exclusive():
+    """Time spent in a nested stage is not counted again in the enclosing stage."""
+    stats = RequestStats()
+    with stats.stage("extract"):
+        time.sleep(0.05)
+        with stats.stage("open"):
+            time.sleep(0.1)
+        with stats.stage("zip"):
+            time.sleep(0.1)
+    durations = stats.durations
+    assert 90 < durations["open"] < 150 and 90 < durations["zip"] < 150
+    assert 40 < durations["extract"] < 90, durations
+
+    body = json.loads(stats.serialize_with_stats({"name": "ü" * 10}, indent=2))
+    assert body["stats"]["bytes_out"] == len(json.dumps({"name": "ü" * 10}, indent=2).encode('utf-8'))
+    print("✅ Nested stages are timed exclusively")
+
+
+def test_page_durations_are_capped():
+    """Only the slowest pages are kept and reported."""
+    stats = RequestStats()
+    for page in range(1, 10_001):
+        stats.record_page(page, (page % 97) / 1000)
+    assert len(stats.page_durations) <= 2 * RequestStats.SLOWEST_PAGES
+    reported = stats.as_dict()["page_durations_ms"]
+    assert len(reported) == RequestStats.SLOWEST_PAGES
+    assert min(reported.values()) == 96.0
+    print("✅ Page timings are capped at the slowest pages")
+
+
+def test_rest_server_timing():
+    """The REST endpoint reports a Server-Timing header and a stats block."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "timed.pdf")
+        create_test_pdf(pdf_path, page_count=2)
+        pdf_bytes = Path(pdf_path).read_bytes()
+
+    client = TestClient(app)
+    response = client.post("/api/extract-base64", json={
+        "document_base64": base64.b64encode(pdf_bytes).decode('utf-8'),
+        "document_name": "timed.pdf"
+    })
+    assert response.status_code == 200
+
+    # Encoding and serialization happen while the body streams, after the headers
+    timing = response.headers["server-timing"]
+    for stage in ("decode", "open", "extract", "zip"):
+        assert f"{stage};dur=" in timing
+
+    stats = response.json()["stats"]
+    assert {"encode", "serialize"} <= set(stats["durations_ms"])
+    assert stats["bytes_in"] == len(pdf_bytes)
+    assert stats["images"] == 2
+    assert stats["image_bytes"] > 0
+    assert set(stats["page_durations_ms"]) == {"1", "2"}
+    print("✅ REST responses carry Server-Timing and stats")
+
+
+def test_mcp_path_stats():
+    """The path-based MCP tool includes a stats block in its result."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "timed.pdf")
+        create_test_pdf(pdf_path, page_count=2)
+
+        response = asyncio.run(handle_call_tool("extract_document_images", {"document_path": pdf_path}))
+        result = json.loads(response[0].text.split("Full result: ", 1)[1])
+
+        assert result["extracted_images"] == 2
+        assert result["stats"]["bytes_in"] == Path(pdf_path).stat().st_size
+        assert "extract" in result["stats"]["durations_ms"]
+    print("✅ MCP results carry stats")
+
+
+if __name__ == "__main__":
+    print("⏱️  Testing Request Stats")
+    print("=" * 50)
+    test_serialize_with_stats()
+    test_nested_stages_are_exclusive()
+    test_page_durations_are_capped()
+    test_rest_server_timing()
+    test_mcp_path_stats()
+    print("\n🎉 Request stats tests completed successfully!")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test size-aware, per-client fair scheduling of extraction jobs.
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import ExtractionScheduler
+
+
+async def run_jobs(scheduler: ExtractionScheduler, jobs: list) -> list:
+    """Queue (name, cost, client) jobs behind a blocker and return their start order."""
+    order = []
+    release_blocker = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot(0.1, "blocker"):
+            await release_blocker.wait()
+
+    async def job(name, cost, client):
+        async with scheduler.slot(cost, client):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    blocking = asyncio.ensure_future(blocker())
+    await asyncio.sleep(0)
+    tasks = []
+    for name, cost, client in jobs:
+        tasks.append(asyncio.ensure_future(job(name, cost, client)))
+        await asyncio.sleep(0)
+    release_blocker.set()
+    await asyncio.gather(blocking, *tasks)
+    return order
+
+
+def test_small_jobs_overtake_large():
+    """Small jobs queued behind a large one are dispatched first."""
+    scheduler = ExtractionScheduler(max_workers=1, large_cost_threshold=10)
+    order = asyncio.run(run_jobs(scheduler, [
+        ("large", 500, "bulk"),
+        ("invoice-1", 0.2, "bulk"),
+        ("invoice-2", 0.2, "bulk")
+    ]))
+    assert order == ["invoice-1", "invoice-2", "large"]
+    print("✅ Small jobs overtake large ones")
+
+
+def test_large_jobs_are_not_starved():
+    """A waiting large job runs after a bounded number of small jobs."""
+    scheduler = ExtractionScheduler(max_workers=1, large_cost_threshold=10, large_job_interval=2)
+    order = asyncio.run(run_jobs(scheduler, [("large", 500, "a")] + [
+        (f"small-{index}", 0.1, "a") for index in range(4)
+    ]))
+    assert order.index("large") == 2
+    print("✅ Large jobs are not starved")
+
+
+def test_per_client_fairness():
+    """Clients alternate instead of one tenant's backlog running first."""
+    scheduler = ExtractionScheduler(max_workers=1, large_cost_threshold=10)
+    order = asyncio.run(run_jobs(scheduler, [
+        ("bulk-1", 1, "bulk"),
+        ("bulk-2", 1, "bulk"),
+        ("bulk-3", 1, "bulk"),
+        ("user-1", 1, "interactive"),
+        ("user-2", 1, "interactive")
+    ]))
+    assert order == ["bulk-1", "user-1", "bulk-2", "user-2", "bulk-3"]
+    print("✅ Clients are served fairly")
+
+
+def test_reserved_slot_and_cancellation():
+    """Large jobs never take the reserved slot; cancelled waiters leave the queue."""
+    async def scenario():
+        scheduler = ExtractionScheduler(max_workers=2, large_cost_threshold=10, reserved_small_slots=1)
+        hold = asyncio.Event()
+
+        async def hold_slot(cost):
+            async with scheduler.slot(cost, "c"):
+                await hold.wait()
+
+        first_large = asyncio.ensure_future(hold_slot(100))
+        second_large = asyncio.ensure_future(hold_slot(100))
+        await asyncio.sleep(0)
+        assert scheduler.running == 1 and scheduler.waiting == 1
+
+        small = asyncio.ensure_future(hold_slot(1))
+        await asyncio.sleep(0)
+        assert scheduler.running == 2
+
+        second_large.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 0
+
+        hold.set()
+        await asyncio.gather(first_large, small)
+        assert scheduler.running == 0
+
+        result = await scheduler.run(1, "c", lambda: "threaded")
+        assert result == "threaded"
+
+    asyncio.run(scenario())
+    print("✅ Reserved slots and cancellation are honoured")
+
+
+def test_cost_estimate():
+    """Costs come from the file size alone; the document is never opened."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        small_path = Path(temp_dir) / "small.pdf"
+        large_path = Path(temp_dir) / "large.pdf"
+        small_path.write_bytes(b"%PDF-1.7 not really a PDF")
+        large_path.write_bytes(b"\0" * 3 * 1024 * 1024)
+
+        assert ExtractionScheduler.estimate_document_cost(str(small_path)) < 0.001
+        assert ExtractionScheduler.estimate_document_cost(str(large_path)) == 3
+        assert ExtractionScheduler.estimate_document_cost(str(Path(temp_dir) / "missing.pdf")) == 0
+    print("✅ Cost estimates use file sizes")
+
+
+if __name__ == "__main__":
+    print("⚖️  Testing Extraction Scheduling")
+    print("=" * 50)
+    test_small_jobs_overtake_large()
+    test_large_jobs_are_not_starved()
+    test_per_client_fairness()
+    test_reserved_slot_and_cancellation()
+    test_cost_estimate()
+    print("\n🎉 Scheduling tests completed successfully!")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test SSE session limits, idle eviction and monitoring.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from sse_starlette.sse import AppStatus
+from starlette.requests import Request
+from starlette.testclient import TestClient
+from document_image_extractor_mcp import server
+from document_image_extractor_mcp.server import SSESessionRegistry, app, handle_messages, handle_sse
+
+
+def make_scope(method: str, path: str, query: bytes = b"", headers: list = ()) -> dict:
+    return {
+        "type": "http", "method": method, "path": path, "raw_path": path.encode(),
+        "headers": list(headers), "query_string": query, "root_path": "",
+        "client": ("127.0.0.1", 5000), "server": ("test", 80), "scheme": "http", "http_version": "1.1"
+    }
+
+
+def test_registry_limits_and_eviction():
+    """The limit evicts idle sessions first, then rejects; keepalives are not activity."""
+    registry = SSESessionRegistry(max_sessions=2, idle_timeout=60)
+    first, second = registry.open(), registry.open()
+    first.record_out(20, keepalive=True)
+    second.record_in(100)
+    now = time.monotonic()
+    first.last_activity = now - 120
+
+    third = registry.open()
+    assert third is not None
+    assert registry.sessions == [second, third]
+    assert registry.open() is None
+    assert registry.summary()["rejected_total"] == 1
+    assert registry.summary()["evicted_total"] == 1
+    assert registry.summary()["bytes_in"] == 100
+
+    assert registry.evict_idle(now=now + 30) == 0
+    assert registry.evict_idle(now=now + 3600) == 2
+    assert len(registry) == 0
+    assert SSESessionRegistry(idle_timeout=0).evict_idle(now=now + 10 ** 6) == 0
+
+    busy = registry.open()
+    with registry.serving(busy):
+        assert registry.evict_idle(now=now + 3600) == 0
+        assert registry.describe()[0]["in_flight"] == 1
+    assert busy.in_flight == 0
+    assert registry.evict_idle(now=time.monotonic() + 3600) == 1
+    print("✅ Session limits and idle eviction work")
+
+
+def test_sse_session_lifecycle():
+    """A live SSE session is tracked, accounted and torn down on eviction."""
+    AppStatus.should_exit_event = None  # bound to the event loop that created it
+
+    async def scenario():
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        connection = asyncio.ensure_future(handle_sse(Request(make_scope("GET", "/sse"), receive, sent.put)))
+        assert (await asyncio.wait_for(sent.get(), 5))["status"] == 200
+        endpoint = (await asyncio.wait_for(sent.get(), 5))["body"]
+        session = server.sse_sessions.sessions[-1]
+        assert session.session_id and session.session_id.encode() in endpoint
+
+        payload = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}
+        }}).encode()
+
+        async def receive_payload():
+            return {"type": "http.request", "body": payload, "more_body": False}
+
+        replies = []
+
+        async def collect(message):
+            replies.append(message)
+
+        def post():
+            return handle_messages(Request(make_scope(
+                "POST", "/messages", f"session_id={session.session_id}".encode(),
+                [(b"content-length", str(len(payload)).encode()), (b"content-type", b"application/json")]
+            ), receive_payload, collect))
+
+        await post()
+        assert replies[0]["status"] == 202
+        reply = await asyncio.wait_for(sent.get(), 5)
+        assert b'"serverInfo"' in reply["body"]
+
+        [entry] = [entry for entry in server.sse_sessions.describe() if entry["session"] == session.session_id[:8]]
+        assert entry["messages_in"] == 1 and entry["bytes_in"] == len(payload)
+        assert entry["bytes_out"] == len(endpoint) + len(reply["body"])
+
+        # Tool calls are attributed to the session they were posted to
+        busy = []
+        original_call_tool = server._call_tool
+
+        async def call_tool(name, arguments):
+            busy.append((server._current_sse_session(), session.in_flight))
+            return await original_call_tool(name, arguments)
+
+        server._call_tool = call_tool
+        try:
+            for message in (
+                {"jsonrpc": "2.0", "method": "notifications/initialized"},
+                {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "list_supported_formats"}}
+            ):
+                payload = json.dumps(message).encode()
+                await post()
+            assert b'"id":2' in (await asyncio.wait_for(sent.get(), 5))["body"]
+        finally:
+            server._call_tool = original_call_tool
+        assert busy == [(session, 1)] and session.in_flight == 0
+
+        assert server.sse_sessions.evict_idle(now=time.monotonic() + 10 ** 6) >= 1
+        await asyncio.wait_for(connection, 5)
+        assert session not in server.sse_sessions.sessions
+
+        # The session's transport went with it; its ID is no longer known
+        replies.clear()
+        await post()
+        assert replies[0]["status"] == 404
+
+    asyncio.run(scenario())
+    print("✅ SSE sessions are tracked and evicted")
+
+
+def test_rejection_and_monitoring():
+    """Connections over the limit get 503; counts are exposed for monitoring."""
+    original, original_token = server.sse_sessions, server.ADMIN_TOKEN
+    server.sse_sessions = SSESessionRegistry(max_sessions=1, idle_timeout=0)
+    try:
+        server.sse_sessions.open()
+        client = TestClient(app)
+        response = client.get("/sse")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "30"
+
+        health = client.get("/api/health").json()
+        assert health["sse_sessions"]["active"] == 1
+        assert health["sse_sessions"]["rejected_total"] == 1
+        server.ADMIN_TOKEN = None
+        assert client.get("/api/sessions").status_code == 404
+        server.ADMIN_TOKEN = "secret"
+        assert client.get("/api/sessions").status_code == 403
+        assert client.get("/api/sessions", headers={"X-Profile-Token": "wrong"}).status_code == 403
+        sessions = client.get("/api/sessions", headers={"X-Profile-Token": "secret"}).json()
+        assert len(sessions["sessions"]) == 1
+        assert {"age_seconds", "idle_seconds", "in_flight", "bytes_in", "bytes_out"} <= set(sessions["sessions"][0])
+    finally:
+        server.sse_sessions, server.ADMIN_TOKEN = original, original_token
+    print("✅ Session counts are exposed for monitoring")
+
+
+if __name__ == "__main__":
+    print("🔌 Testing SSE Session Management")
+    print("=" * 50)
+    test_registry_limits_and_eviction()
+    test_sse_session_lifecycle()
+    test_rejection_and_monitoring()
+    print("\n🎉 SSE session management tests completed successfully!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test the stdio MCP transport used by local clients.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from document_image_extractor_mcp import cli
+from pdf_fixtures import create_test_pdf
+
+
+def test_stdio_session():
+    """A client launching the server over stdio can list tools and extract local files."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "local.pdf")
+        create_test_pdf(pdf_path, page_count=3)
+        parameters = StdioServerParameters(
+            command=sys.executable,
+            args=["-m", "document_image_extractor_mcp", "--transport", "stdio"],
+            env={**os.environ, "PYTHONPATH": str(SRC_DIR)}
+        )
+
+        async def scenario():
+            async with stdio_client(parameters) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    initialized = await session.initialize()
+                    assert initialized.serverInfo.name == "document-image-extractor-mcp"
+
+                    tools = await session.list_tools()
+                    assert "extract_document_images" in {tool.name for tool in tools.tools}
+
+                    response = await session.call_tool("extract_document_images", {
+                        "document_path": pdf_path,
+                        "output_dir": str(Path(temp_dir) / "out")
+                    })
+                    return json.loads(response.content[0].text.split("Full result: ", 1)[1])
+
+        result = asyncio.run(asyncio.wait_for(scenario(), 120))
+        assert result["extracted_images"] == 3
+        assert len(list((Path(temp_dir) / "out").glob("*.png"))) == 3
+    print("✅ MCP works over stdio")
+
+
+def test_transport_option():
+    """--transport accepts only the known transports."""
+    parser = cli.build_parser()
+    assert parser.parse_args([]).transport in ("http", "stdio")
+    assert parser.parse_args(["--transport", "stdio"]).transport == "stdio"
+    try:
+        parser.parse_args(["--transport", "websocket"])
+        assert False, "Expected a usage error"
+    except SystemExit as e:
+        assert e.code == 2
+    print("✅ The transport option is validated")
+
+
+if __name__ == "__main__":
+    print("📟 Testing stdio Transport")
+    print("=" * 50)
+    test_stdio_session()
+    test_transport_option()
+    print("\n🎉 stdio transport tests completed successfully!")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the stateless streamable HTTP MCP transport.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from sse_starlette.sse import AppStatus
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from document_image_extractor_mcp.server import SERVER_VERSION, STREAMABLE_HTTP_PATH, StreamableHTTPEndpoint, app
+
+HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+def rpc(method: str, params: dict, request_id: int = 1) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+
+
+def read_message(response) -> dict:
+    """Decode a JSON-RPC reply sent as plain JSON or as a single SSE event."""
+    if response.headers["content-type"].startswith("application/json"):
+        return response.json()
+    data = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert len(data) == 1
+    return json.loads(data[0])
+
+
+def reset_sse_exit_event() -> None:
+    """sse-starlette binds a global exit event to the first event loop; each TestClient runs its own."""
+    AppStatus.should_exit_event = None
+
+
+def make_replica(json_response: bool = False):
+    """An app serving only the streamable HTTP transport, like one replica behind a load balancer."""
+    endpoint = StreamableHTTPEndpoint(stateless=True, json_response=json_response)
+
+    async def lifespan(_app):
+        async with endpoint.run():
+            yield
+
+    return Starlette(lifespan=lifespan, routes=[
+        Route(STREAMABLE_HTTP_PATH, endpoint=endpoint, methods=["GET", "POST", "DELETE"])
+    ])
+
+
+def test_stateless_tool_calls():
+    """Tool calls are served without a session, by any replica."""
+    reset_sse_exit_event()
+    with TestClient(make_replica()) as first, TestClient(make_replica(json_response=True)) as second:
+        response = first.post(STREAMABLE_HTTP_PATH, headers=HEADERS, json=rpc("initialize", {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "test", "version": "1"}
+        }))
+        assert response.status_code == 200
+        assert "mcp-session-id" not in response.headers
+        server_info = read_message(response)["result"]["serverInfo"]
+        assert server_info == {"name": "document-image-extractor-mcp", "version": SERVER_VERSION}
+
+        # The next call lands on another replica
+        response = second.post(STREAMABLE_HTTP_PATH, headers=HEADERS, json=rpc("tools/list", {}, 2))
+        assert response.headers["content-type"].startswith("application/json")
+        tools = [tool["name"] for tool in read_message(response)["result"]["tools"]]
+        assert "extract_document_images_base64" in tools
+
+        response = first.post(STREAMABLE_HTTP_PATH, headers=HEADERS, json=rpc("tools/call", {
+            "name": "list_supported_formats",
+            "arguments": {}
+        }, 3))
+        assert ".pptx" in read_message(response)["result"]["content"][0]["text"]
+    print("✅ Stateless replicas serve any tool call")
+
+
+def test_app_mounts_transport():
+    """The main app serves streamable HTTP alongside SSE and lists it in the health check."""
+    reset_sse_exit_event()
+    with TestClient(app) as client:
+        health = client.get("/api/health").json()
+        assert health["endpoints"]["mcp_streamable_http"] == STREAMABLE_HTTP_PATH
+        assert health["endpoints"]["mcp_sse"] == "/sse"
+        assert health["version"] == SERVER_VERSION
+
+        response = client.post(STREAMABLE_HTTP_PATH, headers=HEADERS, json=rpc("tools/list", {}))
+        assert response.status_code == 200
+        assert read_message(response)["result"]["tools"]
+
+    # Outside the app's lifespan the transport is not running
+    response = TestClient(app).post(STREAMABLE_HTTP_PATH, headers=HEADERS, json=rpc("tools/list", {}))
+    assert response.status_code == 503
+    print("✅ The app serves the streamable HTTP transport")
+
+
+if __name__ == "__main__":
+    print("🌐 Testing Streamable HTTP Transport")
+    print("=" * 50)
+    test_stateless_tool_calls()
+    test_app_mounts_transport()
+    print("\n🎉 Streamable HTTP transport tests completed successfully!")
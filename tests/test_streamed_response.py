@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test that streamed REST responses are byte-identical to the buffered JSON schema.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from starlette.responses import JSONResponse
+from starlette.testclient import TestClient
+from document_image_extractor_mcp.server import (
+    RESPONSE_ENCODE_CHUNK_SIZE, Base64Utils, RequestStats, app, dumps_compact,
+    encode_extraction_outputs, iter_encoded_outputs
+)
+from pdf_fixtures import create_test_pdf_base64
+
+
+def test_chunked_encoding_matches_buffered():
+    """Chunk-encoded outputs serialize exactly like encode_extraction_outputs."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        large_image = Path(temp_dir) / "large.png"
+        large_image.write_bytes(os.urandom(RESPONSE_ENCODE_CHUNK_SIZE * 2 + 5))
+        small_image = Path(temp_dir) / "småll.jpg"
+        small_image.write_bytes(os.urandom(100))
+        zip_path = Path(temp_dir) / "archive.zip"
+        zip_path.write_bytes(os.urandom(1000))
+        image_paths = [str(large_image), str(small_image)]
+
+        images, zip_data = encode_extraction_outputs(image_paths, str(zip_path))
+        expected = dumps_compact({"status": "success", "images": images, "zip": zip_data})
+
+        streamed = b'{"status":"success"' + b"".join(
+            iter_encoded_outputs(image_paths, str(zip_path), RequestStats())
+        ) + b'}'
+        assert streamed == expected
+    print("✅ Chunked encoding matches buffered serialization")
+
+
+def test_mapped_files_are_released():
+    """Outputs are encoded from read-only mappings that close with each file, even mid-stream."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        empty = Path(temp_dir) / "empty.png"
+        empty.write_bytes(b"")
+        assert Base64Utils.encode_file_to_base64(str(empty)) == ""
+
+        large_image = Path(temp_dir) / "large.png"
+        large_image.write_bytes(os.urandom(RESPONSE_ENCODE_CHUNK_SIZE * 3))
+        with Base64Utils.map_file(str(large_image)) as view:
+            assert view.readonly and len(view) == RESPONSE_ENCODE_CHUNK_SIZE * 3
+        try:
+            view.tobytes()
+            assert False, "Expected the view to be released"
+        except ValueError:
+            pass
+
+        # A client that disconnects mid-file closes the generator and the mapping
+        outputs = iter_encoded_outputs([str(large_image), str(empty)], None, RequestStats())
+        assert next(outputs) == b',"images":['
+        next(outputs)
+        assert len(next(outputs)) == RESPONSE_ENCODE_CHUNK_SIZE // 3 * 4
+        outputs.close()
+    print("✅ Mapped outputs are released deterministically")
+
+
+def test_rest_response_is_byte_identical():
+    """The streamed REST body is exactly what JSONResponse would have produced."""
+    client = TestClient(app)
+    response = client.post("/api/extract-base64", json={
+        "document_base64": create_test_pdf_base64(page_count=3),
+        "document_name": "streamed.pdf"
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+
+    body = response.json()
+    assert list(body)[-1] == "stats"
+    assert [image["filename"] for image in body["images"]] == body["image_files"]
+    assert body["zip"]["mime_type"] == "application/zip"
+    assert JSONResponse(body).body == response.content
+    assert body["stats"]["bytes_out"] == len(response.content.rsplit(b',"stats":', 1)[0])
+    print("✅ Streamed REST response keeps the JSON schema")
+
+
+if __name__ == "__main__":
+    print("📤 Testing Streamed Responses")
+    print("=" * 50)
+    test_chunked_encoding_matches_buffered()
+    test_mapped_files_are_released()
+    test_rest_response_is_byte_identical()
+    print("\n🎉 Streamed response tests completed successfully!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test incremental parsing and base64 decoding of streamed REST request bodies.
+"""
+
+import base64
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from starlette.testclient import TestClient
+from document_image_extractor_mcp.server import StreamingJSONBodyParser, app
+from pdf_fixtures import create_test_pdf_bytes
+
+
+def parse_in_chunks(body: bytes, chunk_size: int):
+    """Feed a body to the parser in fixed-size chunks."""
+    sink = io.BytesIO()
+    parser = StreamingJSONBodyParser("document_base64", sink)
+    for offset in range(0, len(body), chunk_size):
+        parser.feed(body[offset:offset + chunk_size])
+    return parser.finish(), sink.getvalue()
+
+
+def test_parser_chunk_boundaries():
+    """Any chunking of the body yields the same fields and decoded document."""
+    data = os.urandom(5000)
+    encoded = base64.b64encode(data).decode('utf-8')
+    bodies = [
+        json.dumps({"document_name": "ü.pdf", "document_base64": encoded, "pages": [1, "2-3"]}),
+        json.dumps({"document_base64": "data:application/pdf;base64," + encoded}).replace("/", "\\/"),
+        '{"document_base64": "%s", "options": {"a": "}"}}' % "\\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+    ]
+    for body in bodies:
+        for chunk_size in (1, 3, 1000, len(body)):
+            fields, decoded = parse_in_chunks(body.encode('utf-8'), chunk_size)
+            assert decoded == data
+    assert fields["options"] == {"a": "}"}
+
+    for invalid in ('{"a": 1', '{"a": 1} x', '{"document_base64": "@@@@"}', '["a"]'):
+        try:
+            parse_in_chunks(invalid.encode('utf-8'), 2)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for {invalid!r}")
+    print("✅ Streaming parser handles arbitrary chunk boundaries")
+
+
+def test_rest_streamed_upload():
+    """The REST endpoint extracts from a body sent in small chunks."""
+    body = json.dumps({
+        "document_name": "streamed.pdf",
+        "document_base64": base64.b64encode(create_test_pdf_bytes()).decode('utf-8'),
+        "return_images_as_base64": False
+    }).encode('utf-8')
+
+    def chunks():
+        for offset in range(0, len(body), 1024):
+            yield body[offset:offset + 1024]
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/extract-base64", content=chunks(), headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 200
+    assert response.json()["extracted_images_count"] == 1
+
+    response = client.post("/api/extract-base64", content=b'{"document_base64": "!!", "document_name": "a.pdf"}')
+    assert response.status_code == 400
+    assert response.json()["error"].startswith("Invalid request format")
+
+    response = client.post("/api/extract-base64", json={"document_name": "a.pdf"})
+    assert response.status_code == 400
+    assert response.json()["error"] == "document_base64 is required"
+    print("✅ REST endpoint decodes streamed uploads")
+
+
+if __name__ == "__main__":
+    print("🌊 Testing Streamed Uploads")
+    print("=" * 50)
+    test_parser_chunk_boundaries()
+    test_rest_streamed_upload()
+    print("\n🎉 Streamed upload tests completed successfully!")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test the managed scratch workspace: pooling, quota, checkpoints and orphan sweeping.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_image_extractor_mcp.server import (
+    ExtractionCheckpointCache, ScratchWorkspaceManager, WorkspaceQuotaExceeded
+)
+
+
+def test_release_recycles_workspace():
+    """Released workspaces are emptied in the background and reused."""
+    with tempfile.TemporaryDirectory() as root:
+        manager = ScratchWorkspaceManager(root=root, pool_size=1)
+        workspace = manager.acquire()
+        assert workspace.startswith(root)
+        Path(workspace, "extracted_images").mkdir()
+        Path(workspace, "extracted_images", "page_1_image_1.png").write_bytes(b"png")
+
+        manager.release(workspace)
+        manager.flush()
+        assert os.listdir(workspace) == [ScratchWorkspaceManager.OWNER_MARKER]
+        assert manager.acquire() == workspace
+
+        # With the pool full, the second workspace is removed outright
+        other = manager.acquire()
+        manager.release(workspace)
+        manager.release(other)
+        manager.flush()
+        assert os.path.exists(workspace)
+        assert not os.path.exists(other)
+    print("✅ Released workspaces are recycled off the request path")
+
+
+def test_quota_is_enforced():
+    """Acquiring beyond the quota fails until space is released."""
+    with tempfile.TemporaryDirectory() as root:
+        manager = ScratchWorkspaceManager(root=root, quota_bytes=1000)
+        first = manager.acquire(reserve_bytes=800)
+        try:
+            manager.acquire(reserve_bytes=300)
+        except WorkspaceQuotaExceeded:
+            pass
+        else:
+            raise AssertionError("Expected WorkspaceQuotaExceeded")
+
+        manager.release(first)
+        manager.flush()
+        assert manager.reserved_bytes == 0
+        manager.acquire(reserve_bytes=300)
+    print("✅ Workspace quota is enforced")
+
+
+def test_janitor_sweeps_orphans():
+    """Workspaces of dead processes are removed; live ones are kept."""
+    with tempfile.TemporaryDirectory() as root:
+        manager = ScratchWorkspaceManager(root=root)
+        live = manager.acquire()
+
+        finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                                  capture_output=True, text=True)
+        orphan = Path(root, ScratchWorkspaceManager.PREFIX + "orphan")
+        orphan.mkdir()
+        (orphan / ScratchWorkspaceManager.OWNER_MARKER).write_text(finished.stdout.strip())
+        unrelated = Path(root, "unrelated_dir")
+        unrelated.mkdir()
+
+        assert manager.sweep_orphans() == 1
+        assert not orphan.exists()
+        assert Path(live).exists()
+        assert unrelated.exists()
+    print("✅ Janitor removes orphaned workspaces")
+
+
+def test_janitor_spares_own_workspaces():
+    """Untracked workspaces with our pid are removed only when old; racing acquisitions are kept."""
+    with tempfile.TemporaryDirectory() as root:
+        manager = ScratchWorkspaceManager(root=root, orphan_age_seconds=60)
+        recent = Path(root, ScratchWorkspaceManager.PREFIX + "recent")
+        old = Path(root, ScratchWorkspaceManager.PREFIX + "old")
+        for path in (recent, old):
+            path.mkdir()
+            (path / ScratchWorkspaceManager.OWNER_MARKER).write_text(str(os.getpid()))
+        an_hour_ago = time.time() - 3600
+        os.utime(old, (an_hour_ago, an_hour_ago))
+
+        assert manager.sweep_orphans() == 1
+        assert recent.exists() and not old.exists()
+
+    class RacingManager(ScratchWorkspaceManager):
+        """Registers each workspace while the janitor is deciding about it."""
+
+        def _is_orphan(self, path: str) -> bool:
+            with self._lock:
+                self._reserved[path] = 0
+            return True
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = RacingManager(root=root)
+        racing = Path(root, ScratchWorkspaceManager.PREFIX + "racing")
+        racing.mkdir()
+        assert manager.sweep_orphans() == 0
+        assert racing.exists()
+    print("✅ Janitor spares workspaces of this process")
+
+
+def test_checkpoints_share_the_quota():
+    """Checkpoint bytes count against the quota and stale checkpoints are swept."""
+    with tempfile.TemporaryDirectory() as root:
+        manager = ScratchWorkspaceManager(root=root, quota_bytes=1000, checkpoint_ttl_seconds=60)
+        cache = ExtractionCheckpointCache(cache_dir=manager.checkpoint_dir, workspace_manager=manager)
+
+        workspace = manager.acquire(reserve_bytes=900)
+        Path(workspace, "first.pdf").write_bytes(b"1" * 400)
+        first = cache.store(str(Path(workspace, "first.pdf")))
+        # The document moved out of the workspace, so its bytes are counted once
+        assert manager.reserved_bytes == 900
+        manager.release(workspace)
+        manager.flush()
+        assert manager.reserved_bytes == 400
+        try:
+            manager.acquire(reserve_bytes=700)
+        except WorkspaceQuotaExceeded:
+            pass
+        else:
+            raise AssertionError("Expected WorkspaceQuotaExceeded")
+
+        # Making room for a new checkpoint evicts the least recently used one
+        workspace = manager.acquire()
+        Path(workspace, "second.pdf").write_bytes(b"2" * 700)
+        second = cache.store(str(Path(workspace, "second.pdf")))
+        assert cache.lookup(first) is None
+        assert manager.reserved_bytes == 700
+
+        stale = Path(manager.checkpoint_dir, "c" * 64 + ".pdf")
+        stale.write_bytes(b"left by an earlier process")
+        an_hour_ago = time.time() - 3600
+        for path in (stale, Path(cache.lookup(second))):
+            os.utime(path, (an_hour_ago, an_hour_ago))
+        assert manager.sweep_checkpoints() == 1
+        assert not stale.exists() and cache.lookup(second) is not None
+    print("✅ Checkpoints share the scratch quota and are swept when stale")
+
+
+if __name__ == "__main__":
+    print("🧹 Testing Scratch Workspace Manager")
+    print("=" * 50)
+    test_release_recycles_workspace()
+    test_quota_is_enforced()
+    test_janitor_sweeps_orphans()
+    test_janitor_spares_own_workspaces()
+    test_checkpoints_share_the_quota()
+    print("\n🎉 Workspace manager tests completed successfully!")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the xref-table scan mode, which extracts PDF images without walking the page tree.
+"""
+
+import asyncio
+import base64
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import fitz  # PyMuPDF
+from document_image_extractor_mcp.server import DocumentExtractor, PDFImageExtractor, handle_call_tool
+
+
+def create_pdf(path: str, page_count: int = 12) -> None:
+    """Three distinct images (one with transparency) repeated across many pages, plus a tiny icon."""
+    doc = fitz.open()
+    xrefs = []
+    for page_num in range(page_count):
+        page = doc.new_page()
+        if page_num < 3:
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), page_num == 2)
+            pix.set_rect(pix.irect, (page_num * 80, 100, 60) + ((200,) if pix.alpha else ()))
+            xrefs.append(page.insert_image(fitz.Rect(50, 50, 150, 150), pixmap=pix))
+        else:
+            page.insert_image(fitz.Rect(50, 50, 150, 150), xref=xrefs[page_num % 3])
+    icon = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 4, 4), False)
+    doc[0].insert_image(fitz.Rect(200, 200, 210, 210), pixmap=icon)
+    doc.save(path)
+    doc.close()
+
+
+def test_scan_finds_unique_images():
+    """Each image is extracted once, soft masks are skipped and xrefs match get_pdf_info."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "repeated.pdf")
+        create_pdf(pdf_path)
+
+        with fitz.open(pdf_path) as doc:
+            image_xrefs = PDFImageExtractor.image_xrefs(doc)
+        assert len(image_xrefs) == 4
+        assert sorted(size for _, *size in image_xrefs) == [[4, 4], [40, 40], [40, 40], [40, 40]]
+
+        walked = PDFImageExtractor().extract_images(pdf_path, str(Path(temp_dir) / "pages"))
+        assert len(walked) == 12
+
+        scanned = PDFImageExtractor(scan="xref").extract_images(pdf_path, str(Path(temp_dir) / "xref"))
+        assert len(scanned) == 3
+        info = PDFImageExtractor().get_pdf_info(pdf_path)
+        page_xrefs = {xref for xrefs in info["image_xrefs_by_page"].values() for xref in xrefs}
+        assert {int(Path(image).stem.rsplit("_", 1)[1]) for image in scanned} <= page_xrefs
+    print("✅ Xref scan extracts each unique image once")
+
+
+def test_batches_and_validation():
+    """Batches resume by xref index; pages and unknown modes are rejected."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = str(Path(temp_dir) / "repeated.pdf")
+        create_pdf(pdf_path)
+        extractor = PDFImageExtractor(scan="xref")
+
+        first, position = extractor.extract_batch(pdf_path, str(Path(temp_dir) / "a"), limit=2)
+        second, end = extractor.extract_batch(pdf_path, str(Path(temp_dir) / "b"), start=position, limit=2)
+        assert len(first) == 2 and position[0] == 0
+        assert len(second) == 1 and end is None
+
+        xref = Path(first[0]).stem.rsplit("_", 1)[1]
+        [chosen] = extractor.extract_images(pdf_path, str(Path(temp_dir) / "c"), image_ids=[int(xref)])
+        assert chosen.endswith(f"image_xref_{xref}.png")
+
+        for bad in (lambda: extractor.extract_images(pdf_path, temp_dir, pages="1-2"),
+                    lambda: DocumentExtractor(scan="objects")):
+            try:
+                bad()
+                assert False, "Expected ValueError"
+            except ValueError:
+                pass
+    print("✅ Xref scan batches resume and invalid options are rejected")
+
+
+def test_tool_scan_option():
+    """The base64 tool paginates an xref scan through its cursor."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "repeated.pdf"
+        create_pdf(str(pdf_path))
+        document_base64 = base64.b64encode(pdf_path.read_bytes()).decode('utf-8')
+
+    names = []
+    cursor = None
+    while True:
+        arguments = {"cursor": cursor} if cursor else {
+            "document_base64": document_base64,
+            "document_name": "repeated.pdf",
+            "scan": "xref",
+            "page_size": 2
+        }
+        response = asyncio.run(handle_call_tool("extract_document_images_base64", arguments))
+        result = json.loads(response[0].text.split("Full result: ", 1)[1])
+        names += result["image_files"]
+        cursor = result.get("next_cursor")
+        if not cursor:
+            break
+    assert len(names) == 3 and all(name.startswith("image_xref_") for name in names)
+    print("✅ The scan option is honoured by the tools")
+
+
+if __name__ == "__main__":
+    print("🗂️  Testing Xref Scan Extraction")
+    print("=" * 50)
+    test_scan_finds_unique_images()
+    test_batches_and_validation()
+    test_tool_scan_option()
+    print("\n🎉 Xref scan tests completed successfully!")